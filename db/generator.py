@@ -5,12 +5,16 @@ This provides a shortcut interface to add simple contrainst on the
 sql SELECT statement.
 """
 
+import numpy as np
 from .db import get_conn
 from .table import DBTable
 
 
 class DBGenerator:
     """Class that retrieves rows from a table."""
+
+    # batchN determines the number of rows fetched at a time in batches()
+    batchN = 4096
     
     def __init__(self, table, logic="AND", where=dict(), fieldnames=None):
         """set up this generator with a DBTable object
@@ -37,23 +41,74 @@ class DBGenerator:
             if x not in table.fieldnames():
                 raise Exception("invalid field name: "+str(x))
 
-    def next(self):
-        """Retrieve all the data from the table, one row at a time."""
+        # positions of fields within tuples produced by batches()
+        self.positions = dict()
+        for index, field in enumerate(self.fieldnames):
+            self.positions[field] = index
+
+    def _select(self):
+        """prepare an sql SELECT statement and data for its WHERE clause."""
 
         fields = ", ".join(self.fieldnames)
         sql = "SELECT " + fields + " FROM " + self.table.name
-                
+
         where_sql = []
         where_data = []
         if len(self.where) > 0:
             for k, v in self.where.items():
                 where_sql.append(k + "=?")
-                where_data.append(v)            
+                where_data.append(v)
             sql += " WHERE " + self.logic.join(where_sql)
+        return sql, where_data
 
+    def next(self):
+        """Retrieve all the data from the table, one row at a time."""
+
+        sql, where_data = self._select()
         with get_conn(self.table.dbfile) as conn:
             cur = conn.cursor()            
             cur.execute(sql, where_data)                
             for row in cur:                
                 yield row  
 
+    def batches(self, size=None):
+        """Retrieve all the data from the table, in batches of plain tuples.
+
+        Fields within each tuple follow the order of self.fieldnames,
+        (see self.positions for a mapping from field names to indexes).
+
+        :param size: integer, maximal number of rows in each batch
+        :return: lists of tuples
+        """
+
+        size = self.batchN if size is None else size
+        sql, where_data = self._select()
+        with get_conn(self.table.dbfile) as conn:
+            cur = conn.cursor()
+            cur.row_factory = None
+            cur.execute(sql, where_data)
+            rows = cur.fetchmany(size)
+            while len(rows) > 0:
+                yield rows
+                rows = cur.fetchmany(size)
+
+    def columns(self, size=None):
+        """Retrieve all the data from the table as column arrays.
+
+        :param size: integer, number of rows to fetch at a time
+        :return: dict mapping field names to numpy arrays. Real fields
+            are arrays of floats (NULL becomes nan), text fields are arrays
+            of objects.
+        """
+
+        values = [[] for _ in self.fieldnames]
+        for rows in self.batches(size):
+            for index, column in enumerate(zip(*rows)):
+                values[index].extend(column)
+
+        real_fields = set(self.table.real_fields)
+        result = dict()
+        for field, index in self.positions.items():
+            dtype = float if field in real_fields else object
+            result[field] = np.array(values[index], dtype=dtype)
+        return result
@@ -28,6 +28,9 @@ class DBTable:
     text_fields = []
     real_fields = []
 
+    # indexes on the table, as pairs (index name, tuple of field names)
+    indexes = ()
+
     def __init__(self, dbfile):
         """Set up a connection and cursor for db operations.
 
@@ -165,6 +168,16 @@ class DBTable:
                 where = " OR ".join([field+"=?"]*len(xdata))
                 c.execute(sql+where, xdata)
 
+    def create_indexes(self):
+        """Create indexes declared in self.indexes (if not yet present)."""
+
+        with get_conn(self.dbfile) as conn:
+            cur = conn.cursor()
+            for index_name, fields in self.indexes:
+                sql = "CREATE INDEX IF NOT EXISTS " + index_name
+                sql += " ON " + self.name + " (" + ", ".join(fields) + ")"
+                cur.execute(sql)
+
     def fieldnames(self):      
         """Get a list with all field names for this table."""
         
@@ -4,31 +4,72 @@ Parsing ontologies from obo files on disk.
 
 import sys
 from .oboterm import OboTerm, MinimalOboTerm
+from .oboindex import OboIndex
+from .obocache import obo_fingerprint, load_obo_cache, save_obo_cache
 
 
 class MinimalObo:
     """Representation of an obo ontology with minimal parsing and checking"""
 
-    def __init__(self, filepath, infer_children=True):
+    def __init__(self, filepath, infer_children=True, cache=False):
         """Initiate by parsing an obo file
 
         :param filepath: string, path to obo file on disk
         :param infer_children: boolean, precomputes parent/child relations
+        :param cache: boolean, set True to load terms from a compiled
+            cache file next to the obo file (when it matches the obo
+            content), or to create such a cache file after parsing
         """
 
-        self.terms = parse_obo(filepath, MinimalOboTerm)
-        self.parents_cache = dict()
-        self.ancestors_cache = dict()
-        self.descendants_cache = dict()
-        self.alts_cache = dict()
-        if infer_children:
+        terms, fingerprint = None, None
+        if cache:
+            fingerprint = obo_fingerprint(filepath)
+            terms = load_obo_cache(filepath, fingerprint, MinimalOboTerm,
+                                   infer_children)
+        parsed = terms is None
+        self.terms = parse_obo(filepath, MinimalOboTerm) if parsed else terms
+        self.alts_index = index_alts(self.terms)
+        self.infer_children = infer_children
+        self.clear_cache()
+        if parsed and infer_children:
             self._add_parent_of()
+        if parsed and cache:
+            save_obo_cache(self, filepath, fingerprint)
 
     def clear_cache(self):
-        self.alts_cache = dict()
         self.parents_cache = dict()
         self.ancestors_cache = dict()
         self.descendants_cache = dict()
+        self.index_cache = None
+
+    def index(self):
+        """get an integer-indexed view with precomputed closures (cached)
+
+        :return: object of class OboIndex
+        """
+
+        if self.index_cache is None:
+            self.index_cache = OboIndex(self)
+        return self.index_cache
+
+    def precompute_closures(self):
+        """compute ancestors and descendants of all terms at once.
+
+        Closures are computed in a single pass over terms in topological
+        order, so that work is shared between related terms. Use this
+        before querying ancestors/descendants for many terms.
+        """
+
+        index = self.index()
+        ids = index.ids
+        for i, id in enumerate(ids):
+            ancestors = index.ancestors(i).tolist()
+            self.ancestors_cache[id] = tuple([ids[_] for _ in ancestors])
+            if self.infer_children:
+                descendants = index.descendants(i).tolist()
+                self.descendants_cache[id] = tuple([ids[_]
+                                                    for _ in descendants])
+        return self
 
     def ids(self, including_obsolete=False):
         """Fetch a set of terms defined in the ontology."""
@@ -40,17 +81,11 @@ class MinimalObo:
         return [_ for _ in allterms if not self.terms[_].obsolete]
 
     def canonical(self, key):
-        """obtain canonical id for key"""
+        """obtain canonical id for key (None for unknown keys)"""
 
         if key in self.terms:
             return key
-        if key in self.alts_cache:
-            return self.alts_cache[key]
-        for k, term in self.terms.items():
-            if key in term.alts:
-                self.alts_cache[key] = k
-                return k
-        return None
+        return self.alts_index.get(key, None)
 
     def has(self, key):
         """determine if obo object contains a term with given key."""
@@ -93,7 +128,7 @@ class MinimalObo:
             return self.ancestors_cache[key]
         result = _get_by_relation_recursive(self, key, "is_a")
         self.ancestors_cache[key] = result
-        return self.ancestors(key)
+        return result
 
     def children(self, key):
         """Retrieve all the children of a term."""
@@ -134,11 +169,9 @@ class MinimalObo:
     def sim_jaccard(self, key1, key2):
         """Compute similarity of two terms using ancestors. """
 
-        a1 = set(self.ancestors(key1))
-        a2 = set(self.ancestors(key2))
-        a1.add(key1)
-        a2.add(key2)
-        return len(a1.intersection(a2)) / len(a1.union(a2))
+        index = self.index()
+        i1, i2 = index.indexes([key1, key2])
+        return index.jaccard(i1, i2)
 
     def _add_parent_of(self):
         """Augment the relations to include 'parent_of'."""
@@ -162,6 +195,8 @@ class Obo(MinimalObo):
         """
 
         self.terms = parse_obo(filepath, OboTerm)
+        self.alts_index = index_alts(self.terms)
+        self.infer_children = infer_children
         self.clear_cache()
         if infer_children:
             self._add_parent_of()
@@ -191,29 +226,46 @@ def _get_by_relation(obo, key, relation):
 
 def _get_by_relation_recursive(obo, key, relation):
     """Identify all hits for a relation type, recursively
+
+    The traversal uses an explicit stack, so it is not limited by
+    the recursion depth of the interpreter.
     
     Return:
         set of identifiers that are related to the key
     """
-                
-    def get_recursive(x):               
-        if x in result or x in visited:
-            return
-        result.add(x)
-        visited.add(x)                        
-        for hit in _get_by_relation(obo, x, relation):
-            get_recursive(hit)
-        
-    result, visited = set(), set()    
-    get_recursive(key)
-    result.remove(key)
+
+    result = set()
+    stack = [key]
+    while len(stack) > 0:
+        for hit in _get_by_relation(obo, stack.pop(), relation):
+            if hit not in result:
+                result.add(hit)
+                stack.append(hit)
+    result.discard(key)
     return tuple(result)
 
 
+def index_alts(terms):
+    """create a mapping from alternative ids to primary ids
+
+    :param terms: dict mapping primary ids to term objects
+    :return: dict mapping all alternative ids to primary ids. When an
+        alternative id is claimed by several terms, the first term wins.
+    """
+
+    result = dict()
+    for key, term in terms.items():
+        for alt in term.alts:
+            if alt not in result:
+                result[alt] = key
+    return result
+
+
 def parse_obo(filename, OboTermClass=OboTerm):
     """Helper to parse an obo file and transfer data into dicts"""
 
     result = dict()
+    fields = getattr(OboTermClass, "fields", None)
 
     state = None
     newterm = None              
@@ -240,7 +292,11 @@ def parse_obo(filename, OboTermClass=OboTerm):
                 continue
              
             # add information into the term
-            newterm.parse(line)
+            # (skipping lines that the term class would ignore anyway)
+            field, _, value = line.partition(": ")
+            if fields is not None and field not in fields:
+                continue
+            newterm.parse_field(field, value)
 
         # ensure last items is saved
         if newterm is not None and newterm.valid():
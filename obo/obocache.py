@@ -0,0 +1,160 @@
+"""
+Compiled cache for parsed ontologies.
+
+A cache file is written next to an obo file and is keyed by a hash of
+the obo file content. When the hash matches, terms can be loaded without
+parsing the obo file line by line. The file holds two lines of json: a
+small header with the version and hash, and then the payload, so that a
+stale cache can be rejected without reading the payload. (Json, unlike
+pickle, cannot execute code when a cache file is read.)
+"""
+
+import gc
+import hashlib
+import json
+import os
+import tempfile
+from sys import intern
+
+
+# increment when the layout of the cache payload changes
+cache_version = 3
+
+
+def obo_fingerprint(filepath):
+    """compute a hash of the content of a file
+
+    :param filepath: string, path to obo file on disk
+    :return: string with hex digest
+    """
+
+    result = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            result.update(block)
+    return result.hexdigest()
+
+
+def obo_cache_path(filepath):
+    """get a path to a cache file associated with an obo file."""
+    return filepath + ".cache"
+
+
+def save_obo_cache(obo, filepath, fingerprint):
+    """write parsed ontology terms into a cache file
+
+    Failures to write (e.g. a read-only directory) are ignored.
+
+    :param obo: object of class MinimalObo
+    :param filepath: string, path to obo file on disk
+    :param fingerprint: string, hash of the obo file content
+    """
+
+    # relations refer to terms and relation types by position in lists
+    # of names, so that loading does not create duplicate strings
+    ids = obo.ids(True)
+    names, types = list(ids), []
+    index, type_index = dict(), dict()
+    for i, id in enumerate(ids):
+        index[id] = i
+    terms = obo.terms
+    relations = []
+    for id in ids:
+        id_relations = []
+        for relation, target in terms[id].relations:
+            if relation == "parent_of":
+                continue
+            if relation not in type_index:
+                type_index[relation] = len(types)
+                types.append(relation)
+            if target not in index:
+                index[target] = len(names)
+                names.append(target)
+            id_relations.append([type_index[relation], index[target]])
+        relations.append(id_relations)
+    children = [[] for _ in ids]
+    for child in ids:
+        for parent in obo.parents(child):
+            children[index[parent]].append(index[child])
+
+    header = dict(version=cache_version, fingerprint=fingerprint)
+    payload = dict(names=names, n_ids=len(ids), types=types,
+                   obsolete=[terms[_].obsolete for _ in ids],
+                   alts=[sorted(terms[_].alts) for _ in ids],
+                   relations=relations, children=children)
+
+    cachepath = obo_cache_path(filepath)
+    try:
+        handle, temppath = tempfile.mkstemp(dir=os.path.dirname(cachepath),
+                                            suffix=".tmp")
+    except OSError:
+        return
+    try:
+        with os.fdopen(handle, "wt", encoding="utf-8") as f:
+            f.write(json.dumps(header) + "\n")
+            f.write(json.dumps(payload, separators=(",", ":")) + "\n")
+        os.replace(temppath, cachepath)
+    except Exception:
+        # avoid leaving partial files next to the obo file
+        if os.path.exists(temppath):
+            os.remove(temppath)
+
+
+def load_obo_cache(filepath, fingerprint, OboTermClass,
+                   infer_children=True):
+    """read parsed ontology terms from a cache file
+
+    :param filepath: string, path to obo file on disk
+    :param fingerprint: string, hash of the obo file content
+    :param OboTermClass: class used to hold terms
+    :param infer_children: logical, set True to include parent_of relations
+    :return: dict mapping ids to term objects, or None if a cache
+        does not exist or does not match the fingerprint
+    """
+
+    cachepath = obo_cache_path(filepath)
+    if not os.path.exists(cachepath):
+        return None
+    try:
+        with open(cachepath, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if not isinstance(header, dict):
+                return None
+            if header.get("version") != cache_version:
+                return None
+            if header.get("fingerprint") != fingerprint:
+                return None
+            payload = json.loads(f.readline())
+    except Exception:
+        return None
+
+    # creating many small objects triggers futile garbage collection passes
+    gc.disable()
+    try:
+        return _make_terms(payload, OboTermClass, infer_children)
+    except Exception:
+        return None
+    finally:
+        gc.enable()
+
+
+def _make_terms(payload, OboTermClass, infer_children):
+    """create term objects from a cache payload"""
+
+    result = dict()
+    names = [intern(_) for _ in payload["names"]]
+    types = [intern(_) for _ in payload["types"]]
+    obsolete, alts = payload["obsolete"], payload["alts"]
+    relations, children = payload["relations"], payload["children"]
+    for i in range(payload["n_ids"]):
+        term = OboTermClass()
+        term.id = names[i]
+        term.obsolete = obsolete[i]
+        term.alts = set([intern(_) for _ in alts[i]])
+        term.relations = [(types[r], names[target])
+                          for r, target in relations[i]]
+        if infer_children:
+            term.relations.extend([("parent_of", names[_])
+                                   for _ in children[i]])
+        result[term.id] = term
+    return result
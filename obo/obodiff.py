@@ -0,0 +1,103 @@
+"""
+Comparison of two versions of an ontology.
+
+A diff records which terms were added, removed, obsoleted, or
+re-parented, and which alternative ids and replacements changed. The diff
+can then be used to identify which term ids are interpreted differently
+in the two versions.
+"""
+
+
+def _resolve(obo, key):
+    """map a raw id onto a valid term id (or None)
+
+    This follows the same logic as used when reading model phenotypes:
+    alternative ids are mapped to their primary ids, and obsolete terms
+    are mapped to their replacements.
+    """
+
+    key = obo.canonical(key)
+    if obo.has(key) and not obo.valid(key):
+        key = obo.replaced_by(key)
+    return key
+
+
+def diff_obo(old, new):
+    """compare two versions of an ontology
+
+    :param old: object of class MinimalObo, previous version
+    :param new: object of class MinimalObo, current version
+    :return: dict with sets of term ids. Components are 'added' (terms
+        only in new), 'removed' (terms only in old), 'obsoleted' (valid
+        in old, obsolete in new), 'restored' (obsolete in old, valid in
+        new), 'reparented' (different parents), 'alts' (primary ids of
+        terms with different alternative ids), and 'replaced_by' (terms
+        with a different replacement)
+    """
+
+    old_ids, new_ids = set(old.ids(True)), set(new.ids(True))
+    result = dict(added=new_ids.difference(old_ids),
+                  removed=old_ids.difference(new_ids),
+                  obsoleted=set(), restored=set(), reparented=set(),
+                  alts=set(), replaced_by=set())
+
+    for key in old_ids.intersection(new_ids):
+        old_valid, new_valid = old.valid(key), new.valid(key)
+        if old_valid and not new_valid:
+            result["obsoleted"].add(key)
+        if new_valid and not old_valid:
+            result["restored"].add(key)
+        if set(old.parents(key)) != set(new.parents(key)):
+            result["reparented"].add(key)
+        if old.alts(key) != new.alts(key):
+            result["alts"].add(key)
+        if old.replaced_by(key) != new.replaced_by(key):
+            result["replaced_by"].add(key)
+
+    return result
+
+
+def changed_terms(old, new):
+    """identify terms with different closures in two ontology versions
+
+    :param old: object of class MinimalObo, previous version
+    :param new: object of class MinimalObo, current version
+    :return: set of term ids that are present in only one version, are
+        valid in only one version, or have different sets of ancestors
+        or descendants
+    """
+
+    old.precompute_closures()
+    new.precompute_closures()
+    old_ids, new_ids = set(old.ids(True)), set(new.ids(True))
+    result = old_ids.symmetric_difference(new_ids)
+    for key in old_ids.intersection(new_ids):
+        if old.valid(key) != new.valid(key):
+            result.add(key)
+        elif set(old.ancestors(key)) != set(new.ancestors(key)):
+            result.add(key)
+        elif set(old.descendants(key)) != set(new.descendants(key)):
+            result.add(key)
+    return result
+
+
+def changed_keys(old, new, keys, changed=None):
+    """identify raw ids that are interpreted differently in two versions
+
+    :param old: object of class MinimalObo, previous version
+    :param new: object of class MinimalObo, current version
+    :param keys: iterable with raw ids (may include alternative ids
+        and obsolete ids)
+    :param changed: set of term ids with changed closures, as computed
+        by changed_terms (computed if None)
+    :return: set with a subset of keys
+    """
+
+    if changed is None:
+        changed = changed_terms(old, new)
+    result = set()
+    for key in keys:
+        old_key, new_key = _resolve(old, key), _resolve(new, key)
+        if old_key != new_key or new_key in changed:
+            result.add(key)
+    return result
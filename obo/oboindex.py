@@ -0,0 +1,233 @@
+"""
+Integer-indexed view of an ontology with precomputed closures.
+
+Terms are assigned sequential integer indexes. Parents, ancestors, and
+descendants are stored as CSR arrays (a pointer array and an array of
+indexes), and ancestor/descendant sets are also available as bitsets
+encoded in python integers (bit i set means term i is in the set).
+"""
+
+import numpy as np
+
+
+def _popcount_str(x):
+    """count set bits in an integer (for python without int.bit_count)."""
+    return bin(x).count("1")
+
+
+# count the number of set bits in an integer bitset
+popcount = getattr(int, "bit_count", _popcount_str)
+
+
+def make_csr(lists):
+    """convert a list of lists of integers into CSR arrays
+
+    :param lists: list of lists of integers
+    :return: two numpy arrays. The first has pointers so that
+        the i-th list is held in second[first[i]:first[i+1]]
+    """
+
+    lengths = np.array([len(_) for _ in lists], dtype=np.int64)
+    ptr = np.zeros(len(lists)+1, dtype=np.int64)
+    np.cumsum(lengths, out=ptr[1:])
+    idx = np.zeros(ptr[-1], dtype=np.int64)
+    for i, values in enumerate(lists):
+        idx[ptr[i]:ptr[i+1]] = values
+    return ptr, idx
+
+
+def topological_order(parents):
+    """order nodes so that all parents appear before their children
+
+    :param parents: list of lists, parents[i] holds indexes of parents of i
+    :return: list with all node indexes
+    """
+
+    n = len(parents)
+    children = [[] for _ in range(n)]
+    n_parents = [0] * n
+    for i, node_parents in enumerate(parents):
+        n_parents[i] = len(node_parents)
+        for p in node_parents:
+            children[p].append(i)
+
+    result = [i for i in range(n) if n_parents[i] == 0]
+    head = 0
+    while head < len(result):
+        for child in children[result[head]]:
+            n_parents[child] -= 1
+            if n_parents[child] == 0:
+                result.append(child)
+        head += 1
+
+    if len(result) < n:
+        raise Exception("ontology relations contain a cycle")
+    return result
+
+
+class OboIndex:
+    """Integer-indexed ontology with precomputed ancestors and descendants."""
+
+    def __init__(self, obo):
+        """build closure arrays for all terms in an ontology
+
+        :param obo: object of class MinimalObo
+        """
+
+        self.ids = tuple(obo.ids(True))
+        self.index = dict()
+        for i, id in enumerate(self.ids):
+            self.index[id] = i
+        n = len(self.ids)
+
+        parents = [None] * n
+        for i, id in enumerate(self.ids):
+            parents[i] = sorted([self.index[_] for _ in obo.parents(id)])
+        self.order = topological_order(parents)
+
+        # build ancestor sets from parents, in order from root to leaves
+        ancestors = [None] * n
+        for i in self.order:
+            result = set(parents[i])
+            for p in parents[i]:
+                result.update(ancestors[p])
+            ancestors[i] = result
+        # descendants mirror ancestors, but skip obsolete terms
+        descendants = [[] for _ in range(n)]
+        for i in range(n):
+            ancestors[i] = sorted(ancestors[i])
+            if not obo.valid(self.ids[i]):
+                continue
+            for a in ancestors[i]:
+                descendants[a].append(i)
+
+        self.parents_ptr, self.parents_idx = make_csr(parents)
+        self.ancestors_ptr, self.ancestors_idx = make_csr(ancestors)
+        self.descendants_ptr, self.descendants_idx = make_csr(descendants)
+
+        # bitsets are created on demand
+        self.ancestors_bits_cache = [None] * n
+        self.descendants_bits_cache = [None] * n
+
+    def __len__(self):
+        return len(self.ids)
+
+    def indexes(self, keys):
+        """convert ontology ids into integer indexes
+
+        :param keys: iterable with term ids
+        :return: list of integers
+        """
+
+        result = []
+        for key in keys:
+            if key not in self.index:
+                raise Exception("key "+str(key)+" not present in ontology")
+            result.append(self.index[key])
+        return result
+
+    def parents(self, i):
+        """get an array with indexes of parents of term i"""
+        return self.parents_idx[self.parents_ptr[i]:self.parents_ptr[i+1]]
+
+    def ancestors(self, i):
+        """get an array with indexes of ancestors of term i"""
+        ptr = self.ancestors_ptr
+        return self.ancestors_idx[ptr[i]:ptr[i+1]]
+
+    def descendants(self, i):
+        """get an array with indexes of descendants of term i"""
+        ptr = self.descendants_ptr
+        return self.descendants_idx[ptr[i]:ptr[i+1]]
+
+    def _bits(self, indexes):
+        """encode an array of indexes into an integer bitset"""
+
+        mask = np.zeros(len(self.ids), dtype=bool)
+        mask[indexes] = True
+        packed = np.packbits(mask, bitorder="little")
+        return int.from_bytes(packed.tobytes(), "little")
+
+    def ancestors_bits(self, i):
+        """get a bitset with ancestors of term i"""
+
+        result = self.ancestors_bits_cache[i]
+        if result is None:
+            result = self._bits(self.ancestors(i))
+            self.ancestors_bits_cache[i] = result
+        return result
+
+    def descendants_bits(self, i):
+        """get a bitset with descendants of term i"""
+
+        result = self.descendants_bits_cache[i]
+        if result is None:
+            result = self._bits(self.descendants(i))
+            self.descendants_bits_cache[i] = result
+        return result
+
+    def is_ancestor(self, a, i):
+        """determine if term a is an ancestor of term i"""
+        return (self.ancestors_bits(i) >> a) & 1 == 1
+
+    def ancestors_mask(self, indexes, inclusive=True):
+        """create an incidence matrix for ancestors of several terms
+
+        :param indexes: iterable with term indexes
+        :param inclusive: logical, set True to mark terms as their own
+            ancestors
+        :return: boolean numpy array, one row per term in indexes and
+            one column per term in the ontology
+        """
+
+        indexes = list(indexes)
+        result = np.zeros((len(indexes), len(self.ids)), dtype=bool)
+        for row, i in enumerate(indexes):
+            result[row, self.ancestors(i)] = True
+            if inclusive:
+                result[row, i] = True
+        return result
+
+    def filter_ancestors(self, candidates, i):
+        """select items from candidates that are ancestors of term i
+
+        :param candidates: iterable with term indexes
+        :param i: term index
+        :return: list with a subset of candidates
+        """
+
+        bits = self.ancestors_bits(i)
+        return [a for a in candidates if (bits >> a) & 1]
+
+    def intersection_counts(self, i, others):
+        """count shared ancestors (terms included) between i and others
+
+        :param i: integer, term index
+        :param others: iterable with term indexes
+        :return: numpy array of integers, one per item in others
+        """
+
+        bits = self.ancestors_bits(i) | (1 << i)
+        result = [popcount(bits & (self.ancestors_bits(j) | (1 << j)))
+                  for j in others]
+        return np.array(result, dtype=np.int64)
+
+    def union_counts(self, i, others):
+        """count union of ancestors (terms included) between i and others
+
+        :param i: integer, term index
+        :param others: iterable with term indexes
+        :return: numpy array of integers, one per item in others
+        """
+
+        bits = self.ancestors_bits(i) | (1 << i)
+        result = [popcount(bits | (self.ancestors_bits(j) | (1 << j)))
+                  for j in others]
+        return np.array(result, dtype=np.int64)
+
+    def jaccard(self, i, j):
+        """compute jaccard similarity of ancestors (terms included)"""
+
+        bits_i = self.ancestors_bits(i) | (1 << i)
+        bits_j = self.ancestors_bits(j) | (1 << j)
+        return popcount(bits_i & bits_j) / popcount(bits_i | bits_j)
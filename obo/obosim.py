@@ -0,0 +1,121 @@
+"""
+Batch computation of similarities between ontology terms.
+
+Similarities are computed from an ancestor-incidence matrix (one row per
+term, one column per ancestor). Intersections of ancestor sets for many
+pairs of terms are then given by a single matrix product and unions
+follow from row sums.
+"""
+
+import numpy as np
+
+
+def ancestor_columns(obo, keys):
+    """identify all terms that are ancestors of some keys
+
+    Terms are treated as their own ancestors.
+
+    :param obo: object of class MinimalObo
+    :param keys: list of term ids
+    :return: sorted array of term indexes
+    """
+
+    index = obo.index()
+    result = np.zeros(len(index), dtype=bool)
+    for i in index.indexes(keys):
+        result[index.ancestors(i)] = True
+        result[i] = True
+    return np.flatnonzero(result)
+
+
+def ancestor_incidence(obo, keys, columns=None):
+    """create an incidence matrix linking terms to their ancestors
+
+    Terms are treated as their own ancestors.
+
+    :param obo: object of class MinimalObo
+    :param keys: list of term ids (rows)
+    :param columns: array of term indexes to use as columns, or None
+        to use all ancestors of all the keys
+    :return: a 2-tuple with a numpy matrix of type float32 (0/1 values) and
+        an array of term indexes corresponding to its columns
+    """
+
+    index = obo.index()
+    if columns is None:
+        columns = ancestor_columns(obo, keys)
+    # positions of terms within columns (-1 for terms not in columns)
+    position = np.full(len(index), -1, dtype=np.int64)
+    position[columns] = np.arange(len(columns))
+    result = np.zeros((len(keys), len(columns)), dtype=np.float32)
+    for row, i in enumerate(index.indexes(keys)):
+        hits = position[np.append(index.ancestors(i), i)]
+        result[row, hits[hits >= 0]] = 1
+    return result, columns
+
+
+def jaccard_blocks(obo, keys, others=None, block_size=1024):
+    """compute jaccard similarities between terms, in blocks of rows
+
+    Incidence matrices are created for block_size keys and block_size
+    others at a time. Apart from one block of output, memory use is then
+    proportional to block_size and the number of ontology terms.
+
+    :param obo: object of class MinimalObo
+    :param keys: list of term ids, determines rows of the output
+    :param others: list of term ids, determines columns of the output
+        (use None to compare keys against themselves)
+    :param block_size: integer, number of rows in each block
+    :return: generator of 2-tuples, each with a first row index and a
+        numpy matrix with similarities for block_size rows (or fewer)
+    """
+
+    keys = list(keys)
+    others = keys if others is None else list(others)
+    if len(others) == 0:
+        for start in range(0, len(keys), block_size):
+            end = min(len(keys), start + block_size)
+            yield start, np.zeros((end-start, 0))
+        return
+
+    index = obo.index()
+    columns = ancestor_columns(obo, others)
+    b_sizes = np.array([len(index.ancestors(_))+1
+                        for _ in index.indexes(others)], dtype=np.float64)
+    for start in range(0, len(keys), block_size):
+        block_keys = keys[start:start+block_size]
+        a, _ = ancestor_incidence(obo, block_keys, columns)
+        # ancestors outside of columns never intersect with others
+        a_sizes = np.array([len(index.ancestors(_))+1
+                            for _ in index.indexes(block_keys)],
+                           dtype=np.float64)
+        result = np.zeros((len(block_keys), len(others)))
+        for other_start in range(0, len(others), block_size):
+            other_end = min(len(others), other_start + block_size)
+            b, _ = ancestor_incidence(obo, others[other_start:other_end],
+                                      columns)
+            intersection = np.dot(a, b.T).astype(np.float64)
+            union = a_sizes[:, np.newaxis]
+            union = union + b_sizes[np.newaxis, other_start:other_end]
+            union -= intersection
+            result[:, other_start:other_end] = intersection / union
+        yield start, result
+
+
+def jaccard_matrix(obo, keys, others=None, block_size=1024):
+    """compute a matrix with jaccard similarities between terms
+
+    :param obo: object of class MinimalObo
+    :param keys: list of term ids, determines rows of the output
+    :param others: list of term ids, determines columns of the output
+        (use None to compare keys against themselves)
+    :param block_size: integer, number of rows to process at a time
+    :return: numpy matrix, values match MinimalObo.sim_jaccard
+    """
+
+    keys = list(keys)
+    n_others = len(keys) if others is None else len(others)
+    result = np.zeros((len(keys), n_others))
+    for start, block in jaccard_blocks(obo, keys, others, block_size):
+        result[start:start+block.shape[0], :] = block
+    return result
@@ -2,8 +2,18 @@
 Class holding a single term defined in an obo file.
 
 This container/parser only supports a few of the data types in an obo term. 
+Term objects use __slots__ and intern identifiers, so that large ontologies
+hold many small records without per-instance dictionaries or duplicate
+copies of id strings.
 """
 
+from sys import intern
+
+
+# fields that are handled by MinimalOboTerm
+minimal_fields = frozenset(["id", "is_a", "is_obsolete", "replaced_by",
+                            "alt_id"])
+
 
 class MinimalOboTerm:
     """A container holding just minimal information on an ontology term.
@@ -11,6 +21,11 @@ class MinimalOboTerm:
     To use this, first initialize an empty object, then add data into it
     """
 
+    __slots__ = ("id", "obsolete", "alts", "relations")
+
+    # names of fields that affect the term (None to signal all fields)
+    fields = minimal_fields
+
     def __init__(self):
         """create a small set of empty fields"""
         self.id = None
@@ -28,43 +43,51 @@ class MinimalOboTerm:
 
         Arguments:
             datastr   character string, single line from an obo file
-            minimal   boolean, if True, parsing will skip some steps
         """
 
         if datastr == "":
             return
-        tokens = datastr.split(": ", 1)
+        field, _, value = datastr.partition(": ")
+        self.parse_field(field, value)
+
+    def parse_field(self, field, value):
+        """parse one line of data that is already split into two parts
+
+        Arguments:
+            field     character string, name of field (before ': ')
+            value     character string, content of field (after ': ')
+        """
 
         # handle core items
-        if tokens[0] == "id":
-            self.id = tokens[1]
+        if field == "is_a":
+            self.add_relation(value, "is_a")
             return
-        if tokens[0] == "is_obsolete":
-            if tokens[1] == "true":
+        if field == "id":
+            self.id = intern(value)
+            return
+        if field == "is_obsolete":
+            if value == "true":
                 self.obsolete = True
             else:
                 raise Exception("Unknown value for field is_obsolete")
             return
-        if tokens[0] == "alt_id":
-            self.add_alt(tokens[1])
+        if field == "alt_id":
+            self.add_alt(value)
             return
-        if tokens[0] == "replaced_by":
+        if field == "replaced_by":
             if not self.obsolete:
                 raise Exception("non-obsolete term cannot be replaced")
-            self.add_relation(tokens[1], "replaced_by")
-            return
-        if tokens[0] == "is_a":
-            self.add_relation(tokens[1], "is_a")
+            self.add_relation(value, "replaced_by")
             return
 
     def add_relation(self, parent, relation):
         """Add a relation to the term."""
-        parent = parent.split(" ", 1)[0]
-        self.relations.append((relation, parent))
+        parent = parent.partition(" ")[0]
+        self.relations.append((relation, intern(parent)))
 
     def add_alt(self, alt_id):
         """Add an alternative id."""
-        self.alts.add(alt_id)
+        self.alts.add(intern(alt_id))
 
     def __str__(self):
         """a quick summary of this term."""
@@ -74,7 +97,11 @@ class MinimalOboTerm:
 
 class OboTerm(MinimalOboTerm):
     """A container for a generic obo term, with more stored fields"""
-    
+
+    __slots__ = ("name", "synonyms", "data")
+
+    fields = None
+
     def __init__(self):
         """Initiate an object with empty fields."""
 
@@ -92,31 +119,28 @@ class OboTerm(MinimalOboTerm):
             return False
         return True
 
-    def parse(self, datastr):
-        """parse one line of data from a string, remember in object
+    def parse_field(self, field, value):
+        """parse one line of data split into two parts, remember in object
 
-        :param datastr: string, single line from an obo file
+        :param field: string, name of field (before ': ')
+        :param value: string, content of field (after ': ')
         """
 
-        if datastr == "":
-            return
-        tokens = datastr.split(": ", 1)
-
         # handle some cases by previous code
-        if tokens[0] in ("id", "is_a", "is_obsolete", "replaced_by", "alt_id"):
-            super(OboTerm, self).parse(datastr)
+        if field in minimal_fields:
+            super(OboTerm, self).parse_field(field, value)
             return
-        if tokens[0] == "name":
-            self.name = tokens[1]
+        if field == "name":
+            self.name = value
             return
-        if tokens[0] == "synonym":
-            self.add_synonym(tokens[1])
+        if field == "synonym":
+            self.add_synonym(value)
             return
         if self.data is None:
             self.data = dict()
-        if tokens[0] not in self.data:
-            self.data[tokens[0]] = set()
-        self.data[tokens[0]].add(tokens[1])
+        if field not in self.data:
+            self.data[field] = set()
+        self.data[field].add(value)
 
     def add_synonym(self, synonym):
         """Add a definition of a synonym to this object."""
@@ -43,6 +43,7 @@ if __name__ == "__main__":
     elif config.command == "ancestors":
         # extract a table of term ancestors
         print("id\tancestors")
+        obo.precompute_closures()
         for term in obo.ids():
             ancestors = obo.ancestors(term)
             print(term + "\t" + ";".join(ancestors))
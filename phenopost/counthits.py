@@ -3,6 +3,7 @@ Count hits to references
 """
 
 
+from db.db import get_conn
 from db.generator import DBGenerator
 from phenoscoring.dbtables import ModelScoreTable
 from phenoscoring.dbhelpers import get_ref_names
@@ -12,10 +13,50 @@ def get_highscore_pairs(dbpath, threshold):
     """get an array of pairs (model, reference) with high scores."""
     
     result = []    
-    generator = DBGenerator(ModelScoreTable(dbpath))
-    for row in generator.next():
-        if row["general"] > threshold and row["specific"] > threshold:
-            result.append((row["model"], row["reference"]))
+    generator = DBGenerator(ModelScoreTable(dbpath),
+                            fieldnames=("model", "reference",
+                                        "general", "specific"))
+    for rows in generator.batches():
+        for model, reference, general, specific in rows:
+            if general > threshold and specific > threshold:
+                result.append((model, reference))
+    return result
+
+
+def count_hits_tiers(dbpath, thresholds):
+    """count the number of models that score against each reference
+
+    All thresholds are evaluated in a single aggregation query, so the
+    score table is scanned only once and rows are never transferred into
+    python.
+
+    :param dbpath: path to phenoscoring db
+    :param thresholds: list of numbers, minimum general and specific scores
+        for a hit in each tier
+    :return: dict mapping reference names to tuples with model counts,
+        one count per threshold
+    """
+
+    thresholds = list(thresholds)
+    refnames = get_ref_names(dbpath)
+    result = dict.fromkeys(refnames, tuple([0]*len(thresholds)))
+    if len(thresholds) == 0:
+        return result
+
+    case = "SUM(CASE WHEN general>? AND specific>? THEN 1 ELSE 0 END)"
+    sql = "SELECT reference, " + ", ".join([case]*len(thresholds))
+    sql += " FROM " + ModelScoreTable.name + " GROUP BY reference"
+    sql_data = []
+    for threshold in thresholds:
+        sql_data.extend([threshold, threshold])
+
+    with get_conn(dbpath) as conn:
+        cur = conn.cursor()
+        cur.row_factory = None
+        cur.execute(sql, sql_data)
+        for row in cur:
+            if row[0] in result:
+                result[row[0]] = tuple(row[1:])
     return result
 
 
@@ -33,21 +74,4 @@ def count_hits(dbpath, threshold1, threshold2=None):
 
     if threshold2 is None:
         threshold2 = threshold1
-                
-    refnames = get_ref_names(dbpath)
-    counts_t1 = dict.fromkeys(refnames, 0)
-    counts_t2 = dict.fromkeys(refnames, 0)
-    
-    # collect hits above first threshold, second threshold
-    pairs = get_highscore_pairs(dbpath, threshold1)
-    for _, refname in pairs:
-        counts_t1[refname] += 1
-    pairs = get_highscore_pairs(dbpath, threshold2)
-    for _, refname in pairs:
-        counts_t2[refname] += 1
-    
-    result = dict.fromkeys(refnames, None)
-    for ref in refnames:
-        result[ref] = (counts_t1[ref], counts_t2[ref])
-        
-    return result    
+    return count_hits_tiers(dbpath, [threshold1, threshold2])
@@ -10,8 +10,8 @@ This is an auxiliary program to phenoscoring.py
 
 import argparse
 from obo.obo import MinimalObo
-from phenoprep.prep_impc import prep_IMPC, get_IMPC_hits_summary
-from phenoprep.prep_imputation import get_UA_models, make_scaled_cooc
+from phenoprep.prep_impc import prep_IMPC, prep_IMPC_all
+from phenoprep.prep_imputation import get_UA_models, scaled_coocs
 from phenoprep.prep_imputation import impute_IMPC, get_models_by_phenotype
 from phenoprep.prep_mgi import prep_MGI
 from phenoprep.prep_refs import prep_refs, prep_tech_models
@@ -63,6 +63,10 @@ parser.add_argument("--dark_count", action="store", type=int, default=2,
                     help="dark count for prior estimation")
 parser.add_argument("--simplify", action="store",
                     choices=["none", "consensus", "average"])
+parser.add_argument("--skip_obo_cache", action="store_true", default=False,
+                    help="avoid using a compiled cache next to the obo file")
+parser.add_argument("--cores", action="store", type=int, default=1,
+                    help="number of processes for parsing large inputs")
 
 
 # for augmenting models with expression data
@@ -75,6 +79,27 @@ parser.add_argument("--emapa", action="store",
 
  
 
+# ##################################################################
+# filter functions for IMPC models
+# (defined at module level so that they can be passed to worker processes)
+
+
+def f_U_allele(x):
+    return x.category == "allele" and x.description["sex"] == "U"
+
+
+def f_S_allele(x):
+    return x.category == "allele" and x.description["sex"] != "U"
+
+
+def f_U_marker(x):
+    return x.category == "marker" and x.description["sex"] == "U"
+
+
+def f_S_marker(x):
+    return x.category == "marker" and x.description["sex"] != "U"
+
+
 # ##################################################################
 # Execute the program if module is used as an executable
 
@@ -86,14 +111,15 @@ if __name__ == "__main__":
     fe = filter_entities
     fe_cat = filter_entities_cat
     threshold = config.threshold
+    obo_cache = not config.skip_obo_cache
 
     if config.action == "MGI":
         # action to parse mouse phenotype models from MGI
         
         check_file(config.input, required="input")
         check_file(config.obo)        
-        obo = MinimalObo(config.obo)
-        models = prep_MGI(config.input, tprfpr, obo)
+        obo = MinimalObo(config.obo, cache=obo_cache)
+        models = prep_MGI(config.input, tprfpr, obo, config.cores)
         # write out all models and subsets
         genotype_models = fe_cat(models, set(["genotype"]))
         marker_models = fe_cat(models, set(["marker"]))
@@ -111,18 +137,14 @@ if __name__ == "__main__":
                 
         check_file(config.input, required="input")        
         check_file(config.obo)        
-        models = prep_IMPC(config.input, tprfpr, threshold,
-                           simplify=config.simplify)
-        
-        # filter functions
-        def f_U_allele(x):
-            return x.category == "allele" and x.description["sex"] == "U"
-        def f_S_allele(x):
-            return x.category == "allele" and x.description["sex"] != "U"
-        def f_U_marker(x):
-            return x.category == "marker" and x.description["sex"] == "U"
-        def f_S_marker(x):
-            return x.category == "marker" and x.description["sex"] != "U"
+
+        # parse the input once, for models with and without consensus
+        # and for a summary of hits
+        models, fullmodels, tested, hits = prep_IMPC_all(config.input, tprfpr,
+                                                         threshold,
+                                                         config.simplify,
+                                                         full=f_U_allele,
+                                                         cores=config.cores)
         
         # apply each filter and save the models
         prefix = config.output
@@ -131,12 +153,8 @@ if __name__ == "__main__":
         write_models(fe(models, f_U_marker), prefix+"-marker-universal")
         write_models(fe(models, f_S_marker), prefix+"-marker-sex")
         
-        # create models without consensus
-        fullmodels = prep_IMPC(config.input, tprfpr, threshold, simplify="none")        
-        write_models(fe(fullmodels, f_U_allele), prefix+"-allele-universal-full")
-                
-        # get a summary of IMPC hits
-        tested, hits = get_IMPC_hits_summary(config.input, threshold)
+        # save models without consensus, and a summary of IMPC hits
+        write_models(fullmodels, prefix+"-allele-universal-full")
         write_hits_summary(tested, hits, config.output)
 
     if config.action == "IMPCimputed":
@@ -145,20 +163,19 @@ if __name__ == "__main__":
         check_file(config.input, required="input")
         check_file(config.obo)        
         models = prep_IMPC(config.input, tprfpr, threshold,
-                           simplify=config.simplify)
+                           simplify=config.simplify, cores=config.cores)
         
         # create models with imputed phenotypes
-        obo = MinimalObo(config.obo)
+        obo = MinimalObo(config.obo, cache=obo_cache)
         penalty = config.imputation_penalty
         models_UA = get_UA_models(models, "allele")
         # create and save various co-occurance matrices
         observed = get_models_by_phenotype(models_UA, 1)
-        for type in ["full", "freq", "simJ"]:        
-            cooc, phenindex = make_scaled_cooc(observed, obo, penalty, type)
+        for type, cooc, phenindex in scaled_coocs(observed, obo, penalty):
             write_phenotype_cooc(cooc, phenindex, config.output+"-"+type)
             del cooc, phenindex
         
-        imputed_models = impute_IMPC(models_UA, obo, penalty)
+        imputed_models = impute_IMPC(models_UA, obo, penalty, config.cores)
         write_models(imputed_models, config.output+"-imputed")
 
     if config.action == "phenotypetab":
@@ -167,7 +184,7 @@ if __name__ == "__main__":
         check_file(config.input, required="input")
         check_file(config.oomap, required="oomap")        
         check_file(config.obo)        
-        obo = MinimalObo(config.obo)
+        obo = MinimalObo(config.obo, cache=obo_cache)
         
         # read reference data from the input file
         references, badphens = prep_refs(config.input, config.oomap)        
@@ -192,7 +209,7 @@ if __name__ == "__main__":
         
         check_file(config.input, required="input")
         check_file(config.obo)
-        obo = MinimalObo(config.obo)
+        obo = MinimalObo(config.obo, cache=obo_cache)
         oo = prep_oo(config.input, obo)
         write_oo(oo, config.output)
 
@@ -204,7 +221,7 @@ if __name__ == "__main__":
         check_file(config.gxd)
         
         # load ontology, emapa, and expression mappings
-        obo = MinimalObo(config.obo)
+        obo = MinimalObo(config.obo, cache=obo_cache)
         emp_map = get_emapa_map(config.emapa, obo)        
         gxd = get_gxd(config.gxd, emp_map, tprfpr)
         
@@ -0,0 +1,87 @@
+"""
+Helpers for preparing models in shards, with a pool of processes
+
+Each shard holds models for a subset of keys (e.g. marker ids). A shard
+is prepared by scanning a complete input file and skipping rows with
+keys outside the shard. Results from several shards can then be merged
+into the same order as a serial scan of the input.
+"""
+
+import gc
+import multiprocessing as mp
+from zlib import crc32
+
+
+# state for pool workers, set when a worker process starts
+_worker = dict()
+
+
+def _init_worker(fn, args):
+    """record a function and its additional arguments in a pool worker"""
+
+    _worker["fn"] = fn
+    _worker["args"] = args
+
+
+def _worker_map(item):
+    """apply the recorded function to one item in a pool worker"""
+
+    return _worker["fn"](item, *_worker["args"])
+
+
+def map_ordered(fn, items, args=(), cores=1):
+    """apply a function to a sequence of items, possibly in a pool
+
+    Additional arguments are transferred to each pool worker once, when
+    the worker starts, rather than with each item.
+
+    :param fn: module-level function, called as fn(item, *args)
+    :param items: iterable with items (e.g. shard definitions)
+    :param args: tuple with additional arguments for fn
+    :param cores: integer, number of worker processes
+    :return: list with results, in the same order as items
+    """
+
+    if cores <= 1:
+        return [fn(item, *args) for item in items]
+    with mp.Pool(cores, initializer=_init_worker,
+                 initargs=(fn, args)) as pool:
+        # results can hold many small objects; unpickling them triggers
+        # repeated (and futile) garbage collection passes
+        gc.disable()
+        try:
+            return pool.map(_worker_map, items)
+        finally:
+            gc.enable()
+
+
+def in_shard(key, shard):
+    """determine if a key belongs to a shard
+
+    :param key: string
+    :param shard: None, or 2-tuple with (index, number of shards)
+    :return: logical
+    """
+
+    if shard is None:
+        return True
+    return crc32(key.encode("utf-8")) % shard[1] == shard[0]
+
+
+def merge_shards(shards):
+    """merge dicts of models from several shards into one dict
+
+    :param shards: list of 2-tuples, each with a dict of models and a
+        dict with the rows (in an input file) that first defined them
+    :return: dict of models, in order of first definition
+    """
+
+    order = []
+    for i, (models, first) in enumerate(shards):
+        for position, id in enumerate(models.keys()):
+            order.append((first[id], i, position, id))
+    order.sort()
+    result = dict()
+    for _, i, _, id in order:
+        result[id] = shards[i][0][id]
+    return result
@@ -9,6 +9,7 @@ from scoring.experiment import Experiment
 from phenoscoring.phenotypedatum import PhenotypeDatum
 from phenoscoring.entity import Entity
 from phenoscoring.time import now_timestamp
+from .parallel import map_ordered, in_shard, merge_shards
 
 
 # fetch a dictionary of term redefinitions for MP:0002169 (no abnormal phenotype detected)
@@ -79,154 +80,312 @@ def impc_model(id, category, row, zygosity):
     return result
 
 
-def get_value(row, pthreshold):
-    """get 0/1 signaling if a row is significant."""
-    
-    p_value = get_p_value(row["p_value"])
-    phenotype = row["mp_term_id"].strip()                
-    if p_value < pthreshold:
-        val = 1
-    else:
-        if row["significant"] == "true":
-            val = 0 if phenotype == "MP:0002169" else 1
-        else:
-            val = 0
-    return val
+def value_code(p_value, significant, phenotype, pthreshold):
+    """get 0/1 signaling if a result is significant.
 
+    :param p_value: raw string with a p value
+    :param significant: raw string, 'true' marks a significant result
+    :param phenotype: string with a phenotype id
+    :param pthreshold: float, threshold for significance
+    :return: integer 0/1
+    """
 
-def get_IMPC_hits_summary(datapath, pthreshold):
-    """get an object (parameter)+(MP term), to marker ids (tested, hits)"""
-    
-    tested, hits = dict(), dict()
-    if datapath is None:
-        return tested, hits
-    
-    with open_file(datapath, "rt") as f: 
-        reader = csv.DictReader(f, delimiter=",", quotechar="\"")        
-        for row in reader:
-            # skip over bad data rows
-            if row["status"] != "Success":
-                continue
-            # identify id, phenotype, whether a hit or not
-            parameter = row["parameter_name"].strip()
-            phenotype = row["mp_term_id"].strip()
-            marker = row["marker_accession_id"]
-            if phenotype == "":
-                continue
-            
-            key = parameter+"\t"+phenotype
-            if key not in tested:
-                tested[key] = set()
-                hits[key] = set()
+    if get_p_value(p_value) < pthreshold:
+        return 1
+    if significant == "true":
+        return 0 if phenotype == "MP:0002169" else 1
+    return 0
 
-            tested[key].add(marker)
-            if get_value(row, pthreshold):
-                hits[key].add(marker)
 
-    return tested, hits
+# columns used when parsing IMPC statistical results
+impc_columns = ("status", "parameter_name", "mp_term_id", "p_value",
+                "significant", "phenotype_sex", "zygosity",
+                "marker_accession_id", "marker_symbol",
+                "allele_accession_id", "allele_symbol", "strain_name")
 
 
-def prep_IMPC(datapath, tprfpr, pthreshold, simplify="average"):
-    """parse IMPC statistical results and assemble a set of models.
-    
+def parse_IMPC_rows(rows, header, tprfpr, pthreshold, now, models=True,
+                    summary=True, shard=None, first=None):
+    """parse rows of IMPC statistical results
+
     Args:
-        datapath:    path to MGI raw file            
+        rows:        iterable with rows (lists of strings)
+        header:      list with column names
         tprfpr:      list with two elements (tpr, fpr)
         pthreshold:  float, minimum threshold for significance
-        simplify:    string, method for simplifying multiple data type
-                    (use 'none', 'average', or 'consensus')
+        now:         string, timestamp for phenotype data
+        models:      logical, set False to skip creating models
+        summary:     logical, set False to skip the hits summary
+        shard:       None, or 2-tuple (index, number of shards) to create
+                    models only for a subset of markers
+        first:       None, or dict to record the row numbers at which
+                    models are created
+
+    Returns:
+        3-tuple with a dict of models (without simplification), and
+        two dicts (tested, hits) for a summary of hits
     """
-                
-    models = dict()        
-    if datapath is None:
-        return models
-    
-    now = now_timestamp()
-    base_tpr, base_fpr = tprfpr[0], tprfpr[1]            
+
+    result, tested, hits = dict(), dict(), dict()
+    if models:
+        base_tpr, base_fpr = tprfpr[0], tprfpr[1]
     male = set(["M", "B", "U"])
     female = set(["F", "B", "U"])
-        
+
     def create_models(id, category, zygosity, row):
         """Create a family of model definitions, for sex=FMU, neg_phen=01"""
-        
+
         prefix = "IMPC_" + id + "_" + zygosity + "_"
+        if prefix + "F" in result:
+            return
         for suffix in ["F", "FA", "M", "MA", "U", "UA"]:
             id = prefix + suffix
-            if id not in models:
-                models[id] = impc_model(id, category, row, zygosity)
-                models[id].set_description("sex", sex_code(suffix))
+            if id not in result:
+                result[id] = impc_model(id, category, row, zygosity)
+                if first is not None:
+                    first[id] = rownum
+                result[id].set_description("sex", sex_code(suffix))
                 with_negative = negative_code(suffix)
-                models[id].set_description("neg_phenotypes", with_negative)
-    
-    def add_to_model(datum, id, zygosity, suffix):
-        """add a datum into an existing model definition.
-        
+                result[id].set_description("neg_phenotypes", with_negative)
+
+    def add_set_to_models(datum, prefixes, val, sex):
+        """record a datum into models for alleles and markers
+
         Arguments:
             datum      phenotype and experiment result
-            id, zygosity, suffix
-                       characterization of model
-        """            
-        id = "IMPC_" + id + "_" + zygosity + "_" + suffix        
-        models[id].add(datum)
-    
-    def add_set_to_models(datum, row, val, sex):
-        """helper to add a set of models, for alleles, markers
-        
-        Arguments:
-            datum     phenotype and experiment result
-            row       dict
-            val       value of phenotype (0/1)
-            sex       one-letter code
-        """        
-        zygosity = (row["zygosity"])[:3]
-        zygosity = "hom" if zygosity == "hem" else zygosity            
-        marker = row["marker_accession_id"]
-        allele = row["allele_accession_id"]
+            prefixes   list of model id prefixes
+            val        value of phenotype (0/1)
+            sex        one-letter code
+        """
+        for prefix in prefixes:
+            if val == 1:
+                result[prefix + sex].add(datum)
+            result[prefix + sex + "A"].add(datum)
+
+    ncol = len(header)
+    (i_status, i_parameter, i_phenotype, i_p, i_significant, i_sex,
+     i_zygosity, i_marker, i_marker_symbol, i_allele, i_allele_symbol,
+     i_strain) = [header.index(_) for _ in impc_columns]
+    for rownum, row in enumerate(rows):
+        # mimic DictReader: skip blank lines, pad short rows
+        if len(row) < ncol:
+            if len(row) == 0:
+                continue
+            row = row + [None]*(ncol-len(row))
+        # skip over bad data rows
+        if row[i_status] != "Success": continue
+        phenotype = row[i_phenotype].strip()
+        if phenotype == "": continue
+        parameter = row[i_parameter].strip()
+        value = value_code(row[i_p], row[i_significant], phenotype,
+                           pthreshold)
+
+        # record hits summary
+        if summary:
+            marker = row[i_marker]
+            key = parameter+"\t"+phenotype
+            if key not in tested:
+                tested[key] = set()
+                hits[key] = set()
+            tested[key].add(marker)
+            if value:
+                hits[key].add(marker)
+
+        if not models or row[i_allele_symbol] == "": continue
+        if not in_shard(row[i_marker], shard): continue
+        # redefine some phenotypes
+        if phenotype+" "+parameter in redef:
+            phenotype = redef[phenotype+" "+parameter]
+        if phenotype == "MP:0002169": continue
+
         # perhaps create model definitions
-        create_models(marker, "marker", zygosity, row)
-        create_models(allele, "allele", zygosity, row)
-        # record phenotypes into the models
-        if val == 1:
-            add_to_model(datum, marker, zygosity, sex)
-            add_to_model(datum, allele, zygosity, sex)
-        add_to_model(datum, marker, zygosity, sex+"A")
-        add_to_model(datum, allele, zygosity, sex+"A")
-    
-    with open_file(datapath, "rt") as f: 
-        reader = csv.DictReader(f, delimiter=",", quotechar="\"")        
-        for row in reader:
-            # skip over bad data rows
-            if row["status"] != "Success": continue
-            if row["allele_symbol"] == "": continue                                             
-            phenotype = row["mp_term_id"].strip()
-            if phenotype == "": continue
-            
-            # redefine some phenotypes
-            parameter = row["parameter_name"].strip()
-            if phenotype+" "+parameter in redef:
-                phenotype = redef[phenotype+" "+parameter]
-            if phenotype == "MP:0002169": continue
-            
-            sex = sex_code(row["phenotype_sex"])
-            
-            # identify whether this is a positive or a negative phenotype
-            value = get_value(row, pthreshold)
-            
-            # add data at marker level, allele level, by gender
-            hit = Experiment(value, base_tpr, base_fpr)                     
-            datum = PhenotypeDatum(phenotype, hit, now)                            
-            add_set_to_models(datum, row, value, "U")
-            if sex in male:
-                add_set_to_models(datum, row, value, "M")
-            if sex in female:
-                add_set_to_models(datum, row, value, "F")            
-
-    # some models may have redundant rows (e.g. a phenotype recorded twice)
-    # so collapse into a consensus here
+        zygosity = (row[i_zygosity])[:3]
+        zygosity = "hom" if zygosity == "hem" else zygosity
+        marker, allele = row[i_marker], row[i_allele]
+        if "IMPC_" + allele + "_" + zygosity + "_F" not in result:
+            rowdict = dict(marker_accession_id=marker,
+                           marker_symbol=row[i_marker_symbol],
+                           allele_accession_id=allele,
+                           allele_symbol=row[i_allele_symbol],
+                           strain_name=row[i_strain])
+            create_models(marker, "marker", zygosity, rowdict)
+            create_models(allele, "allele", zygosity, rowdict)
+        prefixes = ["IMPC_" + marker + "_" + zygosity + "_",
+                    "IMPC_" + allele + "_" + zygosity + "_"]
+
+        # add data at marker level, allele level, by gender
+        sex = sex_code(row[i_sex])
+        hit = Experiment(value, base_tpr, base_fpr)
+        datum = PhenotypeDatum(phenotype, hit, now)
+        add_set_to_models(datum, prefixes, value, "U")
+        if sex in male:
+            add_set_to_models(datum, prefixes, value, "M")
+        if sex in female:
+            add_set_to_models(datum, prefixes, value, "F")
+
+    return result, tested, hits
+
+
+def parse_IMPC(datapath, tprfpr, pthreshold, now, models=True,
+               summary=True, shard=None, first=None):
+    """parse IMPC statistical results in a single pass.
+
+    Args:
+        datapath:    path to IMPC raw file
+        (other arguments as in parse_IMPC_rows)
+
+    Returns:
+        3-tuple with a dict of models (without simplification), and
+        two dicts (tested, hits) for a summary of hits, as in
+        get_IMPC_hits_summary
+    """
+
+    if datapath is None:
+        return dict(), dict(), dict()
+
+    with open_file(datapath, "rt") as f:
+        reader = csv.reader(f, delimiter=",", quotechar="\"")
+        header = next(reader, [])
+        return parse_IMPC_rows(reader, header, tprfpr, pthreshold, now,
+                               models, summary, shard, first)
+
+
+def simplify_models(models, simplify="average"):
+    """collapse redundant rows in models (e.g. a phenotype recorded twice)
+
+    Args:
+        models:      dict of Entity objects, modified in place
+        simplify:    string, method for simplifying multiple data type
+                    (use 'none', 'average', or 'consensus')
+    """
+
     if simplify == "consensus":
         for id in models:
-            models[id].consensus()            
+            models[id].consensus()
     elif simplify == "average":
         for id in models:
-            models[id].average()            
+            models[id].average()
     return models
+
+
+def select_all(model):
+    """a filter function that selects any model"""
+
+    return True
+
+
+def prep_IMPC_shard(shard, datapath, tprfpr, pthreshold, now, simplify,
+                    full, summary):
+    """parse IMPC statistical results for one shard of markers
+
+    Args:
+        shard:       None, or 2-tuple (index, number of shards)
+        full:        None, or function to select models that are also
+                    returned without simplification
+        summary:     logical, set True to compute a summary of hits (this
+                    uses all rows and is carried out only in shard 0)
+        (other arguments as in parse_IMPC_rows and simplify_models)
+
+    Returns:
+        5-tuple with dicts: simplified models, models without
+        simplification, row numbers at which models were created, and
+        (tested, hits) for a summary of hits
+    """
+
+    summary = summary and (shard is None or shard[0] == 0)
+    first = dict()
+    models, tested, hits = parse_IMPC(datapath, tprfpr, pthreshold, now,
+                                      True, summary, shard, first)
+    fullmodels = dict()
+    if full is not None:
+        for id, model in models.items():
+            if full(model):
+                fullmodels[id] = model.copy()
+    models = simplify_models(models, simplify)
+    return models, fullmodels, first, tested, hits
+
+
+def prep_IMPC_shards(datapath, tprfpr, pthreshold, simplify="average",
+                     full=None, summary=True, cores=1):
+    """parse IMPC statistical results, possibly in several processes
+
+    With several cores, each process scans the input for one shard of
+    markers (alleles are always in the same shard as their marker) and
+    simplifies its own models. Models are then merged in the order of a
+    serial scan.
+
+    Args:
+        full:        None, or function to select models that are also
+                    returned without simplification
+        summary:     logical, set True to compute a summary of hits
+        cores:       integer, number of processes
+        (other arguments as in prep_IMPC)
+
+    Returns:
+        4-tuple with dicts: simplified models, models without
+        simplification, and (tested, hits) for a summary of hits
+    """
+
+    if datapath is None:
+        return dict(), dict(), dict(), dict()
+
+    shards = [None]
+    if cores > 1:
+        shards = [(i, cores) for i in range(cores)]
+    args = (datapath, tprfpr, pthreshold, now_timestamp(), simplify, full,
+            summary)
+    results = map_ordered(prep_IMPC_shard, shards, args, cores)
+    _, _, _, tested, hits = results[0]
+    if len(results) == 1:
+        return results[0][0], results[0][1], tested, hits
+    models = merge_shards([(_[0], _[2]) for _ in results])
+    fullmodels = merge_shards([(_[1], _[2]) for _ in results])
+    return models, fullmodels, tested, hits
+
+
+def get_IMPC_hits_summary(datapath, pthreshold):
+    """get an object (parameter)+(MP term), to marker ids (tested, hits)"""
+
+    _, tested, hits = parse_IMPC(datapath, None, pthreshold, now_timestamp(),
+                                 models=False)
+    return tested, hits
+
+
+def prep_IMPC(datapath, tprfpr, pthreshold, simplify="average", cores=1):
+    """parse IMPC statistical results and assemble a set of models.
+    
+    Args:
+        datapath:    path to MGI raw file            
+        tprfpr:      list with two elements (tpr, fpr)
+        pthreshold:  float, minimum threshold for significance
+        simplify:    string, method for simplifying multiple data type
+                    (use 'none', 'average', or 'consensus')
+        cores:       integer, number of processes
+    """
+
+    return prep_IMPC_shards(datapath, tprfpr, pthreshold, simplify,
+                            summary=False, cores=cores)[0]
+
+
+def prep_IMPC_all(datapath, tprfpr, pthreshold, simplify="average",
+                  full=None, cores=1):
+    """parse IMPC statistical results once, for several outputs
+
+    Args:
+        datapath:    path to IMPC raw file
+        tprfpr:      list with two elements (tpr, fpr)
+        pthreshold:  float, minimum threshold for significance
+        simplify:    string, method for simplifying multiple data type
+        full:        module-level function to select models that are also
+                    returned without simplification (None to select all)
+        cores:       integer, number of processes
+
+    Returns:
+        4-tuple with dicts: simplified models, models without
+        simplification, and two dicts (tested, hits) for a hits summary
+    """
+
+    if full is None:
+        full = select_all
+    return prep_IMPC_shards(datapath, tprfpr, pthreshold, simplify, full,
+                            True, cores)
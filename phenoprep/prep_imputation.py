@@ -3,9 +3,11 @@ Use phenotype imputation to prepare augment IMPC models for Phenoscoring
 """
 
 import numpy as np
-from copy import deepcopy
+from statistics import mean
+from obo.obosim import jaccard_matrix
 from scoring.experiment import Experiment
 from phenoscoring.phenotypedatum import PhenotypeDatum
+from .parallel import map_ordered
 
 
 def get_UA_models(models, category):
@@ -67,53 +69,77 @@ def ji(a, b):
     return len(a.intersection(b)) / len(a.union(b))
 
 
-def cooc_full(m1, m2, a1, a2):
+def cooc_full(m_ji, a_ji):
     """compute a co-occurance metric.
     
     Arguments:
-        m1   list of models with first phenotype
-        m2   list of models with second phenotype
-        a1   list of ancestors of first phenotype
-        a2   list of ancestors of second phenotype
+        m_ji   jaccard index between sets of models with two phenotypes
+        a_ji   jaccard index between ancestors of two phenotypes
     
     Returns:
         numeric value
     """
-    return ji(m1, m2)*(1-ji(a1, a2))
+    return m_ji*(1-a_ji)
 
 
-def cooc_freq(m1, m2, a1, a2):
-    """Similar to cooc_full, but only uses m1, m2."""
-    return ji(m1, m2)
+def cooc_freq(m_ji, a_ji):
+    """Similar to cooc_full, but only uses models."""
+    return m_ji
 
 
-def cooc_simJ(m1, m2, a1, a2):
-    """Similar to cooc_simJ, but only uses a1, a2."""
-    return ji(a1, a2)
+def cooc_simJ(m_ji, a_ji):
+    """Similar to cooc_full, but only uses ancestors."""
+    return a_ji
 
 
-def make_scaled_cooc(phen2ids, obo, penalty, type="full"):
-    """create a square matrix of co-occurance
+def models_jaccard_matrix(phen2ids, phenotypes):
+    """compute jaccard indexes between sets of models, for all pairs
+    
+    Intersections are obtained from a product of a phenotype-by-model
+    incidence matrix with itself, and unions from the set sizes.
+    
+    Arguments:
+        phen2ids    dict mapping phenotypes to model ids
+        phenotypes  list of phenotypes, determines rows and columns
+    
+    Returns:
+        square numpy array (zero for pairs of empty sets)
+    """
+    
+    modelindex = make_index(set().union(*[phen2ids[_] for _ in phenotypes]))
+    # float32 holds counts exactly and halves the size of the incidence
+    incidence = np.zeros((len(phenotypes), len(modelindex)), dtype=np.float32)
+    for i, phenotype in enumerate(phenotypes):
+        incidence[i, [modelindex[_] for _ in phen2ids[phenotype]]] = 1
+    intersection = np.dot(incidence, incidence.T).astype(float)
+    sizes = intersection.diagonal().copy()
+    union = sizes[:, np.newaxis] + sizes[np.newaxis, :] - intersection
+    result = np.zeros(intersection.shape)
+    np.divide(intersection, union, out=result, where=union > 0)
+    return result
+
+
+def scaled_coocs(phen2ids, obo, penalty, types=("full", "freq", "simJ")):
+    """create square matrices of co-occurance, for several types
+    
+    Jaccard indexes for sets of models and for ancestors are computed
+    once, and then combined for each type.
     
     Arguments:
         phen2ids   dict mapping phenotypes to model ids
         obo        Obo object, used for scaling
         penalty    numeric, a multiplier used for final scaling
-        type       string, use "full", "freq", "simJ" 
+        types      iterable with strings "full", "freq", "simJ"
     
     Returns:
-        square numpy array and a phenotype index
+        generator with tuples (type, square numpy array, phenotype index)
     """
 
-    # determine the cooc scaling function from argument type
-    if type == "full":
-        cooc = cooc_full
-    elif type == "freq":
-        cooc = cooc_freq
-    elif type == "simJ":
-        cooc = cooc_simJ
-    else:
-        raise Exception("invalid cooc type")
+    # determine the cooc scaling functions from argument types
+    coocs = dict(full=cooc_full, freq=cooc_freq, simJ=cooc_simJ)
+    for type in types:
+        if type not in coocs:
+            raise Exception("invalid cooc type")
     
     phenindex = make_index(phen2ids.keys())
     phenotypes = list(phenindex.keys())
@@ -121,26 +147,35 @@ def make_scaled_cooc(phen2ids, obo, penalty, type="full"):
     # get a simple multiplicative factor for scaling in range [0,1]
     penalty_factor = 1-max(0, min(1, penalty))
     
-    # precompute phenotype ancestors
-    ancestors = dict()
-    for p in phenotypes:
-        ancestors[p] = set(obo.ancestors(p))
-        ancestors[p].add(p)
-            
-    # create a matrix of scaled co-occurances
-    numphen = len(phenindex)
-    result = np.zeros((numphen,numphen))    
-    for p1, i1 in phenindex.items():
-        m1, a1 = phen2ids[p1], ancestors[p1]                
-        if len(m1) == 0 or len(a1) == 0:
-            continue
-        for p2, i2 in phenindex.items():
-            m2, a2 = phen2ids[p2], ancestors[p2]                        
-            if len(m2) == 0 or len(a2) == 0:
-                continue
-            result[i1, i2] = cooc(m1, m2, a1, a2)*penalty_factor
-            
-    return result, phenindex
+    # similarity of phenotypes based on models and on ancestors
+    models_ji = models_jaccard_matrix(phen2ids, phenotypes)
+    ancestors_ji = jaccard_matrix(obo, phenotypes)
+    # co-occurance is only defined for phenotypes observed in some models
+    observed = np.array([len(phen2ids[_]) > 0 for _ in phenotypes],
+                        dtype=bool)
+    observed = observed[:, np.newaxis] & observed[np.newaxis, :]
+    
+    for type in types:
+        result = coocs[type](models_ji, ancestors_ji)*penalty_factor
+        result[~observed] = 0
+        yield type, result, phenindex
+
+
+def make_scaled_cooc(phen2ids, obo, penalty, type="full"):
+    """create a square matrix of co-occurance
+    
+    Arguments:
+        phen2ids   dict mapping phenotypes to model ids
+        obo        Obo object, used for scaling
+        penalty    numeric, a multiplier used for final scaling
+        type       string, use "full", "freq", "simJ" 
+    
+    Returns:
+        square numpy array and a phenotype index
+    """
+
+    for _, result, phenindex in scaled_coocs(phen2ids, obo, penalty, [type]):
+        return result, phenindex
             
 
 def make_imputed_model_stubs(models):
@@ -155,13 +190,75 @@ def make_imputed_model_stubs(models):
         
     result = dict()
     for _, model in models.items():
-        newmodel = deepcopy(model)        
+        newmodel = model.copy()
         newmodel.id = "_".join(model.id.split("_")[:-1])+"_IA"        
         newmodel.set_description("imputed_phenotypes", 1)
         result[newmodel.id] = newmodel
     return result
     
     
+def _mean(values):
+    """compute an average, consistently with statistics.mean"""
+    
+    if len(values) == 1 or values.count(values[0]) == len(values):
+        return values[0]
+    return mean(values)
+
+
+def impute_model(model, excluded, cooc, phenindex, phenotypes):
+    """add imputed phenotypes to one Entity object
+    
+    Imputed values for all target phenotypes are computed at once from
+    rows of the co-occurance matrix. Phenotype datums are created only for
+    targets that pass all filters. The result is the same as collecting 
+    one suggestion per (positive phenotype, target) pair and computing a
+    consensus (see impute_one_model).
+    
+    Arguments:
+        model       Entity object
+        excluded    list of phenotype indexes that should not be imputed
+                    (experimentally-determined phenotypes)
+        cooc        numpy array with a weight matrix
+        phenindex   dict mapping phenotypes to indexes in the cooc matrix
+        phenotypes  list of phenotypes, in the order of phenindex
+    
+    Returns:
+        a modified model object with additional phenotypes
+    """
+    
+    positive = [_ for _ in model.data if _.value != 0]
+    model.consensus()
+    if len(positive) == 0:
+        return model
+    
+    # weights for all (positive phenotype, target) pairs 
+    seeds = np.array([phenindex[_.phenotype] for _ in positive], dtype=int)
+    tprs = np.array([_.tpr for _ in positive], dtype=float)
+    fprs = np.array([_.fpr for _ in positive], dtype=float)
+    weights = cooc[seeds, :] * tprs[:, np.newaxis]
+    keep = ~(weights < fprs[:, np.newaxis])
+    keep[np.arange(len(seeds)), seeds] = False
+    keep[:, excluded] = False
+    
+    # targets in the order in which they would be first suggested
+    targets = np.flatnonzero(keep.any(axis=0))
+    first = keep[:, targets].argmax(axis=0)
+    targets = targets[np.lexsort((targets, first))]
+    
+    # consensus of suggestions for each target (all with value 0.5)
+    fprs = fprs.tolist()
+    for j in targets:
+        rows = np.flatnonzero(keep[:, j])
+        tpr = _mean(list(weights[rows, j]))
+        fpr = _mean([fprs[_] for _ in rows])
+        # every suggestion has value 0.5, so they all form the majority
+        tpr = max(fpr, tpr)
+        datum = PhenotypeDatum(phenotypes[j], Experiment(0.5, tpr, fpr),
+                               positive[rows[0]].timestamp)
+        model.data.append(datum)
+    return model
+
+
 def impute_one_model(model, measured, observed, cooc, phenindex):
     """add phenotypes to one Entity object
     
@@ -176,40 +273,55 @@ def impute_one_model(model, measured, observed, cooc, phenindex):
         a modified model object with additional phenotypes
     """
     
-    # set of suggested imputed phenotypes
-    suggestions = []
+    # avoid imputing experimentally-determined phenotypes
+    excluded = [i for target, i in phenindex.items() 
+                if model.id in measured[target]]
+    return impute_model(model, excluded, cooc, phenindex, list(phenindex))
+
+
+def measured_indexes(measured, phenindex):
+    """get a mapping from model ids to indexes of measured phenotypes
     
-    # helper to append PhenotypeDatum objects to the suggestions   
-    def add_suggestions(datum):
-        """add a set of datums to suggestions."""
-        
-        seed = datum.phenotype
-        i = phenindex[seed]
-        for target, j in phenindex.items():            
-            if i == j:
-                continue
-            # avoid imputing experimentally-determined phenotypes
-            if model.id in measured[target]:
-                continue
-            e = Experiment(0.5, datum.tpr*cooc[i,j], datum.fpr)
-            if e.tpr < e.fpr:
-                continue
-            d = PhenotypeDatum(target, e, datum.timestamp)            
-            suggestions.append(d)            
-        
-    # create suggestions by imputing from positive phenotypes
-    for datum in model.data:        
-        if datum.value == 0:
-            continue
-        add_suggestions(datum)        
-        
-    # add suggestions into the model, finish by summarizing phenotypes
-    for x in suggestions:
-        model.add(x)            
-    return model.consensus()
+    Arguments:
+        measured    dict mapping phenotypes to a set of model ids
+        phenindex   dict mapping phenotypes to indexes
+    
+    Returns:
+        dict mapping model ids to lists of indexes
+    """
+    
+    result = dict()
+    for phenotype, ids in measured.items():
+        i = phenindex[phenotype]
+        for id in ids:
+            if id not in result:
+                result[id] = []
+            result[id].append(i)
+    return result
 
 
-def impute_IMPC(models, obo, penalty):
+def impute_models(models, excluded, cooc, phenindex, obo):
+    """impute phenotypes and trim ancestors for a list of models
+    
+    Arguments:
+        models      list of Entity objects
+        excluded    dict mapping model ids to lists of phenotype indexes
+        (other arguments as in impute_model)
+    
+    Returns:
+        list with modified model objects
+    """
+    
+    phenotypes = list(phenindex)
+    for model in models:
+        original_phenotypes = set([_.phenotype for _ in model.data])
+        impute_model(model, excluded.get(model.id, []), cooc, phenindex,
+                     phenotypes)
+        model.trim_ancestors(obo, keep=original_phenotypes)
+    return models
+
+
+def impute_IMPC(models, obo, penalty, cores=1, batch_size=256):
     """prepare a new set of IMPC models with imputed phenotypes
     
     Arguments:
@@ -217,6 +329,8 @@ def impute_IMPC(models, obo, penalty):
         obo        Obo object
         penalty    numeric in range [0,1]; use high numbers to give less
                    weight to imputed phenotypes
+        cores      integer, number of processes
+        batch_size integer, number of models in one work unit
     """
         
     # make a set of models that will eventually contain imputed
@@ -227,13 +341,17 @@ def impute_IMPC(models, obo, penalty):
     
     # get a co-occurance matrix
     cooc, phenindex = make_scaled_cooc(observed, obo, penalty)
+    excluded = measured_indexes(measured, phenindex)
     
-    # impute phenotypes, one model at a time
-    for key, model in result.items():
-        original_phenotypes = set([_.phenotype for _ in model.data])            
-        result[key] = impute_one_model(model, measured, observed, 
-                                       cooc, phenindex)
-        result[key].trim_ancestors(obo, keep=original_phenotypes)
+    # impute phenotypes, in batches of models
+    ids = list(result.keys())
+    batches = [[result[_] for _ in ids[start:start+batch_size]]
+               for start in range(0, len(ids), batch_size)]
+    if cores > 1:
+        obo.index()
+    args = (excluded, cooc, phenindex, obo)
+    for batch in map_ordered(impute_models, batches, args, cores):
+        for model in batch:
+            result[model.id] = model
     
     return result
-
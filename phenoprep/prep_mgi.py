@@ -8,6 +8,7 @@ from tools.files import open_file
 from scoring.experiment import Experiment
 from phenoscoring.phenotypedatum import PhenotypeDatum
 from phenoscoring.entity import Entity
+from .parallel import map_ordered, in_shard, merge_shards
 
 
 # prefix used for all MGI models
@@ -31,44 +32,98 @@ def mgi_model(id, category, marker_id=None, allele_id=None,
     return result
 
 
-def prep_genotype_models(datapath, tprfpr, obo):
-    """scan data from a file and create genotype-level models."""
-    
+def parse_genotype_rows(rows, tprfpr, shard=None, first=None):
+    """create genotype-level models from rows of a MGI file.
+
+    :param rows: iterable with dicts (rows from a csv.DictReader)
+    :param tprfpr: tuple with two elements (tpr, fpr)
+    :param shard: None, or 2-tuple (index, number of shards) to create
+        models only for a subset of genotypes
+    :param first: None, or dict to record row numbers at which models
+        are created
+    :return: dict with models, without consensus and trimming
+    """
+
     result = dict()
-    
-    hit = Experiment(1, tprfpr[0], tprfpr[1])      
-    with open_file(datapath, "rt") as f: 
+
+    hit = Experiment(1, tprfpr[0], tprfpr[1])
+    for rownum, row in enumerate(rows):
+        genotype_id = row["MGI_Genotype_Accession_ID"]
+        # skip rows that are malformed or don't attribute to PubMed
+        if genotype_id is None or row["PubMed_ID"] in (None, ""):
+            continue
+        if not in_shard(genotype_id, shard):
+            continue
+        # let default zygosity be homozygous, unless description has <+>
+        zygosity = "hom"
+        if re.search("<\+>", row["Allelic_Composition"]):
+            zygosity = "het"
+        pubmed_str = "PUBMED:"+row["PubMed_ID"]
+        datum = PhenotypeDatum(row["Mammalian_Phenotype_ID"], hit, pubmed_str)
+        # add data genotype level
+        mid = mgi_prefix + genotype_id + "_" + zygosity + "_U"
+        if mid not in result:
+            marker_id = row["MGI_Marker_Accession_ID"]
+            background = row["Genetic_Background"]
+            result[mid] = mgi_model(mid, "genotype",
+                                    marker_id=marker_id,
+                                    allele_id=row["Allele_ID"],
+                                    allele_symbol=row["Allele_Symbol"],
+                                    background=background,
+                                    zygosity=zygosity)
+            if first is not None:
+                first[mid] = rownum
+        result[mid].add(datum)
+
+    return result
+
+
+def prep_genotype_shard(shard, datapath, tprfpr, obo):
+    """create and summarize genotype-level models for one shard
+
+    :param shard: None, or 2-tuple (index, number of shards)
+    :param datapath: path to MGI raw file
+    :param tprfpr: tuple with two elements (tpr, fpr)
+    :param obo: Obo object for MGI mouse ontology
+    :return: 2-tuple with a dict of models, and a dict with row numbers at
+        which models were created
+    """
+
+    first = dict()
+    with open_file(datapath, "rt") as f:
         reader = csv.DictReader(f, delimiter="\t", quotechar="\"")
-        for row in reader:
-            genotype_id = row["MGI_Genotype_Accession_ID"]            
-            # skip rows that are malformed or don't attribute to PubMed
-            if genotype_id is None or row["PubMed_ID"] in (None, ""):
-                continue                        
-            # let default zygosity be homozygous, unless description has <+>
-            zygosity = "hom"
-            if re.search("<\+>", row["Allelic_Composition"]):
-                zygosity = "het"
-            pubmed_str = "PUBMED:"+row["PubMed_ID"]
-            datum = PhenotypeDatum(row["Mammalian_Phenotype_ID"], hit, pubmed_str)
-            # add data genotype level
-            mid = mgi_prefix + genotype_id + "_" + zygosity + "_U"
-            if mid not in result:
-                marker_id = row["MGI_Marker_Accession_ID"]
-                background = row["Genetic_Background"]
-                result[mid] = mgi_model(mid, "genotype", 
-                                        marker_id=marker_id,
-                                        allele_id=row["Allele_ID"],
-                                        allele_symbol=row["Allele_Symbol"],
-                                        background=background,
-                                        zygosity=zygosity)
-            result[mid].add(datum)
-    
+        result = parse_genotype_rows(reader, tprfpr, shard, first)
+
     # summarize the model entities (consensus and trimming)
-    for mid in result.keys():        
+    for mid in result.keys():
         result[mid].consensus()
         result[mid].trim_ancestors(obo)
 
-    return result
+    return result, first
+
+
+def prep_genotype_models(datapath, tprfpr, obo, cores=1):
+    """scan data from a file and create genotype-level models.
+
+    With several cores, each process scans the input for one shard of
+    genotypes. Models are then merged in the order of a serial scan.
+
+    :param datapath: path to MGI raw file
+    :param tprfpr: tuple with two elements (tpr, fpr)
+    :param obo: Obo object for MGI mouse ontology
+    :param cores: integer, number of processes
+    :return: dict with models
+    """
+
+    shards = [None]
+    if cores > 1:
+        shards = [(i, cores) for i in range(cores)]
+        obo.index()
+    results = map_ordered(prep_genotype_shard, shards,
+                          (datapath, tprfpr, obo), cores)
+    if len(results) == 1:
+        return results[0][0]
+    return merge_shards(results)
 
 
 def prep_marker_models(models):
@@ -91,13 +146,14 @@ def prep_marker_models(models):
     return result
 
 
-def prep_MGI(datapath, tprfpr, obo):
+def prep_MGI(datapath, tprfpr, obo, cores=1):
     """scan a MGI rpt file and define models and their phenotypes.
     
     Args:            
         datapath:  path to MGI raw file    
         tprfpr:    tuple with two elements (tpr, fpr)
         obo:       Obo object for MGI mouse ontology
+        cores:     integer, number of processes
     
     Return:
         iterable object for models, including phenotype data
@@ -107,7 +163,7 @@ def prep_MGI(datapath, tprfpr, obo):
         return dict()
     
     # create genotypes models and marker models
-    models = prep_genotype_models(datapath, tprfpr, obo)
+    models = prep_genotype_models(datapath, tprfpr, obo, cores)
     marker_models = prep_marker_models(models)
     
     # return both put together    
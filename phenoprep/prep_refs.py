@@ -281,6 +281,7 @@ def prep_tech_models(references, tprfpr, obo, seed=0):
     # prepare a factory class for control models
     now = now_timestamp()    
     random.seed(seed)
+    obo.precompute_closures()
     factory = TechModelFactory(tprfpr, now, obo)
        
     result_0, result_1 = dict(), dict()        
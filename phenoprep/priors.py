@@ -4,7 +4,7 @@ Functions to compute phenotype frequencies (priors) from sets of Entities.
    
 from phenoscoring.entity import filter_entities_cat   
 from scoring.representation import Representation
-from copy import deepcopy
+from scoring.imputation import impute_sums
 
 
 def counts_p(freqcounts, n, dark):
@@ -45,19 +45,19 @@ def get_priors_from_models(models, categories, obo, dark=1):
     all = [obj for _, obj in models.items()]
     hits = filter_entities_cat(all, categories)
     
-    # transfer phenotypes into representations
+    # transfer phenotypes into concise representations
+    obo.precompute_closures()
     obodefaults = dict.fromkeys(obo.ids(), 0)
-    freqcounts = dict.fromkeys(list(obo.ids()), dark)
-    for entity in hits:
-        # prepare concise representations
+    reps = [None] * len(hits)
+    for i, entity in enumerate(hits):
         rep = Representation(name=entity.id)
         for datum in entity.data:
            rep.set(datum.phenotype, datum.value)
-        # convert to complete representation
-        rep.impute(obo, obodefaults)
-        # count phenotypes
-        for phenotype in obo.ids():
-            freqcounts[phenotype] += rep.data[phenotype]        
+        reps[i] = rep
+    # impute complete representations and count phenotypes
+    phenotypes = obo.ids()
+    sums = impute_sums(obo, obodefaults, reps, phenotypes, initial=dark)
+    freqcounts = dict(zip(phenotypes, sums.tolist()))
     
     # convert counts into frequencies
     result = counts_p(freqcounts, len(hits), dark)
@@ -79,17 +79,19 @@ def get_priors_from_reps(reps, obo, dark=1, impute=True):
     """
     
     # transfer phenotypes into representations
-    obodefaults = dict.fromkeys(obo.ids(), 0)
-    freqcounts = dict.fromkeys(list(obo.ids()), dark)
-    for _, rep in reps.items():
-        # prepare a full representation
-        thisrep = rep
-        if impute:
-            thisrep = deepcopy(rep)
-            thisrep.impute(obo, obodefaults)        
-        # count phenotypes
-        for phenotype in obo.ids():
-            freqcounts[phenotype] += thisrep.data[phenotype]        
+    if impute:
+        obo.precompute_closures()
+        obodefaults = dict.fromkeys(obo.ids(), 0)
+        phenotypes = obo.ids()
+        sums = impute_sums(obo, obodefaults, reps.values(), phenotypes,
+                           initial=dark)
+        freqcounts = dict(zip(phenotypes, sums.tolist()))
+    else:
+        freqcounts = dict.fromkeys(list(obo.ids()), dark)
+        for _, rep in reps.items():
+            # count phenotypes
+            for phenotype in obo.ids():
+                freqcounts[phenotype] += rep.data[phenotype]
     
     # convert counts into frequencies
     result = counts_p(freqcounts, len(reps), dark)    
@@ -63,11 +63,18 @@ def write_model_phenotypes(models, outfile, exclude=["id"]):
     # get all column names (except id, which will be entered separately)
     colnames = get_colnames(ModelPhenotypeTable, exclude)    
         
+    # datums can be shared between models, so format each only once
+    formatted = dict()
     with open_file(outfile, "wt") as f:        
         fwrite(f, "id\t"+ "\t".join(colnames))
-        for key, object in models.items():            
+        for key, object in models.items():
+            lines = []
             for d in object.data:
-                fwrite(f, object.id + "\t" + format_line(d, colnames))
+                if id(d) not in formatted:
+                    formatted[id(d)] = format_line(d, colnames)
+                lines.append(object.id + "\t" + formatted[id(d)])
+            if len(lines) > 0:
+                fwrite(f, "\n".join(lines))
 
 
 def write_models(models, outprefix):
@@ -23,7 +23,8 @@ parser.add_argument("action", action="store",
                     help="Type of action to perform", 
                     choices=["build", "update", "explain",
                              "clearmodels", "remove",
-                             "recompute", "export", "representations"])
+                             "recompute", "export", "representations",
+                             "query", "ontologydiff", "add_references"])
 
 # output database
 parser.add_argument("--db", action="store", required=True,
@@ -34,10 +35,14 @@ parser.add_argument("--reset", action="store_true", default=False,
                     help="delete existing database")
 parser.add_argument("--quiet", action="store_true", default=False,
                     help="avoid all log messages")
+parser.add_argument("--skip_obo_cache", action="store_true", default=False,
+                    help="avoid using a compiled cache next to the obo file")
 
 # inputs for building database
 parser.add_argument("--obo", action="store", 
                     help="ontology for model phenotypes")
+parser.add_argument("--obo_previous", action="store",
+                    help="previous version of ontology (for ontologydiff)")
 parser.add_argument("--reference_phenotypes", action="store", 
                     help="path to file with reference phenotypes")
 parser.add_argument("--phenotype_frequencies", action="store",
@@ -53,6 +58,9 @@ parser.add_argument("--model_descriptions", action="store",
 parser.add_argument("--reference_neighbors_k", action="store",
                     type=int, default=5,
                     help="number of neighbors for defining specific phenotypes")
+parser.add_argument("--reference_neighbors_method", action="store",
+                    default="exact", choices=["exact", "lsh"],
+                    help="exact or approximate (lsh) search for neighbors")
 parser.add_argument("--reference_missing_factor", action="store",
                     type=float, default=0.5,
                     help="multiplier for unspecified phenotypes in references")
@@ -99,6 +107,18 @@ parser.add_argument("--reference", action="store",
                     help="reference for detailed calculation log")
 
 
+# inputs for querying scores
+parser.add_argument("--score", action="store", default="general",
+                    choices=["general", "specific"],
+                    help="score used to rank query results")
+parser.add_argument("--top", action="store", type=int, default=10,
+                    help="number of query results for each model/reference")
+parser.add_argument("--min_general", action="store", type=float, default=0,
+                    help="minimum general score in query results")
+parser.add_argument("--min_specific", action="store", type=float, default=0,
+                    help="minimum specific score in query results")
+
+
 # inputs for exporting tables
 parser.add_argument("--table", action="store",                     
                     help="name of table to export")
@@ -111,12 +131,17 @@ parser.add_argument("--table", action="store",
 if __name__ == "__main__":
         
     config = parser.parse_args()
+    config.obo_cache = not config.skip_obo_cache
             
     pipeline = Phenoscoring(config)
     if config.action == "build":
         # create a new sqlite database with references
         pipeline.build()
         
+    if config.action == "add_references":
+        # add new references to an existing database
+        pipeline.add_references()
+
     if config.action == "clearmodels":
         # remove all models and model scores from the database
         pipeline.clearmodels()  
@@ -137,6 +162,14 @@ if __name__ == "__main__":
         # write a database table into a tsv file
         pipeline.export()
         
+    if config.action == "query":
+        # write top-scoring models for references, or vice versa
+        pipeline.query()
+
+    if config.action == "ontologydiff":
+        # refresh references and scores affected by an ontology upgrade
+        pipeline.ontologydiff()
+
     if config.action == "representations":
         # compute complete representations for references and models
         pipeline.export_representations()
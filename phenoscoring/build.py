@@ -3,18 +3,20 @@ Functions used during build of a Phenoscoring database.
 """
 
 import csv
+import numpy as np
 from db.generator import DBGenerator
 from .dbtables import ReferenceConcisePhenotypeTable
 from .dbtables import PhenotypeFrequencyTable
 from .dbtables import ReferencePriorsTable
 from .dbtables import ReferenceNeighborsTable
-from .dbhelpers import get_phenotype_priors
-from .runner import run_packets
+from .dbtables import ReferenceCompletePhenotypeTable
+from .dbhelpers import get_phenotype_priors, get_ref_priors
 from scoring.representation import Representation
 from scoring.referenceset import ReferenceSet
 from scoring.referencematrix import ReferenceMatrix
+from scoring.imputation import impute_chunks
 from tools.files import open_file
-from .specificity import SpecificityPacket
+from .specificity import SpecificityPacket, run_specificity
 
 
 def make_ref_priors(dbpath, prior=0.01):
@@ -36,6 +38,31 @@ def fill_ref_priors(dbpath, priors):
     for key, value in priors.items():            
         model.add(key, value)
     model.save()
+
+
+def update_ref_priors(dbpath, prior=0.01):
+    """add priors for new references and adjust the prior for null
+
+    References that already have priors in the db keep them. The null
+    prior is computed as in make_ref_priors.
+
+    :param dbpath: path to phenoscoring db
+    :param prior: number, prior for new references
+    :return: set with names of references with new or changed priors
+    """
+
+    current = get_ref_priors(dbpath)
+    priors = make_ref_priors(dbpath, prior)
+    del priors["null"]
+    for key in priors.keys():
+        if key in current:
+            priors[key] = current[key]
+    priors["null"] = max(prior, 1-sum(priors.values()))
+
+    changed = set([k for k, v in priors.items() if current.get(k) != v])
+    ReferencePriorsTable(dbpath).delete("id", list(changed))
+    fill_ref_priors(dbpath, {k: priors[k] for k in changed})
+    return changed
    
 
 def get_reference_neighbors(dbpath, k):
@@ -58,12 +85,13 @@ def get_concise_refdict(dbpath):
     
     refdict = dict()
     refdict["null"] = Representation(name="null")
-    refgenerator = DBGenerator(ReferenceConcisePhenotypeTable(dbpath))
-    for row in refgenerator.next():
-        rowid = row["id"]
-        if rowid not in refdict:
-            refdict[rowid] = Representation(name=rowid)
-        refdict[rowid].set(row["phenotype"], row["value"])    
+    refgenerator = DBGenerator(ReferenceConcisePhenotypeTable(dbpath),
+                               fieldnames=("id", "phenotype", "value"))
+    for rows in refgenerator.batches():
+        for rowid, phenotype, value in rows:
+            if rowid not in refdict:
+                refdict[rowid] = Representation(name=rowid)
+            refdict[rowid].set(phenotype, value)
     return refdict
     
 
@@ -76,6 +104,7 @@ def prep_refdict(dbpath, obo, missing_factor):
     refdict = get_concise_refdict(dbpath)    
     phen_priors = get_phenotype_priors(dbpath)
     missing_factor = min(1, missing_factor)
+    obo.precompute_closures()
                 
     # impute and adjust values using the ontology     
     for id in refdict.keys():         
@@ -119,6 +148,54 @@ def prep_refset(dbpath, obo, ref_priors, missing_factor):
     return dict2referenceset(refdict, obo.ids(), ref_priors)
 
 
+def prep_refmatrix(dbpath, obo, ref_priors, missing_factor):
+    """read concise references, impute, and compile a matrix.
+
+    This gives the same result as prep_refset followed by conversion
+    into a ReferenceMatrix, but imputes references in batches and
+    applies the missing factor with array masks.
+
+    :param dbpath: path to sqlite db
+    :param obo: object of class Obo
+    :param ref_priors: dictionary linking references to numbers
+    :param missing_factor: number, used to set reference values that are
+        not explicitly define
+    :return: ReferenceMatrix object
+    """
+
+    features = obo.ids()
+    phen_priors = get_phenotype_priors(dbpath)
+    if len([_ for _ in features if _ not in phen_priors]) > 0:
+        refset = prep_refset(dbpath, obo, ref_priors, missing_factor)
+        return ReferenceMatrix(refset, refset.row_names)
+
+    refdict = get_concise_refdict(dbpath)
+    for id in refdict.keys():
+        if id not in ref_priors:
+            raise Exception("representation is not compatible")
+    missing_factor = min(1, missing_factor)
+    obo.precompute_closures()
+
+    names = list(ref_priors.keys())
+    positions = [i for i, _ in enumerate(names) if _ in refdict]
+    reps = [refdict[names[_]] for _ in positions]
+    null = np.array([_.name == "null" for _ in reps])
+    priors = np.array([phen_priors[_] for _ in features])
+    penalize = priors < 1
+
+    # impute and penalize items that were not set to anything explicitly
+    data = np.zeros((len(features), len(names)), order="F")
+    for start, chunk in impute_chunks(obo, phen_priors, reps, features):
+        end = start + chunk.shape[0]
+        mask = chunk == priors[np.newaxis, :]
+        mask &= penalize[np.newaxis, :] | null[start:end, np.newaxis]
+        chunk = np.where(mask, priors*missing_factor, chunk)
+        data[:, positions[start:end]] = chunk.T
+
+    column_priors = [ref_priors[_] for _ in names]
+    return ReferenceMatrix.from_array(data, features, names, column_priors)
+
+
 def fill_phenotype_frequency_table(dbpath, datapath):
     """Transfer phenotype frequencies from a file into the database."""
     
@@ -163,11 +240,11 @@ def fill_complete_reference_table(dbpath, obo, config):
     fill_ref_priors(dbpath, ref_priors) 
            
     missing_factor = config.reference_missing_factor    
-    refset = prep_refset(dbpath, obo, ref_priors, missing_factor)        
+    refset = prep_refmatrix(dbpath, obo, ref_priors, missing_factor)
     k = config.reference_neighbors_k        
+    method = config.reference_neighbors_method
     # create a specificity packet for the null model
-    refset = ReferenceMatrix(refset, refset.row_names)
-    packet_null = SpecificityPacket(dbpath, refset, k)    
+    packet_null = SpecificityPacket(dbpath, refset, k, method)    
     packet_null.add("null")    
     packet_null.run()
     del packet_null
@@ -176,12 +253,188 @@ def fill_complete_reference_table(dbpath, obo, config):
     # a subset of features - slimmed-down version of refset
     refset = slim_refset(refset)    
 
-    # create an array of packets, each containing some references
-    n = 1 if refset.n_references() < 64 else config.cores
-    packets = [SpecificityPacket(dbpath, refset, k) for _ in range(n)]
-    for i, refname in enumerate(refset.columns.keys()):
-        if refname == "null":
-            continue
-        packets[i%n].add(refname)
-    run_packets(packets, config.cores)
+    # compute specific representations for all other references
+    refnames = [_ for _ in refset.column_names if _ != "null"]
+    run_specificity(dbpath, refset, k, refnames, config.cores, method)
+
+
+
+# ###########################################################################
+# Functions used to refresh parts of an existing database
+
+
+def varies_only_with(refmatrix, references, block_size=256):
+    """determine if some features vary only through a set of references
+
+    :param refmatrix: ReferenceMatrix object
+    :param references: array with column indexes of references
+    :param block_size: integer, number of columns to process at a time
+    :return: logical, True if some feature holds equal values across all
+        columns except those of the specified references
+    """
+
+    others = np.setdiff1d(np.arange(refmatrix.n_references()), references)
+    if len(others) == 0:
+        return True
+    data = refmatrix.data
+    low = np.full(refmatrix.n_features(), np.inf)
+    high = np.full(refmatrix.n_features(), -np.inf)
+    for start in range(0, len(others), block_size):
+        block = data[:, others[start:start+block_size]]
+        low = np.minimum(low, block.min(axis=1))
+        high = np.maximum(high, block.max(axis=1))
+    return bool(np.any(high - low <= 1e-16))
+
+
+def compare_all_neighbors(refmatrix, neighbors, references, others, k,
+                          method="exact"):
+    """identify references whose neighbors differ from records in the db
+
+    :param refmatrix: ReferenceMatrix object, with current data
+    :param neighbors: dict mapping references to lists of neighbors
+    :param references: set of references with changed data or priors
+    :param others: list of references to compare
+    :param k: integer, number of neighbors
+    :param method: string, 'exact' or 'lsh' search for neighbors
+    :return: set with references from others
+    """
+
+    if method == "lsh":
+        current = refmatrix.approximate_nearest_neighbors(k, others)
+    else:
+        current = refmatrix.all_nearest_neighbors(k, others)
+    result = set()
+    for refname in others:
+        ref_neighbors = current[refname]
+        if ref_neighbors != neighbors.get(refname, []):
+            result.add(refname)
+        elif len(references.intersection(ref_neighbors)) > 0:
+            result.add(refname)
+    return result
+
+
+def expand_neighbor_references(refmatrix, neighbors, references, k,
+                               method="exact", block_size=256,
+                               tolerance=1e-9):
+    """identify references whose neighbors may involve some references
+
+    A reference keeps its recorded neighbors if none of those neighbors
+    have changed and if all the changed references are farther away than
+    its k-th recorded neighbor. This requires distances from the changed
+    references to all references, and one distance per reference to its
+    k-th neighbor. When some features vary only through the changed
+    references, distances between all other references differ from those
+    used to record the neighbors; neighbors are then recomputed in full.
+
+    :param refmatrix: ReferenceMatrix object, with current data
+    :param neighbors: dict mapping references to lists of neighbors, as
+        recorded in the db
+    :param references: set of references with changed data or priors
+    :param k: integer, number of neighbors
+    :param method: string, 'exact' or 'lsh' search for neighbors
+    :param block_size: integer, number of references to process at a time
+    :param tolerance: number, margin for comparing distances, must exceed
+        rounding differences between distance schemes
+    :return: set with references, including the input references and also
+        other references whose neighbors may differ from those recorded in
+        the db, or that have some of the input references as neighbors
+    """
+
+    references = set(references)
+    result = set(references)
+    columns = refmatrix.columns
+    changed = np.array([columns[_] for _ in references if _ in columns],
+                       dtype=int)
+    others = [_ for _ in refmatrix.column_names
+              if _ != "null" and _ not in references]
+    if varies_only_with(refmatrix, changed, block_size):
+        return result.union(compare_all_neighbors(refmatrix, neighbors,
+                                                  references, others, k,
+                                                  method))
+
+    # references with incomplete records, or with changed neighbors
+    candidates = []
+    for refname in others:
+        ref_neighbors = neighbors.get(refname, [])
+        if len(ref_neighbors) < k or "" in ref_neighbors:
+            result.add(refname)
+        elif len(references.intersection(ref_neighbors)) > 0:
+            result.add(refname)
+        elif any(_ not in columns for _ in ref_neighbors):
+            result.add(refname)
+        else:
+            candidates.append(refname)
+    if len(candidates) == 0 or len(changed) == 0:
+        return result
+
+    data = refmatrix.data
+    norms = np.where(refmatrix.data_norms > 0, refmatrix.data_norms, 1.0)
+    sources = np.array([columns[_] for _ in candidates], dtype=int)
+    kth = np.array([columns[neighbors[_][-1]] for _ in candidates], dtype=int)
+
+    # distances from candidates to their k-th recorded neighbors
+    thresholds = np.zeros(len(sources))
+    for start in range(0, len(sources), block_size):
+        a = sources[start:start+block_size]
+        b = kth[start:start+block_size]
+        products = np.einsum("ij,ij->j", data[:, a], data[:, b])
+        thresholds[start:start+len(a)] = 1.0 - products / (norms[a]*norms[b])
+
+    # smallest distances from the changed references to candidates
+    nearest = np.full(len(sources), np.inf)
+    for start in range(0, len(changed), block_size):
+        block = changed[start:start+block_size]
+        products = np.dot(data[:, block].T, data)[:, sources]
+        products /= norms[block, np.newaxis] * norms[np.newaxis, sources]
+        nearest = np.minimum(nearest, 1.0 - products.max(axis=0))
+
+    for i in np.flatnonzero(nearest <= thresholds + tolerance):
+        result.add(candidates[i])
+    return result
+
+
+def refresh_complete_reference_table(dbpath, obo, config, references):
+    """recompute complete representations for some references
+
+    Complete representations are recomputed for the null reference, for
+    the specified references, and for references whose nearest neighbors
+    change or include the specified references. Other references keep
+    their existing records.
+
+    :param dbpath: path to phenoscoring db
+    :param obo: object of class MinimalObo
+    :param config: object with configurations, including
+        reference_neighbors_k, reference_neighbors_method,
+        reference_missing_factor, cores
+    :param references: iterable with names of references with changed
+        concise representations, changed interpretation, or changed
+        priors
+    :return: set with names of references that were recomputed
+    """
+
+    k = config.reference_neighbors_k
+    method = config.reference_neighbors_method
+    ref_priors = get_ref_priors(dbpath)
+    missing_factor = config.reference_missing_factor
+    refset = prep_refmatrix(dbpath, obo, ref_priors, missing_factor)
+
+    # the null model always holds values for all phenotypes
+    ReferenceCompletePhenotypeTable(dbpath).delete("id", ["null"])
+    packet_null = SpecificityPacket(dbpath, refset, k, method)
+    packet_null.add("null")
+    packet_null.run()
+    del packet_null
+
+    refset = slim_refset(refset)
+    neighbors = get_reference_neighbors(dbpath, k)
+    references = set(references).intersection(refset.columns.keys())
+    references = expand_neighbor_references(refset, neighbors, references,
+                                            k, method)
+    references.discard("null")
+
+    refnames = sorted(references)
+    ReferenceCompletePhenotypeTable(dbpath).delete("id", refnames)
+    ReferenceNeighborsTable(dbpath).delete("id", refnames)
+    run_specificity(dbpath, refset, k, refnames, config.cores, method)
 
+    return references
@@ -51,7 +51,7 @@ class PhenocomputePacket:
         config = self.config
         dbpath = config.db
         # load the ontology
-        obo = MinimalObo(config.obo)
+        obo = MinimalObo(config.obo, cache=config.obo_cache)
         # prepare information about references
         self.phen_priors = get_phenotype_priors(dbpath)
         self.ref_priors = get_ref_priors(dbpath, self.references)        
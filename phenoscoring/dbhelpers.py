@@ -6,21 +6,24 @@ from copy import deepcopy
 from db.generator import DBGenerator
 from scoring.evidence import evidence_update
 from scoring.referenceset import ReferenceSet
-from scoring.representation import Representation
+from scoring.representation import Representation, OverlayRepresentation
 from .dbtables import PhenotypeFrequencyTable, ReferencePriorsTable
 from .dbtables import ModelDescriptionTable, ModelScoreTable
 from .dbtables import ModelPhenotypeTable
+from .dbtables import ReferenceConcisePhenotypeTable
 from .dbtables import ReferenceCompletePhenotypeTable
 
 
 def get_phenotype_priors(dbpath):
     """Create a dict with prior probabilities for all phenotypes."""
                     
-    generator = DBGenerator(PhenotypeFrequencyTable(dbpath))    
+    generator = DBGenerator(PhenotypeFrequencyTable(dbpath),
+                            fieldnames=("phenotype", "frequency"))
     result = dict()
-    for row in generator.next():
-        result[row["phenotype"]] = float(row["frequency"])
-        
+    for rows in generator.batches():
+        for phenotype, frequency in rows:
+            result[phenotype] = float(frequency)
+
     return result
 
 
@@ -45,11 +48,13 @@ def get_ref_priors(dbpath, references=None):
     :return: dictionary mapping references to prior probabilities
     """
                         
-    generator = DBGenerator(ReferencePriorsTable(dbpath))    
+    generator = DBGenerator(ReferencePriorsTable(dbpath),
+                            fieldnames=("id", "value"))
     result = dict()
-    for row in generator.next():
-        if references is None or row["id"] in references:
-            result[row["id"]] = float(row["value"])        
+    for rows in generator.batches():
+        for id, value in rows:
+            if references is None or id in references:
+                result[id] = float(value)
     return result
 
 
@@ -62,6 +67,45 @@ def delete_model_scores(dbpath, modelnames):
     model.delete("model", list(to_delete))    
 
 
+def delete_reference_scores(dbpath, refnames):
+    """drop rows from the model scores pertaining to certain references."""
+
+    model = ModelScoreTable(dbpath)
+    current = model.unique("reference")
+    to_delete = set(refnames).intersection(current)
+    model.delete("reference", list(to_delete))
+
+
+def get_phenotype_sets(table, id_field="id"):
+    """collect sets of phenotypes associated with ids in a table
+
+    :param table: DBTable object with fields id_field and phenotype
+    :param id_field: string, name of field with ids
+    :return: dict mapping ids to sets of phenotypes
+    """
+
+    result = dict()
+    generator = DBGenerator(table, fieldnames=(id_field, "phenotype"))
+    for rows in generator.batches():
+        for id, phenotype in rows:
+            if id not in result:
+                result[id] = set()
+            result[id].add(phenotype)
+    return result
+
+
+def get_reference_phenotypes(dbpath):
+    """get a dict mapping references to sets of concise phenotypes."""
+
+    return get_phenotype_sets(ReferenceConcisePhenotypeTable(dbpath))
+
+
+def get_model_phenotypes(dbpath):
+    """get a dict mapping models to sets of (raw) phenotypes."""
+
+    return get_phenotype_sets(ModelPhenotypeTable(dbpath))
+
+
 def delete_models(dbpath, modelnames):
     """drop all data pertaining to certain models"""
         
@@ -76,9 +120,11 @@ def get_complete_null(dbpath):
     
     result = Representation(name="null")
     tab = ReferenceCompletePhenotypeTable(dbpath)
-    generator = DBGenerator(tab, where=dict(id="null"))    
-    for row in generator.next():
-        result.set(row["phenotype"], row["value"])    
+    generator = DBGenerator(tab, where=dict(id="null"),
+                            fieldnames=("phenotype", "value"))
+    for rows in generator.batches():
+        for phenotype, value in rows:
+            result.set(phenotype, value)
     return result
 
 
@@ -102,22 +148,25 @@ def get_model_representations(dbpath, obo, log=None, log_prefix="",
     for m in model_names:
         result[m] = Representation(name=m)
     phen_priors = get_phenotype_priors(dbpath)
-    generator = DBGenerator(ModelPhenotypeTable(dbpath))
-    for row in generator.next():
-        m, phenotype = row["id"], obo.canonical(row["phenotype"])
-        # avoid cases  - irrelevant model, obsolete phenotype
-        if m not in model_names_set:
-            continue
-        if obo.has(phenotype) and not obo.valid(phenotype):
-            phenotype = obo.replaced_by(phenotype)
-        if phenotype is None:
-            if log is not None:
-                msg = "Skipping phenotype " + row["phenotype"]
-                msg += " in model " + m
-                log(log_prefix + " - " + msg)
-            continue
-        result[m] = add_data_to_model(result[m], phenotype, row["value"],
-                                      row["TPR"], row["FPR"], phen_priors)
+    fieldnames = ("id", "phenotype", "value", "TPR", "FPR")
+    generator = DBGenerator(ModelPhenotypeTable(dbpath),
+                            fieldnames=fieldnames)
+    for rows in generator.batches():
+        for m, raw_phenotype, value, tpr, fpr in rows:
+            # avoid cases  - irrelevant model, obsolete phenotype
+            if m not in model_names_set:
+                continue
+            phenotype = obo.canonical(raw_phenotype)
+            if obo.has(phenotype) and not obo.valid(phenotype):
+                phenotype = obo.replaced_by(phenotype)
+            if phenotype is None:
+                if log is not None:
+                    msg = "Skipping phenotype " + raw_phenotype
+                    msg += " in model " + m
+                    log(log_prefix + " - " + msg)
+                continue
+            result[m] = add_data_to_model(result[m], phenotype, value,
+                                          tpr, fpr, phen_priors)
     return result
 
 
@@ -141,24 +190,25 @@ def get_refsets(dbpath, ref_priors=None, phenotype_priors=None):
         ref_priors = get_ref_priors(dbpath)
     
     # create empty Representations for each reference
+    # (these record only deviations from the null reference)
     nullrep = get_complete_null(dbpath)
     phenotypes = nullrep.keys()
     for id in ref_priors.keys():
-        general_dict[id] = nullrep.copy(name=id)
-        specific_dict[id] = nullrep.copy(name=id)
+        general_dict[id] = OverlayRepresentation(nullrep.data, name=id)
+        specific_dict[id] = OverlayRepresentation(nullrep.data, name=id)
     
     # fill the representations with values
     phentab = ReferenceCompletePhenotypeTable(dbpath)
+    fieldnames = ("id", "phenotype", "value", "specific_value")
+    where = dict()
     if len(ref_priors) == 1:
-        refname = list(ref_priors.keys())[0]
-        generator = DBGenerator(phentab, where=dict(id=refname))
-    else:        
-        generator = DBGenerator(phentab)
-    for row in generator.next():
-        id, phen = row["id"], row["phenotype"]
-        if id in ref_priors:
-            general_dict[id].set(phen, row["value"])
-            specific_dict[id].set(phen, row["specific_value"])        
+        where = dict(id=list(ref_priors.keys())[0])
+    generator = DBGenerator(phentab, where=where, fieldnames=fieldnames)
+    for rows in generator.batches():
+        for id, phen, value, specific_value in rows:
+            if id in ref_priors:
+                general_dict[id].set(phen, value)
+                specific_dict[id].set(phen, specific_value)
         
     # transfer representations into ReferenceSets
     general = ReferenceSet(ref_priors, phenotypes, phenotype_priors)    
@@ -195,6 +245,7 @@ def get_modelsets(dbpath, obo, partition_size=4096):
     # load all model information from database
     models = get_model_representations(dbpath, obo)
     phen_priors = get_phenotype_priors(dbpath)
+    obo.precompute_closures()
 
     # transfer into small-sized reference sets
     result = []
@@ -35,6 +35,9 @@ class ModelScoreTable(DBTable):
     name = "model_score"
     text_fields = ("model", "reference", "timestamp")
     real_fields = ("general", "specific")
+    # indexes for top-N queries (and deletions) by reference or by model
+    indexes = (("model_score_reference", ("reference",)),
+               ("model_score_model", ("model",)))
     
     def add(self, model=None, reference=None, timestamp=None, 
             general=None, specific=None):
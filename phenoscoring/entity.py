@@ -40,6 +40,17 @@ class Entity():
         for key, value in d.items():
             self.description[key] = value
 
+    def copy(self):
+        """create a copy with its own description and list of data.
+
+        (Phenotype datums are shared with the original object.)
+        """
+
+        result = Entity(self.id, self.category, self.timestamp)
+        result.set_description_full(self.description)
+        result.data = list(self.data)
+        return result
+
     def add(self, datum):
         """add a phenotype datum to this model."""
 
@@ -114,40 +125,45 @@ class Entity():
     def trim_ancestors(self, obo, keep=set()):
         """redefine the phenotype data to remove entries with vague ontology terms
 
+        A positive datum is vague if the model also has a descendant
+        phenotype with an equal or higher value.
+
         :param obo: ontology structure object
         :parma keep: set with phenotypes that will not be trimmed
         
         :return: changes self object to remove some phenotypes
         """
         
-        # scan all the data and identify ancestors
-        ancestors = dict()        
+        # largest value for each phenotype present in positive data
+        present = dict()
         for datum in self.data:
-            if datum.value==0:
+            value = datum.value
+            if value == 0:
                 continue
             phenotype = datum.phenotype
-            ancestors[phenotype] = obo.ancestors(phenotype)
-            
+            if phenotype not in present or present[phenotype] < value:
+                present[phenotype] = value
+
+        # propagate values to ancestors, recording the largest value
+        # observed at a descendant of each term
+        index = obo.index()
+        positions, descendant_value = dict(), dict()
+        for phenotype, value in present.items():
+            positions[phenotype] = index.indexes([phenotype])[0]
+            for a in index.ancestors(positions[phenotype]).tolist():
+                if a not in descendant_value or descendant_value[a] < value:
+                    descendant_value[a] = value
+
         result = []
-        datalen = len(self.data)
-        for i in range(datalen):
-            idatum = self.data[i]
-            iphen = idatum.phenotype
-            ival = idatum.value            
-            if ival == 0:
-                result.append(idatum)
+        for datum in self.data:
+            value = datum.value
+            if value == 0 or datum.phenotype in keep:
+                result.append(datum)
                 continue
-            is_vague = False
-            for j in range(datalen):
-                jdatum = self.data[j]
-                jphen = jdatum.phenotype
-                jval = jdatum.value 
-                if jval==0:
-                    continue
-                if iphen in ancestors[jphen] and ival <= jval:
-                    is_vague = True            
-            if iphen in keep or not is_vague:
-                result.append(idatum)
+            position = positions[datum.phenotype]
+            if position not in descendant_value or \
+                    descendant_value[position] < value:
+                result.append(datum)
         
         self.data = result
         return self
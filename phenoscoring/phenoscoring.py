@@ -10,6 +10,7 @@ from os.path import exists, basename, dirname
 from db.db import setup_db
 from db.generator import DBGenerator
 from obo.obo import MinimalObo
+from obo.obodiff import diff_obo, changed_terms, changed_keys
 from tools.files import check_file, values_in_column
 from .dbhelpers import get_rootpath
 from .dbtables import ModelDescriptionTable, ModelPhenotypeTable
@@ -20,13 +21,17 @@ from .dbtables import ReferenceCompletePhenotypeTable
 from .build import fill_concise_reference_table
 from .build import fill_complete_reference_table
 from .build import fill_phenotype_frequency_table
+from .build import refresh_complete_reference_table, update_ref_priors
 from .update import update_model_descriptions, add_model_phenotypes
 from .time import now_timestamp
 from .compute import prep_compute_packets
 from .dbhelpers import get_ref_names, get_refsets
 from .dbhelpers import get_model_names, get_modelsets
 from .dbhelpers import delete_model_scores, delete_models
+from .dbhelpers import delete_reference_scores, get_phenotype_priors
+from .dbhelpers import get_reference_phenotypes, get_model_phenotypes
 from .simplelogger import SimpleLogger
+from .query import top_models, top_references
 from .runner import run_packets
 
 
@@ -54,6 +59,8 @@ class Phenoscoring:
         self.config = config
         if not hasattr(config, "scale_oo_scores"):
             self.config.scale_oo_scores = True
+        if not hasattr(config, "obo_cache"):
+            self.config.obo_cache = False
         if not hasattr(config, "stamp"):            
             self.config.stamp = now_timestamp()
         self.reset = config.reset
@@ -110,7 +117,7 @@ class Phenoscoring:
                               "phenotype_frequencies")
 
         self.logger.msg1("Loading ontology")        
-        obo = MinimalObo(obopath, True)
+        obo = MinimalObo(obopath, True, cache=config.obo_cache)
         
         self.logger.msg1("Preparing phenotype frequencies")
         fill_phenotype_frequency_table(dbpath, freqpath)
@@ -122,6 +129,52 @@ class Phenoscoring:
                 
         self._end()
     
+    def add_references(self):
+        """add new references to an existing db, without a full rebuild.
+
+        Complete representations are computed for the new references and
+        for existing references whose nearest neighbors change. All models
+        are then scored against those references (and against null, whose
+        prior changes as references are added).
+        """
+
+        dbpath, config = self._start()
+        config.obo = check_file(config.obo, dbpath, "obo")
+        refpath = check_file(config.reference_phenotypes, dbpath,
+                             "reference_phenotypes")
+
+        new_refs = set(values_in_column(refpath, "id"))
+        existing = new_refs.intersection(get_ref_names(dbpath))
+        if len(existing) > 0:
+            raise Exception("references already in db: " +
+                            ", ".join(sorted(existing)))
+
+        self.logger.msg1("Loading ontology")
+        obo = MinimalObo(config.obo, True, cache=config.obo_cache)
+
+        self.logger.msg1("Adding references: " + str(len(new_refs)))
+        fill_concise_reference_table(dbpath, refpath)
+        changed = update_ref_priors(dbpath, config.prior)
+
+        self.logger.msg1("Refreshing references")
+        references = refresh_complete_reference_table(dbpath, obo, config,
+                                                      changed)
+        self.logger.msg2("refreshed references: " + str(len(references)))
+        if "null" in changed:
+            references.add("null")
+
+        self.logger.msg1("Dropping scores for refreshed references")
+        delete_reference_scores(dbpath, references)
+        packets = prep_compute_packets(config,
+                                       references=sorted(references),
+                                       models=get_model_names(dbpath),
+                                       log=self.logger.msg2)
+        self.logger.msg1("Scoring (" + str(len(packets)) + " packets)")
+        run_packets(packets, config.cores)
+        self._index_scores()
+
+        self._end()
+
     def clearmodels(self):
         """remove all data from model tables."""
         
@@ -175,6 +228,7 @@ class Phenoscoring:
         summary = self._update(desc_file, phen_file)                
         if len(summary["incorrect_ids"]) == 0 and not config.skip_compute:
             self._compute(models=summary["new_phenotypes"])
+            self._index_scores()
                      
         self._end()
 
@@ -200,6 +254,12 @@ class Phenoscoring:
         self.logger.msg1("Scoring ("+msg+")")
         run_packets(packets, config.cores)
 
+    def _index_scores(self):
+        """create indexes that support top-N queries on model scores"""
+
+        self.logger.msg1("Indexing scores")
+        ModelScoreTable(self.dbpath).create_indexes()
+
     def recompute(self):
         """removes everything in the scores table and computes all from scratch."""
                         
@@ -215,9 +275,78 @@ class Phenoscoring:
         
         self.logger.msg1("Computing model scores")
         self._compute(references, modelids)
+        self._index_scores()
         
         self._end()
 
+    def ontologydiff(self):
+        """refresh references and scores after an ontology upgrade.
+
+        The ontology declared via obo_previous is compared with the
+        ontology declared via obo. Only references and models that use
+        terms interpreted differently in the two versions are rebuilt
+        and rescored.
+        """
+
+        dbpath, config = self._start()
+        old_path = check_file(config.obo_previous, dbpath, "obo_previous")
+        config.obo = check_file(config.obo, dbpath, "obo")
+
+        self.logger.msg1("Loading ontologies")
+        old = MinimalObo(old_path, True, cache=config.obo_cache)
+        new = MinimalObo(config.obo, True, cache=config.obo_cache)
+
+        self.logger.msg1("Ontology diff summary")
+        diff = diff_obo(old, new)
+        for k, v in diff.items():
+            self.logger.msg2("terms " + k.replace("_", " ") + ": " +
+                             str(len(v)))
+
+        changed = changed_terms(old, new)
+        references, models = set(), set()
+        for refname, phens in get_reference_phenotypes(dbpath).items():
+            if len(changed_keys(old, new, phens, changed)) > 0:
+                references.add(refname)
+        for modelname, phens in get_model_phenotypes(dbpath).items():
+            if len(changed_keys(old, new, phens, changed)) > 0:
+                models.add(modelname)
+        self.logger.msg2("affected references: " + str(len(references)))
+        self.logger.msg2("affected models: " + str(len(models)))
+        if config.skip_compute:
+            self._end()
+            return
+
+        # new terms must have background probabilities
+        phen_priors = get_phenotype_priors(dbpath)
+        missing = [_ for _ in new.ids() if _ not in phen_priors]
+        if len(missing) > 0:
+            raise Exception("phenotype frequencies missing for " +
+                            str(len(missing)) + " terms, e.g. " +
+                            missing[0] + "; rebuild the database")
+
+        self.logger.msg1("Refreshing references")
+        references = refresh_complete_reference_table(dbpath, new, config,
+                                                      references)
+        self.logger.msg2("refreshed references: " + str(len(references)))
+
+        # rescore affected models against all references, and
+        # other models against refreshed references
+        self.logger.msg1("Dropping scores for refreshed references")
+        delete_reference_scores(dbpath, references)
+        all_models = get_model_names(dbpath)
+        other_models = [_ for _ in all_models if _ not in models]
+        self._compute(models=[_ for _ in all_models if _ in models])
+        if len(references) > 0 and len(other_models) > 0:
+            packets = prep_compute_packets(config,
+                                           references=sorted(references),
+                                           models=other_models,
+                                           log=self.logger.msg2)
+            self.logger.msg1("Scoring (" + str(len(packets)) + " packets)")
+            run_packets(packets, config.cores)
+        self._index_scores()
+
+        self._end()
+
     def explain(self):
         """Perform a verbose calculation of inference scores.
         
@@ -250,7 +379,7 @@ class Phenoscoring:
         refset = packet.general_refset        
         if config.explain == "specific":
             refset = packet.specific_refset
-        refset.learn_obo(MinimalObo(config.obo))
+        refset.learn_obo(MinimalObo(config.obo, cache=config.obo_cache))
 
         allresults = [None]*M
         for i, (modelid, refid) in enumerate(zip(models, references)):
@@ -282,6 +411,29 @@ class Phenoscoring:
             temp = [str(row[_]) for _ in fieldnames]
             out.write("\t".join(temp) + "\n")    
     
+    def query(self, out=sys.stdout):
+        """write top-scoring models for references, or vice versa."""
+
+        config = self.config
+        if config.model is not None and config.reference is not None:
+            raise Exception("query requires either --model or --reference")
+        if config.model is None and config.reference is None:
+            raise Exception("query requires either --model or --reference")
+
+        if config.reference is not None:
+            keys, query_fun = config.reference.split(","), top_models
+        else:
+            keys, query_fun = config.model.split(","), top_references
+
+        out.write("\t".join(["model", "reference", "general", "specific"]))
+        out.write("\n")
+        for key in keys:
+            rows = query_fun(self.dbpath, key, n=config.top, by=config.score,
+                             min_general=config.min_general,
+                             min_specific=config.min_specific)
+            for row in rows:
+                out.write("\t".join([str(_) for _ in row]) + "\n")
+
     def _export_reference_representations(self):
         """write matrix representations for models and refs to disk."""
 
@@ -306,7 +458,7 @@ class Phenoscoring:
         dbpath, config = self._start()
         self.logger.msg1("Loading ontology")
         obo_path = check_file(config.obo, dbpath, "obo")
-        self.obo = MinimalObo(obo_path, True)
+        self.obo = MinimalObo(obo_path, True, cache=config.obo_cache)
         self._export_reference_representations()
         self._export_model_representations(config)
         self._end()
@@ -18,11 +18,20 @@ class PhenoscoringConfig:
     oomap = "owlsim.txt"
     phenotype_frequencies = "prep-MGI-priors.tsv"    
     obo = "Y.obo"   
+    obo_previous = None
     # suggested defaults
     pretty = False
     skip_compute = False
     explain_nodata = False 
+    obo_cache = False
+    model = None
+    reference = None
+    score = "general"
+    top = 10
+    min_general = 0
+    min_specific = 0
     reference_neighbors_k = 5
+    reference_neighbors_method = "exact"
     fp_weight = 0.8
     prior = 0.001
     min_inference = 0.001
@@ -0,0 +1,87 @@
+"""
+Queries for top-scoring models and references in a Phenoscoring database.
+"""
+
+from db.db import get_conn
+from .dbtables import ModelScoreTable
+
+
+def _top_scores_sql(key_field, by):
+    """assemble a query for top-scoring rows from the model score table
+
+    :param key_field: string, either 'model' or 'reference'
+    :param by: string, either 'general' or 'specific'
+    :return: string with sql, with placeholders for key, min_general,
+        min_specific, and the number of rows
+    """
+
+    if by not in ("general", "specific"):
+        raise Exception("invalid score type: " + str(by))
+    other = "specific" if by == "general" else "general"
+    target = "reference" if key_field == "model" else "model"
+
+    # rows for one key are found through an index, then sorted by score
+    sql = "SELECT model, reference, general, specific"
+    sql += " FROM " + ModelScoreTable.name
+    sql += " WHERE " + key_field + "=? AND general>=? AND specific>=?"
+    sql += " ORDER BY " + by + " DESC, " + other + " DESC, " + target
+    sql += " DESC LIMIT ?"
+    return sql
+
+
+def _top_scores(dbpath, key_field, key, n, by, min_general, min_specific):
+    """fetch top-scoring rows from the model score table
+
+    :param dbpath: path to phenoscoring db
+    :param key_field: string, either 'model' or 'reference'
+    :param key: string, value for key_field
+    :param n: integer, maximum number of rows to return
+    :param by: string, either 'general' or 'specific'
+    :param min_general: number, minimum value for the general score
+    :param min_specific: number, minimum value for the specific score
+    :return: list of tuples (model, reference, general, specific)
+    """
+
+    sql = _top_scores_sql(key_field, by)
+    with get_conn(dbpath) as conn:
+        cur = conn.cursor()
+        cur.row_factory = None
+        cur.execute(sql, (key, min_general, min_specific, int(n)))
+        result = cur.fetchall()
+    return result
+
+
+def top_models(dbpath, reference, n=10, by="general",
+               min_general=0, min_specific=0):
+    """get the top-scoring models for one reference
+
+    :param dbpath: path to phenoscoring db
+    :param reference: string, reference name
+    :param n: integer, maximum number of models to report
+    :param by: string, rank by 'general' or by 'specific' score
+    :param min_general: number, minimum general score
+    :param min_specific: number, minimum specific score
+    :return: list of tuples (model, reference, general, specific),
+        ranked from high to low score
+    """
+
+    return _top_scores(dbpath, "reference", reference, n, by,
+                       min_general, min_specific)
+
+
+def top_references(dbpath, model, n=10, by="general",
+                   min_general=0, min_specific=0):
+    """get the top-scoring references for one model
+
+    :param dbpath: path to phenoscoring db
+    :param model: string, model name
+    :param n: integer, maximum number of references to report
+    :param by: string, rank by 'general' or by 'specific' score
+    :param min_general: number, minimum general score
+    :param min_specific: number, minimum specific score
+    :return: list of tuples (model, reference, general, specific),
+        ranked from high to low score
+    """
+
+    return _top_scores(dbpath, "model", model, n, by,
+                       min_general, min_specific)
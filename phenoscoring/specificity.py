@@ -2,86 +2,262 @@
 Helpers used when computing specificity of references.
 """
 
+import multiprocessing as mp
+import numpy as np
+from scoring.referencematrix import ReferenceMatrix
 from .dbtables import ReferenceCompletePhenotypeTable
 from .dbtables import ReferenceNeighborsTable
 from .dbhelpers import get_phenotype_priors
+try:
+    from multiprocessing.shared_memory import SharedMemory
+except ImportError:
+    # python < 3.8, workers then receive their own copy of the matrix
+    SharedMemory = None
+
+
+def round_values(values, digits=7):
+    """round values in an array, consistently with built-in round()
+
+    Built-in round() on python floats can differ from numpy rounding in
+    the last digit. Here, built-in round() is applied once for each
+    distinct value.
+
+    :param values: numpy array
+    :param digits: integer, number of decimal digits
+    :return: numpy array with rounded values
+    """
+
+    unique, inverse = np.unique(values, return_inverse=True)
+    rounded = np.array([round(_, digits) for _ in unique.tolist()],
+                       dtype=float)
+    return rounded[inverse]
+
+
+def specific_values(self_val, nei_val, prior_val, null_val):
+    """compute specific values for one reference
+
+    :param self_val: array with (rounded) values for a reference
+    :param nei_val: array with (rounded) neighbor averages
+    :param prior_val: array with (rounded) phenotype priors
+    :param null_val: array with (rounded) values for the null reference
+    :return: 2-tuple with an array of specific values and a boolean
+        array indicating values that differ from null and prior
+    """
+
+    below = np.maximum(self_val, prior_val + np.minimum(0, self_val-nei_val))
+    above = np.maximum(prior_val, self_val - nei_val)
+    specific_val = np.where(self_val < prior_val, below, above)
+    keep = (self_val != null_val) | (specific_val != prior_val)
+    return specific_val, keep
 
 
 class SpecificityPacket:
-    
-    def __init__(self, dbpath, refset, k):
+
+    def __init__(self, dbpath, refset, k, method="exact"):
         """packet for calculating specificity scores
 
         :param dbpath: path to phenoscoring db
-        :param refset: ReferenceSet object
+        :param refset: ReferenceMatrix object
         :param k: integer, number neighbors to consider
+        :param method: string, 'exact' or 'lsh' (approximate) neighbors
         """
-                
+
         self.dbpath = dbpath
         self.refset = refset
-        self.k = k            
+        self.k = k
+        self.method = method
         self.ref_names = set()
+        self.phen_priors = None
+        self.nulldata = None
 
     def add(self, ref_name):
         self.ref_names.add(ref_name)
 
-    def run(self):
-        """compute neighbors and fill in complete phenotype tables in the db
-                
-        The command will only process calculations starting from 
-        references declared using add().            
-        """        
-                
-        if len(self.ref_names) == 0:
+    def _prep(self):
+        """fetch rounded phenotype priors and null data (once)"""
+
+        if self.phen_priors is not None:
             return
-                
         phen_priors = get_phenotype_priors(self.dbpath)
-        refset = self.refset
         # get a representation for the null model
-        nulldata = refset.get_data("null")        
-
-        # do rounding for priors and null outside of loop
+        nulldata = self.refset.get_data("null")
+        # do rounding for priors and null outside of loops
         for i in nulldata.keys():
-            phen_priors[i] = round(phen_priors[i], 7)            
+            phen_priors[i] = round(phen_priors[i], 7)
             nulldata[i] = round(nulldata[i], 7)
-        
+        self.phen_priors = phen_priors
+        self.nulldata = nulldata
+        # the same in array form, in the row order of the matrix
+        row_names = self.refset.row_names
+        self.prior_array = np.array([phen_priors[_] for _ in row_names])
+        self.null_array = np.array([nulldata[_] for _ in row_names])
+
+    def rows(self, ref_names):
+        """compute neighbors and specific phenotypes for some references
+
+        :param ref_names: list of reference names (excluding null)
+        :return: 2-tuple with lists of rows for the complete phenotype
+            table and for the neighbors table
+        """
+
+        self._prep()
+        refset = self.refset
+        row_names = refset.row_names
+        phenotype_rows, neighbor_rows = [], []
+
+        # find neighbors for all references at once
+        if self.method == "lsh":
+            all_neighbors = refset.approximate_nearest_neighbors(self.k,
+                                                                 ref_names)
+        else:
+            all_neighbors = refset.all_nearest_neighbors(self.k, ref_names)
+
+        for refname in ref_names:
+            neighbors = all_neighbors[refname]
+            for rank in range(len(neighbors)):
+                neighbor_rows.append((refname, neighbors[rank], rank+1))
+            # record specific phenotype representation (changed cells only)
+            self_val = np.round(refset.data[:, refset.columns[refname]], 7)
+            nei_val = round_values(refset.get_average_array(neighbors))
+            specific_val, keep = specific_values(self_val, nei_val,
+                                                 self.prior_array,
+                                                 self.null_array)
+            keep = np.flatnonzero(keep)
+            phenotype_rows.extend(zip([refname]*len(keep),
+                                      [row_names[_] for _ in keep],
+                                      self_val[keep].tolist(),
+                                      specific_val[keep].tolist()))
+
+        return phenotype_rows, neighbor_rows
+
+    def run(self):
+        """compute neighbors and fill in complete phenotype tables in the db
+
+        The command will only process calculations starting from
+        references declared using add().
+        """
+
+        if len(self.ref_names) == 0:
+            return
+        self._prep()
+
         # handles for db tables
         model_phenotypes = ReferenceCompletePhenotypeTable(self.dbpath)
         model_neighbors = ReferenceNeighborsTable(self.dbpath)
-        
+
         # by definition, add all phenotypes for the null reference
         if "null" in self.ref_names:
-            for phenotype in nulldata.keys():
-                null_val = nulldata[phenotype]
-                prior_val = phen_priors[phenotype]                
-                model_phenotypes.add("null", phenotype, null_val, prior_val)            
-        
-        # process declared references
-        for refname in self.ref_names:
-            # skip the null rep (handled outside) 
-            if refname == "null":
-                continue                            
-            refdata = refset.get_data(refname)
-            neighbors = refset.nearest_neighbors(refname, self.k)
-            # save neighbors
-            for rank in range(len(neighbors)):
-                model_neighbors.add(refname, neighbors[rank], rank+1)                
-            # record specific phenotype representation            
-            neidata = refset.get_average(neighbors)
-            for phenotype in refdata.keys():            
-                null_val = nulldata[phenotype]
-                prior_val = phen_priors[phenotype]
-                self_val = round(refdata[phenotype], 7)
-                nei_val  = round(neidata[phenotype], 7)
-                if self_val < prior_val:
-                    specific_val = prior_val + min(0, self_val - nei_val)
-                    specific_val = max(self_val, specific_val)
-                else:
-                    specific_val = max(prior_val, self_val-nei_val)
-                if self_val == null_val and specific_val == prior_val:
-                    continue
-                model_phenotypes.add(refname, phenotype, self_val, specific_val)
-        
+            for phenotype, null_val in self.nulldata.items():
+                prior_val = self.phen_priors[phenotype]
+                model_phenotypes.add("null", phenotype, null_val, prior_val)
+
+        # process declared references (except null, handled above)
+        ref_names = [_ for _ in self.ref_names if _ != "null"]
+        phenotype_rows, neighbor_rows = self.rows(ref_names)
+        model_phenotypes.data.extend(phenotype_rows)
+        model_neighbors.data.extend(neighbor_rows)
         model_phenotypes.save()
         model_neighbors.save()
 
+
+# ###########################################################################
+# Running specificity calculations in a pool of workers
+
+
+# state for pool workers, set when a worker process starts
+_worker = dict()
+
+
+def _init_worker(shm_name, shape, row_names, column_names, column_priors,
+                 ref_names, dbpath, k, method):
+    """attach to a shared matrix and prepare a packet in a pool worker"""
+
+    shm = SharedMemory(name=shm_name)
+    data = np.ndarray(shape, dtype=float, buffer=shm.buf, order="F")
+    refset = ReferenceMatrix.from_array(data, row_names, column_names,
+                                        column_priors)
+    _worker["shm"] = shm
+    _worker["ref_names"] = ref_names
+    _worker["packet"] = SpecificityPacket(dbpath, refset, k, method)
+
+
+def _init_worker_copy(refset, ref_names, dbpath, k, method):
+    """prepare a packet in a pool worker, using a copy of a matrix"""
+
+    _worker["ref_names"] = ref_names
+    _worker["packet"] = SpecificityPacket(dbpath, refset, k, method)
+
+
+def _worker_rows(bounds):
+    """compute rows for a range of references in a pool worker"""
+
+    start, end = bounds
+    return _worker["packet"].rows(_worker["ref_names"][start:end])
+
+
+def run_specificity(dbpath, refset, k, ref_names, cores=1, method="exact",
+                    chunk_size=256):
+    """compute neighbors and specific phenotypes for many references
+
+    With several cores, the matrix is published once in shared memory
+    (or, without shared memory support, copied once into each worker)
+    and pool workers receive only ranges of reference names. Workers
+    return rows for their ranges, and the calling process writes all rows
+    into the db.
+
+    :param dbpath: path to phenoscoring db
+    :param refset: ReferenceMatrix object
+    :param k: integer, number of neighbors
+    :param ref_names: list of reference names (excluding null)
+    :param cores: integer, number of worker processes
+    :param method: string, 'exact' or 'lsh' search for neighbors
+    :param chunk_size: integer, number of references in one work unit
+    """
+
+    ref_names = list(ref_names)
+    if len(ref_names) == 0:
+        return
+    bounds = [(start, min(len(ref_names), start+chunk_size))
+              for start in range(0, len(ref_names), chunk_size)]
+
+    model_phenotypes = ReferenceCompletePhenotypeTable(dbpath)
+    model_neighbors = ReferenceNeighborsTable(dbpath)
+
+    def write(rows):
+        model_phenotypes.data.extend(rows[0])
+        model_neighbors.data.extend(rows[1])
+        model_phenotypes.save()
+        model_neighbors.save()
+
+    if cores <= 1 or len(bounds) <= 1:
+        packet = SpecificityPacket(dbpath, refset, k, method)
+        for start, end in bounds:
+            write(packet.rows(ref_names[start:end]))
+        return
+
+    if SharedMemory is None:
+        initargs = (refset, ref_names, dbpath, k, method)
+        with mp.Pool(cores, initializer=_init_worker_copy,
+                     initargs=initargs) as pool:
+            for rows in pool.imap(_worker_rows, bounds):
+                write(rows)
+        return
+
+    data = refset.data
+    shm = SharedMemory(create=True, size=max(1, data.nbytes))
+    shared = None
+    try:
+        shared = np.ndarray(data.shape, dtype=float, buffer=shm.buf,
+                            order="F")
+        shared[:] = data
+        initargs = (shm.name, data.shape, refset.row_names,
+                    refset.column_names, refset.column_priors, ref_names,
+                    dbpath, k, method)
+        with mp.Pool(cores, initializer=_init_worker,
+                     initargs=initargs) as pool:
+            for rows in pool.imap(_worker_rows, bounds):
+                write(rows)
+    finally:
+        shared = None
+        shm.close()
+        shm.unlink()
@@ -3,6 +3,7 @@ Computation of distances and neighbors
 """
 
 import numba
+import numpy as np
 from numpy import sqrt as sqrt
 
 
@@ -64,7 +65,7 @@ def neighbor_average(mat, priors, indexes):
     
     # create vector, initially empty, to mimic a column
     n_features = mat.shape[0]
-    result = [0.0]*n_features
+    result = np.zeros(n_features)
     
     # add contents from the matrix
     for j in indexes:
@@ -78,3 +79,22 @@ def neighbor_average(mat, priors, indexes):
         result[i] = result[i] / norm
     
     return result
+
+
+@numba.njit()
+def cosine_distances_subset(v, v_norm, mat, mat_norms, indexes):
+    """compute cosine distances between an array and some matrix columns
+
+    :param v: array
+    :param v_norm: number, precomputed norm of v
+    :param mat: matrix
+    :param mat_norms: array with matrix column norms
+    :param indexes: array with column indexes
+    :return: list of cosine distances, one for each index
+    """
+
+    result = [0.0]*len(indexes)
+    for i in range(len(indexes)):
+        j = indexes[i]
+        result[i] = cosine_distance(v, mat[:, j], v_norm, mat_norms[j])
+    return result
@@ -0,0 +1,405 @@
+"""
+Array-based imputation of representations using an ontology.
+
+This is an implementation of the algorithm in Representation.impute()
+that works on integer-indexed closure arrays (see obo.oboindex). The
+upward (OR logic) and downward propagation steps are performed in
+compiled loops, visiting the same nodes in the same order as the
+dict-based implementation. Thus, the output values are identical.
+"""
+
+import numba
+import numpy as np
+
+
+@numba.njit()
+def impute_kernel(anc_ptr, anc_idx, desc_ptr, desc_idx, defaults, values,
+                  nodes, up_seeds, up_factors, down_seeds, down_values):
+    """propagate values from seeds to ancestors and descendants
+
+    :param anc_ptr: array, pointers into anc_idx
+    :param anc_idx: array, indexes of ancestors
+    :param desc_ptr: array, pointers into desc_idx
+    :param desc_idx: array, indexes of descendants
+    :param defaults: array with default values (only used at nodes)
+    :param values: array with initial values (only used at nodes);
+        this array is modified in place
+    :param nodes: array with indexes of all seeds, their ancestors,
+        and their descendants
+    :param up_seeds: array with indexes for upward propagation
+    :param up_factors: array with factors (one minus seed value)
+    :param down_seeds: array with indexes for downward propagation
+    :param down_values: array with seed values
+    :return: two arrays. The first is a boolean array indicating which
+        nodes were modified by upward propagation. The second indicates
+        which item in down_seeds last set a node (-1 for none)
+    """
+
+    n = len(values)
+    current = np.zeros(n)
+    touched = np.zeros(n, dtype=np.bool_)
+    source = np.full(n, -1, dtype=np.int64)
+
+    # upward propagation, first work with (1-p)
+    for j in range(len(up_seeds)):
+        key, factor = up_seeds[j], up_factors[j]
+        val = current[key] if touched[key] else 1.0
+        current[key] = val*factor
+        touched[key] = True
+        for z in range(anc_ptr[key], anc_ptr[key+1]):
+            node = anc_idx[z]
+            val = current[node] if touched[node] else 1-defaults[node]
+            current[node] = val*factor
+            touched[node] = True
+    for z in range(len(nodes)):
+        node = nodes[z]
+        if touched[node]:
+            values[node] = 1 - current[node]
+
+    # downward propagation
+    for j in range(len(down_seeds)):
+        key, value = down_seeds[j], down_values[j]
+        if values[key] <= defaults[key]:
+            values[key] = value
+            source[key] = j
+        for z in range(desc_ptr[key], desc_ptr[key+1]):
+            node = desc_idx[z]
+            if values[node] <= defaults[node] and value < values[node]:
+                values[node] = value
+                source[node] = j
+
+    return touched, source
+
+
+def effective_seeds(data, defaults, seeds=None):
+    """identify seeds that trigger upward or downward propagation
+
+    :param data: dict with values for some terms
+    :param defaults: dict with default values
+    :param seeds: list of keys, or None to use all keys ordered by value
+    :return: two lists with keys, for upward and downward propagation
+    """
+
+    if seeds is None:
+        temp = [(v, k) for k, v in data.items()]
+        temp.sort()
+        seeds = [k for v, k in temp]
+    up, down = [], []
+    for key in seeds:
+        if key not in defaults:
+            continue
+        keyval = data[key] if key in data else defaults[key]
+        if keyval > defaults[key]:
+            up.append(key)
+        elif keyval < defaults[key]:
+            down.append(key)
+    return up, down
+
+
+def impute_representation(rep, obo, defaults, seeds=None):
+    """impute values in a representation using array-based propagation
+
+    :param rep: Representation object, modified in place
+    :param obo: object of class MinimalObo
+    :param defaults: dict with default values for terms in the ontology
+    :param seeds: list of keys, or None to use all keys ordered by value
+    :return: logical, True if imputation was performed. False indicates
+        that the inputs are not suitable for array-based imputation
+        (e.g. keys without defaults) and that rep was not modified
+    """
+
+    if not has_index(obo):
+        return False
+    index = obo.index()
+    positions = index.index
+    data = rep.data
+
+    # seeds that have an effect are keys with non-default values
+    up, down = effective_seeds(data, defaults, seeds)
+    if len(up) == 0 and len(down) == 0:
+        rep.defaults(defaults)
+        return True
+    for key in up + down:
+        if key not in positions:
+            return False
+
+    # collect all nodes that can be affected by propagation
+    up_idx = np.array([positions[_] for _ in up], dtype=np.int64)
+    down_idx = np.array([positions[_] for _ in down], dtype=np.int64)
+    parts = [up_idx, down_idx]
+    parts.extend([index.ancestors(_) for _ in up_idx])
+    parts.extend([index.descendants(_) for _ in down_idx])
+    nodes = np.unique(np.concatenate(parts))
+
+    ids = index.ids
+    node_ids = [ids[_] for _ in nodes]
+    for id in node_ids:
+        if id not in defaults:
+            return False
+    n = len(ids)
+    default_values = np.zeros(n)
+    default_values[nodes] = [defaults[_] for _ in node_ids]
+    values = np.zeros(n)
+    values[nodes] = [data[_] if _ in data else defaults[_]
+                     for _ in node_ids]
+    up_factors = np.array([1-data[_] for _ in up], dtype=float)
+    down_values = np.array([data[_] for _ in down], dtype=float)
+
+    touched, source = impute_kernel(index.ancestors_ptr, index.ancestors_idx,
+                                    index.descendants_ptr,
+                                    index.descendants_idx,
+                                    default_values, values, nodes,
+                                    up_idx, up_factors,
+                                    down_idx, down_values)
+
+    # transfer values into the representation
+    original = {k: data[k] for k in up + down}
+    rep.defaults(defaults)
+    data = rep.data
+    for i, id in zip(nodes.tolist(), node_ids):
+        if source[i] >= 0:
+            data[id] = original[down[source[i]]]
+        elif touched[i]:
+            data[id] = float(values[i])
+    return True
+
+
+def has_index(obo):
+    """determine if an ontology provides closure arrays for imputation"""
+
+    if getattr(obo, "index", None) is None:
+        return False
+    return getattr(obo, "infer_children", False)
+
+
+# ###########################################################################
+# Imputation of many representations at once
+
+
+@numba.njit()
+def impute_batch_kernel(anc_ptr, anc_idx, desc_ptr, desc_idx, defaults,
+                        seed_ptr, seed_idx, seed_values, n_up, columns,
+                        out, sums):
+    """impute several representations and collect values at some columns
+
+    :param anc_ptr, anc_idx, desc_ptr, desc_idx: closure arrays
+    :param defaults: array with default values for all terms
+    :param seed_ptr: array of pointers, seeds for representation i are
+        in seed_idx[seed_ptr[i]:seed_ptr[i+1]]
+    :param seed_idx: array with term indexes of seeds
+    :param seed_values: array with values of seeds
+    :param n_up: array with number of seeds for upward propagation
+        (these are first for each representation, other seeds are for
+        downward propagation)
+    :param columns: array with term indexes for output
+    :param out: matrix with one row per representation, one column per
+        item in columns; filled in place (use a 0x0 matrix to skip)
+    :param sums: array with one item per item in columns; imputed values
+        are added in place, one representation at a time
+    """
+
+    n = len(defaults)
+    values = defaults.copy()
+    current = np.zeros(n)
+    touched = np.zeros(n, dtype=np.bool_)
+    dirty = np.zeros(n, dtype=np.bool_)
+    modified = np.zeros(n, dtype=np.int64)
+    write_out = out.shape[0] > 0
+
+    for row in range(len(seed_ptr)-1):
+        n_modified = 0
+        start, mid = seed_ptr[row], seed_ptr[row] + n_up[row]
+        end = seed_ptr[row+1]
+        for j in range(start, end):
+            key = seed_idx[j]
+            values[key] = seed_values[j]
+            if not dirty[key]:
+                dirty[key] = True
+                modified[n_modified] = key
+                n_modified += 1
+
+        # upward propagation
+        for j in range(start, mid):
+            key, factor = seed_idx[j], 1-seed_values[j]
+            val = current[key] if touched[key] else 1.0
+            current[key] = val*factor
+            touched[key] = True
+            for z in range(anc_ptr[key], anc_ptr[key+1]):
+                node = anc_idx[z]
+                val = current[node] if touched[node] else 1-defaults[node]
+                current[node] = val*factor
+                touched[node] = True
+                if not dirty[node]:
+                    dirty[node] = True
+                    modified[n_modified] = node
+                    n_modified += 1
+        for z in range(n_modified):
+            node = modified[z]
+            if touched[node]:
+                values[node] = 1 - current[node]
+
+        # downward propagation
+        for j in range(mid, end):
+            key, value = seed_idx[j], seed_values[j]
+            if values[key] <= defaults[key]:
+                values[key] = value
+            for z in range(desc_ptr[key], desc_ptr[key+1]):
+                node = desc_idx[z]
+                if values[node] <= defaults[node] and value < values[node]:
+                    values[node] = value
+                    if not dirty[node]:
+                        dirty[node] = True
+                        modified[n_modified] = node
+                        n_modified += 1
+
+        # record output
+        for c in range(len(columns)):
+            val = values[columns[c]]
+            sums[c] += val
+            if write_out:
+                out[row, c] = val
+
+        # reset for the next representation
+        for z in range(n_modified):
+            node = modified[z]
+            values[node] = defaults[node]
+            current[node] = 0.0
+            touched[node] = False
+            dirty[node] = False
+
+
+def _batch_seeds(reps, defaults, positions):
+    """prepare CSR arrays with seeds for many representations
+
+    :return: four arrays (pointers, indexes, values, number of upward
+        seeds), or None if some seeds are not present in the ontology
+    """
+
+    seed_ptr = [0]
+    seed_idx, seed_values, n_up = [], [], []
+    for rep in reps:
+        data = rep.data
+        up, down = effective_seeds(data, defaults)
+        for key in up + down:
+            if key not in positions:
+                return None
+            seed_idx.append(positions[key])
+            seed_values.append(data[key])
+        n_up.append(len(up))
+        seed_ptr.append(len(seed_idx))
+    return (np.array(seed_ptr, dtype=np.int64),
+            np.array(seed_idx, dtype=np.int64),
+            np.array(seed_values, dtype=float),
+            np.array(n_up, dtype=np.int64))
+
+
+def _batch_defaults(obo, defaults, columns):
+    """prepare an array of defaults for batch imputation (or None)"""
+
+    if not has_index(obo):
+        return None
+    index = obo.index()
+    result = np.zeros(len(index))
+    for i, id in enumerate(index.ids):
+        if id in defaults:
+            result[i] = defaults[id]
+        elif obo.valid(id):
+            return None
+    for id in columns:
+        if id not in index.index or id not in defaults:
+            return None
+    return result
+
+
+def impute_chunks(obo, defaults, reps, columns, chunk_size=256,
+                  sums=None):
+    """impute many concise representations, in chunks
+
+    :param obo: object of class MinimalObo
+    :param defaults: dict with default values for terms in the ontology
+    :param reps: list of concise Representation objects (not modified)
+    :param columns: list of term ids to include in the output
+    :param chunk_size: integer, number of representations in each chunk
+    :param sums: array with one item per column, or None. If provided,
+        imputed values are added in place into this array (in the order
+        of reps) and chunks are not returned
+    :return: generator of 2-tuples with the index of the first
+        representation in a chunk and a matrix with imputed values
+        (one row per representation, one column per item in columns)
+    """
+
+    reps = list(reps)
+    columns = list(columns)
+    default_values = _batch_defaults(obo, defaults, columns)
+    col_sums = np.zeros(len(columns)) if sums is None else sums
+    for start in range(0, len(reps), chunk_size):
+        chunk = reps[start:start+chunk_size]
+        seeds = None
+        if default_values is not None:
+            seeds = _batch_seeds(chunk, defaults, obo.index().index)
+        if seeds is None:
+            # fallback for inputs not suitable for the batch kernel
+            result = np.zeros((len(chunk), len(columns)))
+            for i, rep in enumerate(chunk):
+                rep = rep.copy()
+                rep.impute(obo, defaults)
+                result[i] = [rep.data[_] for _ in columns]
+                if sums is not None:
+                    sums += result[i]
+        else:
+            index = obo.index()
+            shape = (0, 0) if sums is not None else (len(chunk), len(columns))
+            result = np.zeros(shape)
+            impute_batch_kernel(index.ancestors_ptr, index.ancestors_idx,
+                                index.descendants_ptr, index.descendants_idx,
+                                default_values, seeds[0], seeds[1], seeds[2],
+                                seeds[3],
+                                np.array(index.indexes(columns),
+                                         dtype=np.int64),
+                                result, col_sums)
+        if sums is None:
+            yield start, result
+
+
+def impute_matrix(obo, defaults, reps, columns, chunk_size=256):
+    """impute many concise representations into a matrix
+
+    :param obo: object of class MinimalObo
+    :param defaults: dict with default values for terms in the ontology
+    :param reps: list of concise Representation objects (not modified)
+    :param columns: list of term ids to include in the output
+    :param chunk_size: integer, number of representations to process
+        at a time
+    :return: matrix with one row per representation and one column per
+        item in columns
+    """
+
+    reps = list(reps)
+    result = np.zeros((len(reps), len(columns)))
+    for start, chunk in impute_chunks(obo, defaults, reps, columns,
+                                      chunk_size):
+        result[start:start+chunk.shape[0]] = chunk
+    return result
+
+
+def impute_sums(obo, defaults, reps, columns, initial=0.0, chunk_size=256):
+    """compute sums of imputed values over many representations
+
+    Values are added one representation at a time, so sums are identical
+    to adding imputed values in a loop over representations.
+
+    :param obo: object of class MinimalObo
+    :param defaults: dict with default values for terms in the ontology
+    :param reps: list of concise Representation objects (not modified)
+    :param columns: list of term ids to include in the output
+    :param initial: number, starting value for all sums
+    :param chunk_size: integer, number of representations to process
+        at a time
+    :return: array with one sum per item in columns
+    """
+
+    result = np.full(len(columns), float(initial))
+    for _ in impute_chunks(obo, defaults, reps, columns, chunk_size,
+                           sums=result):
+        pass
+    return result
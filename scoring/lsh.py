@@ -0,0 +1,101 @@
+"""
+Random-projection hashing for approximate cosine neighbors.
+
+Columns of a matrix are projected onto random hyperplanes. The signs of
+the projections form a hash code; columns with a small cosine distance
+are likely to share codes. Several independent tables are used to
+increase the chance that true neighbors share at least one bucket.
+"""
+
+import numpy as np
+from timeit import default_timer as timer
+
+
+class ProjectionIndex:
+    """Hash tables with random-projection codes for matrix columns."""
+
+    def __init__(self, data, norms, n_tables=8, n_bits=12, seed=0):
+        """compute hash codes and buckets for all columns of a matrix
+
+        :param data: matrix, columns are items to index
+        :param norms: array with column norms
+        :param n_tables: integer, number of independent hash tables
+        :param n_bits: integer, number of hyperplanes in each table
+        :param seed: integer, seed for generating hyperplanes
+        """
+
+        norms = np.where(norms > 0, norms, 1.0)
+        # centering spreads nonnegative data across the hyperplanes
+        unit = data / norms[np.newaxis, :]
+        unit -= unit.mean(axis=1)[:, np.newaxis]
+
+        rng = np.random.RandomState(seed)
+        planes = rng.standard_normal((n_tables*n_bits, data.shape[0]))
+        bits = (np.dot(planes, unit) > 0).astype(np.int64)
+        bits.shape = (n_tables, n_bits, data.shape[1])
+        weights = 2 ** np.arange(n_bits, dtype=np.int64)
+        codes = np.tensordot(weights, bits, axes=([0], [1]))
+
+        # for each table, columns sorted by bucket and bucket boundaries
+        self.n_tables = n_tables
+        self.buckets = np.zeros(codes.shape, dtype=np.int64)
+        self.members = []
+        self.offsets = []
+        for t in range(n_tables):
+            _, inverse, counts = np.unique(codes[t], return_inverse=True,
+                                           return_counts=True)
+            self.buckets[t] = inverse
+            self.members.append(np.argsort(inverse, kind="stable"))
+            self.offsets.append(np.concatenate(([0], np.cumsum(counts))))
+
+    def candidates(self, index):
+        """get columns that share a bucket with a column in any table
+
+        :param index: integer, column index
+        :return: sorted array of column indexes (includes index)
+        """
+
+        result = []
+        for t in range(self.n_tables):
+            bucket = self.buckets[t, index]
+            start, end = self.offsets[t][bucket], self.offsets[t][bucket+1]
+            result.append(self.members[t][start:end])
+        return np.unique(np.concatenate(result))
+
+
+def neighbor_recall(exact, approximate):
+    """compute the fraction of exact neighbors found by an approximation
+
+    :param exact: dict mapping names to lists of neighbors
+    :param approximate: dict mapping names to lists of neighbors
+    :return: number between 0 and 1
+    """
+
+    found, total = 0, 0
+    for name, neighbors in exact.items():
+        found += len(set(neighbors).intersection(approximate[name]))
+        total += len(neighbors)
+    if total == 0:
+        return 1.0
+    return found / total
+
+
+def recall_benchmark(refmatrix, k, references=None, **kwargs):
+    """compare approximate and exact neighbor searches
+
+    :param refmatrix: ReferenceMatrix object
+    :param k: integer, number of neighbors
+    :param references: list of reference names, or None to use all
+    :param kwargs: settings for approximate_nearest_neighbors
+    :return: dict with recall and running times (seconds)
+    """
+
+    start = timer()
+    exact = refmatrix.all_nearest_neighbors(k, references)
+    time_exact = timer() - start
+    start = timer()
+    approximate = refmatrix.approximate_nearest_neighbors(k, references,
+                                                          **kwargs)
+    time_approximate = timer() - start
+    return dict(recall=neighbor_recall(exact, approximate),
+                time_exact=time_exact, time_approximate=time_approximate)
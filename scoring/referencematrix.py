@@ -8,8 +8,9 @@ Adding data into the matrix is through Representation objects.
 
 import numpy as np
 from math import inf
-from .distance import vec_norm, cosine_distances
-from .distance import neighbor_average
+from .distance import cosine_distance
+from .distance import cosine_distances_subset, neighbor_average
+from .lsh import ProjectionIndex
 
 
 class ReferenceMatrix():
@@ -18,47 +19,64 @@ class ReferenceMatrix():
     def __init__(self, refset, features):
         """Initialize the matrix based on an existing refset
 
-        :param refset: ReferenceSet object
+        :param refset: ReferenceSet or ReferenceMatrix object
         :param features: iterable with a set of features,
         used to cut feature in refset
         """
 
         # subset features to those that are consistent with the input refset
-        new_features = set(features)
-        for id in features:
-            if id not in refset.rows:
-                new_features.remove(id)
-        
-        # transfer some metadata from refset to this new object        
-        self.column_priors = np.array(refset.column_priors.copy(), 
-                                      dtype=float)
-        self.columns = refset.columns.copy()
-        self.column_names = refset.column_names.copy()
-        
-        self.row_names = tuple(list(new_features))        
-        self.rows = dict()        
-        for index, id in enumerate(self.row_names):                        
-            self.rows[id] = index        
-                        
-        # transfer data from the refset into this object
-        nrows = len(self.rows)
-        self.data = np.zeros((nrows, len(self.columns)))
-        for ref_index, ref_name in enumerate(self.column_names):
-            repdata = refset.get_data(ref_name)
-            reparr = [0.0] * nrows
-            for feature_index, feature_name in enumerate(self.row_names):
-                reparr[feature_index] = repdata[feature_name]
-            self.data[:, ref_index] = reparr
-
-        # pre-compute data column norms
-        ncols = len(self.columns)
-        self.data_norms = np.array([0.0] * ncols, dtype=float)
-        for ref_index in range(ncols):
-            self.data_norms[ref_index] = vec_norm(self.data[:, ref_index])
+        # (keeping the order of features in the refset)
+        features = set(features)
+        row_names = [_ for _ in refset.row_names if _ in features]
+        row_indexes = [refset.rows[_] for _ in row_names]
+
+        # slice the underlying storage by feature index
+        if isinstance(refset, ReferenceMatrix):
+            data = refset.data[row_indexes, :]
+        else:
+            data = np.array(refset.data, dtype=float)[:, row_indexes].T
+        self._set_data(data, row_names, refset.column_names,
+                       refset.column_priors)
+
+    @classmethod
+    def from_array(cls, data, row_names, column_names, column_priors):
+        """create a matrix object directly from an array
+
+        :param data: array with features in rows and references in columns
+        :param row_names: list with feature names
+        :param column_names: list with reference names
+        :param column_priors: list with prior probabilities for references
+        :return: ReferenceMatrix object
+        """
+
+        if data.shape != (len(row_names), len(column_names)):
+            raise Exception("incompatible data shape and names")
+        result = cls.__new__(cls)
+        result._set_data(data, row_names, column_names, column_priors)
+        return result
+
+    def _set_data(self, data, row_names, column_names, column_priors):
+        """set data, row and column metadata, and column norms."""
+
+        self.column_priors = np.array(column_priors, dtype=float)
+        self.column_names = list(column_names)
+        self.columns = dict()
+        for index, id in enumerate(self.column_names):
+            self.columns[id] = index
+        self.row_names = tuple(row_names)
+        self.rows = dict()
+        for index, id in enumerate(self.row_names):
+            self.rows[id] = index
+
+        # store references as contiguous columns, pre-compute their norms
+        self.data = np.asfortranarray(data, dtype=float)
+        self.data_norms = np.sqrt(np.einsum("ij,ij->j", self.data, self.data))
+        # hash tables and unit vectors for approximate searches
+        self._projection = None
 
     def n_features(self):
         """obtain the number of features in this object"""
-        return len(self.row_priors)
+        return len(self.rows)
 
     def n_references(self):
         """obtain the number of references in this object"""
@@ -80,23 +98,156 @@ class ReferenceMatrix():
 
         source_index = self.columns[source]
         sourcedata = self.data[:, source_index]
-        distances = cosine_distances(sourcedata, self.data, self.data_norms)
+        indexes = np.arange(self.n_references())
+        distances = cosine_distances_subset(sourcedata,
+                                            self.data_norms[source_index],
+                                            self.data, self.data_norms,
+                                            indexes)
         distances[source_index] = inf
         dist_index = [(distances[_], _) for _ in range(len(distances))]
         dist_index.sort()
         column_names = self.column_names
         return [column_names[dist_index[_][1]] for _ in range(k)]
 
+    def all_nearest_neighbors(self, k, references=None, block_size=256,
+                              tolerance=1e-9):
+        """get k neighbors for many references at once
+
+        Candidate neighbors are selected using matrix products for blocks
+        of references. Distances to candidates are then recomputed in the
+        same way as in nearest_neighbors so that ranks and tie-breaking
+        (by column index) are identical.
+
+        :param k: integer, number of nearest neighbors to find
+        :param references: list of reference names, or None to use all
+        :param block_size: integer, number of references to process at
+            a time (bounds memory to block_size x n_references)
+        :param tolerance: number, margin for candidate selection, must
+            exceed rounding differences between the two distance schemes
+        :return: dict mapping reference names to lists of k neighbors
+        """
+
+        if references is None:
+            references = self.column_names
+        references = list(references)
+        data, norms = self.data, self.data_norms
+        column_names = self.column_names
+        n = self.n_references()
+        kth = min(k, n) - 1
+        result = dict()
+        for start in range(0, len(references), block_size):
+            block_names = references[start:start+block_size]
+            sources = np.array([self.columns[_] for _ in block_names],
+                               dtype=int)
+            products = np.dot(data[:, sources].T, data)
+            products /= norms[sources, np.newaxis] * norms[np.newaxis, :]
+            approx = 1.0 - products
+            approx[np.arange(len(sources)), sources] = inf
+            thresholds = np.partition(approx, kth, axis=1)[:, kth]
+            thresholds += tolerance
+            for i, source_index in enumerate(sources):
+                candidates = np.flatnonzero(approx[i] <= thresholds[i])
+                distances = cosine_distances_subset(data[:, source_index],
+                                                    norms[source_index],
+                                                    data, norms, candidates)
+                for j in range(len(candidates)):
+                    if candidates[j] == source_index:
+                        distances[j] = inf
+                dist_index = sorted(zip(distances, candidates))
+                result[block_names[i]] = [column_names[_[1]]
+                                          for _ in dist_index[:k]]
+        return result
+
+    def approximate_nearest_neighbors(self, k, references=None, n_tables=24,
+                                      n_bits=12, min_references=4096,
+                                      seed=0):
+        """get approximate k neighbors for many references at once
+
+        Candidate neighbors are references that share a bucket in any of
+        several random-projection hash tables. Candidates are ranked using
+        cosine distances computed with matrix products. References with
+        fewer than k candidates, and all references in small sets, are
+        processed with an exact search. The hash tables are computed once
+        and reused in later calls with the same settings.
+
+        :param k: integer, number of nearest neighbors to find
+        :param references: list of reference names, or None to use all
+        :param n_tables: integer, number of hash tables
+        :param n_bits: integer, number of random hyperplanes per table
+        :param min_references: integer, use an exact search when the
+            matrix holds fewer references than this
+        :param seed: integer, seed for random hyperplanes
+        :return: dict mapping reference names to lists of k neighbors
+        """
+
+        if self.n_references() < min_references:
+            return self.all_nearest_neighbors(k, references)
+        if references is None:
+            references = self.column_names
+        index, unit = self.projection_index(n_tables, n_bits, seed)
+        column_names = self.column_names
+        result, missing = dict(), []
+        for refname in references:
+            source_index = self.columns[refname]
+            candidates = index.candidates(source_index)
+            candidates = candidates[candidates != source_index]
+            if len(candidates) < k:
+                missing.append(refname)
+                continue
+            distances = 1.0 - np.dot(unit[candidates], unit[source_index])
+            order = np.lexsort((candidates, distances))[:k]
+            result[refname] = [column_names[_] for _ in candidates[order]]
+        if len(missing) > 0:
+            result.update(self.all_nearest_neighbors(k, missing))
+        return result
+
+    def projection_index(self, n_tables, n_bits, seed):
+        """get hash tables and unit vectors for approximate searches
+
+        :param n_tables: integer, number of hash tables
+        :param n_bits: integer, number of random hyperplanes per table
+        :param seed: integer, seed for random hyperplanes
+        :return: 2-tuple with a ProjectionIndex and an array with unit
+            vectors for references (in rows)
+        """
+
+        settings = (n_tables, n_bits, seed)
+        if self._projection is None or self._projection[0] != settings:
+            norms = np.where(self.data_norms > 0, self.data_norms, 1.0)
+            unit = (self.data / norms[np.newaxis, :]).T
+            index = ProjectionIndex(self.data, norms, n_tables, n_bits, seed)
+            self._projection = (settings, index,
+                                np.ascontiguousarray(unit))
+        return self._projection[1], self._projection[2]
+
+    def distance(self, a, b):
+        """compute the distance between two references
+
+        :param a: name of reference
+        :param b: name of reference
+        :return: number, same as used to rank neighbors
+        """
+
+        a_index, b_index = self.columns[a], self.columns[b]
+        return cosine_distance(self.data[:, a_index], self.data[:, b_index],
+                               self.data_norms[a_index],
+                               self.data_norms[b_index])
+
     def get_average(self, references):
         """make a dictionary with a neighbor average."""
 
+        data = self.get_average_array(references).tolist()
+        return dict(zip(self.row_names, data))
+
+    def get_average_array(self, references):
+        """compute a neighbor average as an array (in row order)
+
+        :param references: list of reference names
+        :return: numpy array with one value per feature
+        """
+
         neighbors = np.array([self.columns[_] for _ in references])
-        n_features = len(self.rows)
-        data = neighbor_average(self.data, self.column_priors, neighbors)
-        result = dict.fromkeys(self.row_names, 0.0)
-        for i in range(n_features):
-            result[self.row_names[i]] = data[i]        
-        return result    
+        return neighbor_average(self.data, self.column_priors, neighbors)
 
     def get_data(self, reference):
         """extract data for one reference as a dict."""
@@ -9,7 +9,7 @@ from operator import itemgetter
 from math import log10, tanh
 from .evidence import InferenceDatum, estimate_update
 from .evidence import InferenceChain, LeanInferenceChain
-from .representation import Representation
+from .representation import Representation, OverlayRepresentation
 from .comparisoncodes import comparison_code
 from .write import write_refset
 from collections import Counter
@@ -61,6 +61,9 @@ class ReferenceSet:
         # map to ontology parents
         self.parents = None
         
+        # cache for rows built from shared representation bases
+        self.base_rows = dict()
+
         # cache for finding positive parents during FP inference calculations
         self.cache = dict()
         self.temp = Counter()
@@ -77,7 +80,7 @@ class ReferenceSet:
     def add(self, representation):
         """transfer data from a representation into this set"""
         
-        if type(representation) is not Representation:
+        if not isinstance(representation, Representation):
             raise Exception("input must be of type Representation")
         name = representation.name        
         if name is None:
@@ -86,12 +89,36 @@ class ReferenceSet:
             raise Exception("representation is not compatible")
                                             
         refindex = self.columns[name]
-        refdata = self.data[refindex]
-        for key in representation.keys():            
-            refdata[self.rows[key]] = representation.data[key]        
+        if isinstance(representation, OverlayRepresentation):
+            # start from shared values, then apply the deviations
+            refdata = self._base_row(representation.base_maps)
+            self.data[refindex] = refdata
+            data = representation.overlay
+        else:
+            refdata = self.data[refindex]
+            data = representation.data
+        for key in data.keys():
+            refdata[self.rows[key]] = data[key]
         
         return self
 
+    def _base_row(self, maps):
+        """get a data row filled with values from shared dicts (cached)
+
+        :param maps: list of dicts, earlier dicts take precedence
+        :return: a new list with one value per feature
+        """
+
+        cache_key = tuple([id(_) for _ in maps])
+        if cache_key not in self.base_rows:
+            row = [0.0] * len(self.rows)
+            for values in reversed(maps):
+                for key, value in values.items():
+                    row[self.rows[key]] = value
+            # keep references to maps so that their ids remain valid
+            self.base_rows[cache_key] = (maps, row)
+        return self.base_rows[cache_key][1].copy()
+
     def get(self, feature, reference):
         """Extract a value for a feature/reference."""
         keyindex = self.rows[feature]
@@ -4,7 +4,9 @@ Class that holds a representation of experimental data.
 This just holds a dict with a phenotype-associated API.
 """
 
+from collections import ChainMap
 from math import isclose
+from .imputation import impute_representation
 
 
 class Representation():    
@@ -39,7 +41,11 @@ class Representation():
         :param seeds: list of keys, imputation starts from these elements in
             specified order. If None, functions starts from all existing keys.
         """
-                
+
+        # use array-based propagation when the ontology supports it
+        if impute_representation(self, obo, defaults, seeds):
+            return self
+
         # add defaults to existing representation
         self.defaults(defaults)
         original = self.data.copy()
@@ -133,7 +139,7 @@ class Representation():
     def equal(self, rep, rel_tol=1e-6, abs_tol=0.0):
         """Determine if self is "equal" to another representation object."""
         
-        if type(rep) != Representation:
+        if not isinstance(rep, Representation):
             return False        
         if self.name != rep.name:
             return False
@@ -149,3 +155,58 @@ class Representation():
         return "Representation\nname: " + str(self.name) + \
                "\ndata: " + str(self.data)
 
+
+
+class OverlayRepresentation(Representation):
+    """A representation that stores only deviations from a shared base.
+
+    Lookups fall back onto the base (e.g. a dict with defaults or with
+    values for the null reference). Writes are recorded in the overlay,
+    so the base is never modified and can be shared by many objects.
+    """
+
+    def __init__(self, base, data=None, name=None):
+        """new representation on top of a base
+
+        :param base: dict with values for all keys, treated as read-only
+        :param data: dict with values that deviate from the base
+        :param name: string, name for the representation
+        """
+
+        super(OverlayRepresentation, self).__init__(data=data, name=name)
+        self.data = ChainMap(self.data, base)
+
+    @property
+    def overlay(self):
+        """dict with values recorded explicitly in this object"""
+        return self.data.maps[0]
+
+    @property
+    def base_maps(self):
+        """list with shared dicts, in order of lookup"""
+        return self.data.maps[1:]
+
+    def copy(self, name=None):
+        """create a new object with a copy of the overlay (base is shared)
+
+        :param name: string, name for new Representation
+        """
+
+        if name is None:
+            name = self.name
+        result = OverlayRepresentation(dict(), name=name)
+        result.data = self.data.copy()
+        return result
+
+    def defaults(self, defaults):
+        """extend the set of values encoded in the representation.
+
+        Data already saved in self will not be overwritten. The defaults
+        are consulted after the existing overlay and base, without copying.
+
+        :param defaults: dict
+        """
+
+        if all(defaults is not _ for _ in self.data.maps):
+            self.data.maps.append(defaults)
+        return self
@@ -83,3 +83,33 @@ class DBGeneratorTests(unittest.TestCase):
         with self.assertRaises(Exception) as e:
             DBGenerator(self.kvtab, fieldnames=["val"])
 
+
+    def test_batches_tuples(self):
+        """generator can fetch rows in batches of plain tuples."""
+
+        reader = DBGenerator(self.kvtab, fieldnames=["value", "key"])
+        self.assertEqual(reader.positions, dict(value=0, key=1))
+        batches = list(reader.batches(3))
+        self.assertEqual([len(_) for _ in batches], [3, 1])
+        rows = batches[0] + batches[1]
+        self.assertEqual(type(rows[0]), tuple)
+        self.assertEqual(sorted(rows), [(1, "one"), (2, "two"),
+                                        (3, "three"), (4, "four")])
+
+    def test_batches_where(self):
+        """batches respect where constraints."""
+
+        reader = DBGenerator(self.kvtab, where=dict(key="two"))
+        rows = [row for rows in reader.batches() for row in rows]
+        self.assertEqual(rows, [("two", 2)])
+
+    def test_columns(self):
+        """generator can transfer a whole table into column arrays."""
+
+        reader = DBGenerator(self.kvtab)
+        result = reader.columns(size=2)
+        self.assertEqual(sorted(result.keys()), ["key", "value"])
+        self.assertEqual(result["value"].dtype, float)
+        self.assertEqual(sorted(result["value"].tolist()), [1, 2, 3, 4])
+        self.assertEqual(sorted(result["key"].tolist()),
+                         ["four", "one", "three", "two"])
@@ -182,3 +182,17 @@ class DBTableTests(unittest.TestCase):
         self.assertFalse("C" in content)
         self.assertTrue("D" in content)
 
+
+    def test_table_create_indexes(self):
+        """can create declared indexes, repeatedly"""
+
+        class DBTableIndexed(DBTableExample):
+            indexes = (("example_key_value", ("key", "value")),)
+
+        table = DBTableIndexed(dbfile)
+        table.create_indexes()
+        table.create_indexes()
+        sql = "SELECT name FROM sqlite_master WHERE type='index'"
+        with get_conn(dbfile) as conn:
+            names = [row["name"] for row in conn.cursor().execute(sql)]
+        self.assertEqual(names, ["example_key_value"])
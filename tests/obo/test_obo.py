@@ -278,6 +278,17 @@ class OboAltsTests(unittest.TestCase):
         self.assertEqual(obo.canonical("AA:000"), None)
         self.assertEqual(obo.canonical("AA:002"), None)
 
+    def test_alts_index(self):
+        """index maps all alternative ids to primary ids"""
+
+        obo = MinimalObo(alts_file)
+        self.assertEqual(obo.alts_index,
+                         {"AA:02": "AA:2", "AA:03": "AA:3", "AA:003": "AA:3"})
+        # index is not affected by clearing caches
+        obo.clear_cache()
+        self.assertEqual(obo.canonical("AA:03"), "AA:3")
+        self.assertEqual(obo.canonical(None), None)
+
 
 class OboObsoleteTests(unittest.TestCase):
     """Testing replacing obsolete ids with canonical ids"""
@@ -318,3 +329,46 @@ class OboMinimizeTests(unittest.TestCase):
                 tt_out = tt_stream.readlines()
         self.assertTrue("remark" in str(tt_out))
 
+
+
+class OboClosureTests(unittest.TestCase):
+    """Testing precomputed and iterative closures"""
+
+    def test_precompute_closures(self):
+        """precomputed closures match on-demand closures"""
+
+        for filepath in [smallfile, obsolete_file, join(testdir, "Ymulti.obo")]:
+            expected = MinimalObo(filepath)
+            obo = MinimalObo(filepath)
+            obo.precompute_closures()
+            self.assertEqual(len(obo.ancestors_cache), len(obo.ids(True)))
+            for id in obo.ids(True):
+                self.assertEqual(sorted(obo.ancestors(id)),
+                                 sorted(expected.ancestors(id)))
+                self.assertEqual(sorted(obo.descendants(id)),
+                                 sorted(expected.descendants(id)))
+
+    def test_precompute_without_children(self):
+        """descendants are not inferred when children are not inferred"""
+
+        obo = MinimalObo(smallfile, infer_children=False)
+        obo.precompute_closures()
+        self.assertEqual(obo.descendants("DOID:4"), ())
+        self.assertEqual(len(obo.ancestors("DOID:3650")), 3)
+
+    def test_deep_ontology(self):
+        """closures of long chains do not hit the recursion limit"""
+
+        depth = 1500
+        with tempfile.TemporaryDirectory() as tempdir:
+            filepath = join(tempdir, "deep.obo")
+            with open(filepath, "w") as f:
+                f.write("[Term]\nid: D:0\n")
+                for i in range(1, depth):
+                    f.write("\n[Term]\nid: D:"+str(i)+"\nis_a: D:"+str(i-1)+"\n")
+            obo = MinimalObo(filepath)
+            self.assertEqual(len(obo.ancestors("D:"+str(depth-1))), depth-1)
+            self.assertEqual(len(obo.descendants("D:0")), depth-1)
+            obo.clear_cache()
+            obo.precompute_closures()
+            self.assertEqual(len(obo.ancestors("D:"+str(depth-1))), depth-1)
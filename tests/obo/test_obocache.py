@@ -0,0 +1,122 @@
+"""
+Tests for contents of obo/obocache.py
+"""
+
+from glob import glob
+from os.path import join, exists
+import json
+import pickle
+import shutil
+import tempfile
+import unittest
+from obo.obo import MinimalObo
+from obo.obocache import obo_cache_path, obo_fingerprint, load_obo_cache
+from obo.obocache import cache_version
+from obo.oboterm import MinimalOboTerm
+
+
+testdir = join("tests", "testdata")
+
+
+def relations(obo):
+    """summarize all relations in an ontology, ignoring order."""
+    return {k: sorted(v.relations) for k, v in obo.terms.items()}
+
+
+class OboCacheTests(unittest.TestCase):
+    """Test cases for loading ontologies through a cache file."""
+
+    def setUp(self):
+        """copy an ontology into a temporary directory"""
+
+        self.tempdir = tempfile.mkdtemp()
+        self.obofile = join(self.tempdir, "obsolete.obo")
+        shutil.copy(join(testdir, "obsolete.obo"), self.obofile)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_no_cache_by_default(self):
+        """a cache is not created by default"""
+
+        MinimalObo(self.obofile)
+        self.assertFalse(exists(obo_cache_path(self.obofile)))
+
+    def test_cache_roundtrip(self):
+        """loading through a cache gives the same ontology"""
+
+        parsed = MinimalObo(self.obofile, cache=True)
+        self.assertTrue(exists(obo_cache_path(self.obofile)))
+        fingerprint = obo_fingerprint(self.obofile)
+        terms = load_obo_cache(self.obofile, fingerprint, MinimalOboTerm)
+        self.assertEqual(sorted(terms.keys()), sorted(parsed.terms.keys()))
+
+        cached = MinimalObo(self.obofile, cache=True)
+        self.assertEqual(cached.ids(True), parsed.ids(True))
+        self.assertEqual(cached.ids(), parsed.ids())
+        self.assertEqual(relations(cached), relations(parsed))
+        self.assertEqual(cached.alts_index, parsed.alts_index)
+        for id in parsed.ids(True):
+            self.assertEqual(cached.replaced_by(id), parsed.replaced_by(id))
+            self.assertEqual(sorted(cached.descendants(id)),
+                             sorted(parsed.descendants(id)))
+
+    def test_cache_without_children(self):
+        """cache can be used without inferring children"""
+
+        MinimalObo(self.obofile, cache=True)
+        cached = MinimalObo(self.obofile, infer_children=False, cache=True)
+        parsed = MinimalObo(self.obofile, infer_children=False)
+        self.assertEqual(relations(cached), relations(parsed))
+
+    def test_cache_invalidated(self):
+        """cache is not used when the obo file changes"""
+
+        MinimalObo(self.obofile, cache=True)
+        with open(self.obofile, "a") as f:
+            f.write("\n[Term]\nid: SMALL:99\nis_a: SMALL:1\n")
+        fingerprint = obo_fingerprint(self.obofile)
+        terms = load_obo_cache(self.obofile, fingerprint, MinimalOboTerm)
+        self.assertEqual(terms, None)
+        obo = MinimalObo(self.obofile, cache=True)
+        self.assertTrue(obo.has("SMALL:99"))
+        terms = load_obo_cache(self.obofile, fingerprint, MinimalOboTerm)
+        self.assertTrue("SMALL:99" in terms)
+
+    def test_cache_header_checked_first(self):
+        """stale cache is rejected using only the header"""
+
+        fingerprint = obo_fingerprint(self.obofile)
+        with open(obo_cache_path(self.obofile), "wt") as f:
+            header = dict(version=cache_version, fingerprint="other")
+            f.write(json.dumps(header) + "\n")
+            f.write("not a json payload\n")
+        terms = load_obo_cache(self.obofile, fingerprint, MinimalOboTerm)
+        self.assertEqual(terms, None)
+        # a cache is rewritten, without leaving temporary files
+        MinimalObo(self.obofile, cache=True)
+        terms = load_obo_cache(self.obofile, fingerprint, MinimalOboTerm)
+        self.assertFalse(terms is None)
+        self.assertEqual(len(glob(join(self.tempdir, "*.tmp"))), 0)
+
+    def test_cache_is_not_pickled(self):
+        """a cache file in an old pickled format is ignored"""
+
+        fingerprint = obo_fingerprint(self.obofile)
+        header = dict(version=cache_version, fingerprint=fingerprint)
+        with open(obo_cache_path(self.obofile), "wb") as f:
+            pickle.dump(header, f)
+            pickle.dump(dict(), f)
+        terms = load_obo_cache(self.obofile, fingerprint, MinimalOboTerm)
+        self.assertEqual(terms, None)
+
+    def test_cache_corrupt_payload(self):
+        """a payload that does not describe terms is ignored"""
+
+        fingerprint = obo_fingerprint(self.obofile)
+        with open(obo_cache_path(self.obofile), "wt") as f:
+            header = dict(version=cache_version, fingerprint=fingerprint)
+            f.write(json.dumps(header) + "\n")
+            f.write(json.dumps(dict(names=[], n_ids=2)) + "\n")
+        terms = load_obo_cache(self.obofile, fingerprint, MinimalOboTerm)
+        self.assertEqual(terms, None)
@@ -0,0 +1,100 @@
+"""
+Tests for contents of obo/obodiff.py
+"""
+
+from os.path import join
+import shutil
+import tempfile
+import unittest
+from obo.obo import MinimalObo
+from obo.obodiff import diff_obo, changed_terms, changed_keys
+
+
+testdir = join("tests", "testdata")
+
+
+class OboDiffTests(unittest.TestCase):
+    """Test cases for comparing versions of an ontology."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.Y = MinimalObo(join(testdir, "Y.obo"))
+        cls.Yprev = MinimalObo(join(testdir, "Y.prev.obo"))
+        cls.Yext = MinimalObo(join(testdir, "Y.ext1.obo"))
+
+    def test_identical(self):
+        """same ontologies have empty diffs"""
+
+        diff = diff_obo(self.Y, self.Y)
+        self.assertEqual(sum([len(_) for _ in diff.values()]), 0)
+        self.assertEqual(changed_terms(self.Y, self.Y), set())
+
+    def test_reparented(self):
+        """detect a term with a new parent"""
+
+        diff = diff_obo(self.Yprev, self.Y)
+        self.assertEqual(diff["reparented"], set(["Y:007"]))
+        self.assertEqual(diff["added"], set())
+
+    def test_changed_reparented(self):
+        """closures of parents and children change"""
+
+        result = changed_terms(self.Yprev, self.Y)
+        self.assertEqual(result, set(["Y:001", "Y:002", "Y:007", "Y:008"]))
+
+    def test_added(self):
+        """detect new terms and their effect on closures"""
+
+        diff = diff_obo(self.Y, self.Yext)
+        self.assertEqual(diff["added"], set(["Y:900", "Y:901", "Y:902"]))
+        self.assertEqual(diff["removed"], set())
+        self.assertEqual(diff["reparented"], set(["Y:006"]))
+        result = changed_terms(self.Y, self.Yext)
+        self.assertTrue("Y:006" in result)
+        self.assertTrue("Y:005" in result)
+        self.assertTrue("Y:900" in result)
+        self.assertTrue("Y:004" in result)
+        self.assertFalse("Y:002" in result)
+
+    def test_changed_keys(self):
+        """raw keys are changed when their terms are changed"""
+
+        keys = ["Y:003", "Y:007", "bad"]
+        result = changed_keys(self.Yprev, self.Y, keys)
+        self.assertEqual(result, set(["Y:007"]))
+
+
+class OboDiffObsoleteTests(unittest.TestCase):
+    """Test cases for obsolete terms and replacements."""
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.old = MinimalObo(join(testdir, "obsolete.obo"))
+        with open(join(testdir, "obsolete.obo"), "rt") as f:
+            content = f.read()
+        content = content.replace("replaced_by: SMALL:4",
+                                  "replaced_by: SMALL:3")
+        content = content.replace("id: SMALL:4\n",
+                                  "id: SMALL:4\nis_obsolete: true\n")
+        newfile = join(self.tempdir, "obsolete.obo")
+        with open(newfile, "wt") as f:
+            f.write(content)
+        self.new = MinimalObo(newfile)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_diff(self):
+        """detect obsoleted terms and changed replacements"""
+
+        diff = diff_obo(self.old, self.new)
+        self.assertEqual(diff["obsoleted"], set(["SMALL:4"]))
+        self.assertEqual(diff["replaced_by"], set(["SMALL:6"]))
+        self.assertEqual(diff["restored"], set())
+
+    def test_changed_keys(self):
+        """obsolete keys are resolved through replacements"""
+
+        keys = ["SMALL:3", "SMALL:5", "SMALL:6"]
+        result = changed_keys(self.old, self.new, keys)
+        self.assertEqual(result, set(["SMALL:6"]))
@@ -0,0 +1,131 @@
+"""
+Tests for contents of obo/oboindex.py
+"""
+
+from os.path import join
+import unittest
+from obo.obo import MinimalObo
+from obo.oboindex import OboIndex, topological_order, make_csr, popcount
+
+
+testdir = join("tests", "testdata")
+smallfile = join(testdir, "small.obo")
+multifile = join(testdir, "Ymulti.obo")
+
+
+class OboIndexHelperTests(unittest.TestCase):
+    """Test cases for helper functions."""
+
+    def test_make_csr(self):
+        """convert lists into pointer and index arrays"""
+
+        ptr, idx = make_csr([[1, 2], [], [0]])
+        self.assertEqual(list(ptr), [0, 2, 2, 3])
+        self.assertEqual(list(idx), [1, 2, 0])
+
+    def test_topological_order(self):
+        """parents appear before children"""
+
+        parents = [[1], [], [0, 1], [2]]
+        self.assertEqual(topological_order(parents), [1, 0, 2, 3])
+
+    def test_topological_order_cycle(self):
+        """raise exception on cycles"""
+
+        with self.assertRaises(Exception) as e:
+            topological_order([[1], [0]])
+        self.assertTrue("cycle" in str(e.exception))
+
+    def test_popcount(self):
+        """count set bits"""
+
+        self.assertEqual(popcount(0), 0)
+        self.assertEqual(popcount(11), 3)
+
+
+class OboIndexTests(unittest.TestCase):
+    """Test cases for class OboIndex."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.obo = MinimalObo(smallfile)
+        cls.index = cls.obo.index()
+
+    def test_cached(self):
+        """index is created once per ontology"""
+
+        self.assertTrue(self.obo.index() is self.index)
+
+    def test_ids(self):
+        """index covers all terms, including obsolete terms"""
+
+        self.assertEqual(len(self.index), len(self.obo.ids(True)))
+        self.assertEqual(self.index.indexes(["DOID:4"]), [0])
+
+    def test_indexes_unknown(self):
+        """raise exception for unknown terms"""
+
+        with self.assertRaises(Exception) as e:
+            self.index.indexes(["DOID:4", "bad_id"])
+        self.assertTrue("not present" in str(e.exception))
+
+    def test_closures_match_obo(self):
+        """ancestors and descendants agree with recursive traversal"""
+
+        index = self.index
+        for i, id in enumerate(index.ids):
+            ancestors = [index.ids[_] for _ in index.ancestors(i)]
+            self.assertEqual(sorted(ancestors), sorted(self.obo.ancestors(id)))
+            descendants = [index.ids[_] for _ in index.descendants(i)]
+            self.assertEqual(sorted(descendants),
+                             sorted(self.obo.descendants(id)))
+            parents = [index.ids[_] for _ in index.parents(i)]
+            self.assertEqual(sorted(parents), sorted(self.obo.parents(id)))
+
+    def test_is_ancestor(self):
+        """membership queries using bitsets"""
+
+        index = self.index
+        root, leaf = index.indexes(["DOID:4", "DOID:3650"])
+        self.assertTrue(index.is_ancestor(root, leaf))
+        self.assertFalse(index.is_ancestor(leaf, root))
+        self.assertFalse(index.is_ancestor(leaf, leaf))
+        self.assertEqual(index.filter_ancestors([root, leaf], leaf), [root])
+
+    def test_ancestors_mask(self):
+        """incidence matrix with ancestors"""
+
+        index = self.index
+        leaf = index.indexes(["DOID:3650"])[0]
+        mask = index.ancestors_mask([leaf])
+        self.assertEqual(mask.shape, (1, len(index)))
+        self.assertEqual(mask.sum(), 4)
+        self.assertEqual(index.ancestors_mask([leaf], False).sum(), 3)
+
+    def test_counts_and_jaccard(self):
+        """intersection and union counts agree with jaccard"""
+
+        index = self.index
+        a, b = index.indexes(["DOID:655", "DOID:0060158"])
+        inter = index.intersection_counts(a, [a, b])
+        union = index.union_counts(a, [a, b])
+        self.assertEqual(list(inter), [3, 2])
+        self.assertEqual(list(union), [3, 4])
+        self.assertEqual(index.jaccard(a, b), 0.5)
+
+
+class OboIndexMultiTests(unittest.TestCase):
+    """Test cases for an ontology with multiple parents."""
+
+    def test_closures_match_obo(self):
+        """ancestors agree with recursive traversal"""
+
+        for filepath in [multifile, join(testdir, "obsolete.obo")]:
+            obo = MinimalObo(filepath)
+            index = OboIndex(obo)
+            for i, id in enumerate(index.ids):
+                ancestors = [index.ids[_] for _ in index.ancestors(i)]
+                self.assertEqual(sorted(ancestors), sorted(obo.ancestors(id)))
+                descendants = [index.ids[_] for _ in index.descendants(i)]
+                self.assertEqual(sorted(descendants),
+                                 sorted(obo.descendants(id)))
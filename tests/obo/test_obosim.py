@@ -0,0 +1,85 @@
+"""
+Tests for contents of obo/obosim.py
+"""
+
+from os.path import join
+import unittest
+from obo.obo import MinimalObo
+from obo.obosim import ancestor_incidence, jaccard_blocks, jaccard_matrix
+
+
+testdir = join("tests", "testdata")
+smallfile = join(testdir, "small.obo")
+multifile = join(testdir, "Ymulti.obo")
+
+
+class OboSimTests(unittest.TestCase):
+    """Test cases for batch similarity computations."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.small = MinimalObo(smallfile)
+        cls.multi = MinimalObo(multifile)
+
+    def test_incidence(self):
+        """incidence matrix marks terms and their ancestors"""
+
+        mat, columns = ancestor_incidence(self.small, ["DOID:0014667", "DOID:3650"])
+        self.assertEqual(mat.shape, (2, len(columns)))
+        ids = [self.small.index().ids[_] for _ in columns]
+        for row, key in enumerate(["DOID:0014667", "DOID:3650"]):
+            expected = set(self.small.ancestors(key)).union([key])
+            marked = set([ids[_] for _ in range(len(ids)) if mat[row, _]])
+            self.assertEqual(marked, expected)
+
+    def test_matrix_small(self):
+        """all-pairs similarities match pairwise computations"""
+
+        obo = self.small
+        keys = obo.ids()
+        result = jaccard_matrix(obo, keys)
+        self.assertEqual(result.shape, (len(keys), len(keys)))
+        for i, a in enumerate(keys):
+            for j, b in enumerate(keys):
+                self.assertEqual(result[i, j], obo.sim_jaccard(a, b))
+
+    def test_matrix_multi_others(self):
+        """similarities between two distinct sets of terms"""
+
+        obo = self.multi
+        keys = obo.ids()
+        others = keys[:3]
+        result = jaccard_matrix(obo, keys, others, block_size=2)
+        self.assertEqual(result.shape, (len(keys), 3))
+        for i, a in enumerate(keys):
+            for j, b in enumerate(others):
+                self.assertEqual(result[i, j], obo.sim_jaccard(a, b))
+
+    def test_blocks(self):
+        """rows are delivered in blocks"""
+
+        keys = self.small.ids()
+        blocks = list(jaccard_blocks(self.small, keys, block_size=3))
+        self.assertEqual([_[0] for _ in blocks],
+                         list(range(0, len(keys), 3)))
+        self.assertEqual(sum([_[1].shape[0] for _ in blocks]), len(keys))
+
+    def test_blocks_match_matrix(self):
+        """blocks of rows and columns give the same values as one block"""
+
+        keys = sorted(self.small.ids())
+        expected = jaccard_matrix(self.small, keys, block_size=len(keys))
+        result = jaccard_matrix(self.small, keys, keys[1:], block_size=2)
+        self.assertEqual(result.tolist(), expected[:, 1:].tolist())
+
+    def test_empty_others(self):
+        """comparison against an empty set gives empty columns"""
+
+        result = jaccard_matrix(self.small, ["DOID:0014667", "DOID:3650"], [])
+        self.assertEqual(result.shape, (2, 0))
+
+    def test_unknown_key(self):
+        """raise exception for keys not in ontology"""
+
+        with self.assertRaises(Exception):
+            jaccard_matrix(self.small, ["DOID:3650", "bad"])
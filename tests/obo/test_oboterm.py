@@ -3,6 +3,7 @@ Tests for definitions of obo terms
 """
 
 import unittest
+from sys import intern
 from obo.oboterm import MinimalOboTerm, OboTerm
 
 
@@ -19,6 +20,23 @@ class MinimalOboTermTests(unittest.TestCase):
         self.assertTrue("ABC" in result)
         self.assertFalse("child_A" in result)
 
+    def test_compact(self):
+        """terms do not carry per-instance dictionaries"""
+
+        term = MinimalOboTerm()
+        self.assertFalse(hasattr(term, "__dict__"))
+        with self.assertRaises(AttributeError):
+            term.name = "abc"
+
+    def test_interned_ids(self):
+        """ids and relation targets are interned"""
+
+        term = MinimalOboTerm()
+        term.parse("id: "+"ABC:"+"002")
+        term.parse("is_a: "+"ABC:"+"001 ! root")
+        self.assertTrue(term.id is intern("ABC:002"))
+        self.assertTrue(term.relations[0][1] is intern("ABC:001"))
+
 
 class OboTermTests(unittest.TestCase):
     """Test cases for class OboTerm."""
@@ -159,3 +177,18 @@ class OboTermTests(unittest.TestCase):
         self.assertEqual(len(term.alts), 2)
         self.assertTrue("ABC:2" in term.alts)
 
+
+    def test_parse_field(self):
+        """lines split into field and value give the same terms"""
+
+        lines = ["id: ABC:002", "name: abc", "is_a: ABC:001 ! root",
+                 "synonym: \"abc two\" EXACT []", "def: \"a term\" []"]
+        expected, result = OboTerm(), OboTerm()
+        for line in lines:
+            expected.parse(line)
+            field, _, value = line.partition(": ")
+            result.parse_field(field, value)
+        self.assertEqual(result.id, expected.id)
+        self.assertEqual(result.relations, expected.relations)
+        self.assertEqual(result.synonyms, expected.synonyms)
+        self.assertEqual(result.data, expected.data)
@@ -0,0 +1,73 @@
+"""
+Tests for phenoscoring/phenoscoring.py
+
+Adding references to an existing db
+"""
+
+import os.path
+import unittest
+from phenoscoring.phenoscoring import Phenoscoring
+from phenoscoring.dbtables import ModelScoreTable, ReferenceNeighborsTable
+from phenoscoring.dbtables import ReferencePriorsTable
+from phenoscoring.dbtables import ReferenceCompletePhenotypeTable
+from ..testhelpers import remove_db, table_rows
+from ..testhelpers import CompleteTestConfig, IMPCTestConfig
+
+
+class PartialTestConfig(CompleteTestConfig):
+    """A configuration for a build with a subset of references"""
+
+    db = os.path.join("tests", "testdata", "phenoscoring-partial.sqlite")
+    reference_phenotypes = "prep-phenotab-phenotypes-partial.tsv"
+
+
+class PartialIMPCTestConfig(PartialTestConfig):
+    """A configuration for updating a db with IMPC models"""
+
+    model_descriptions = IMPCTestConfig.model_descriptions
+    model_phenotypes = IMPCTestConfig.model_phenotypes
+    partition_size = IMPCTestConfig.partition_size
+
+
+class AddReferencesTests(unittest.TestCase):
+    """Test cases for adding references to an existing db"""
+
+    @classmethod
+    def setUpClass(cls):
+        """build a db with all references, and one with a subset"""
+
+        Phenoscoring(CompleteTestConfig()).build()
+        Phenoscoring(IMPCTestConfig()).update()
+        cls.dbfile = CompleteTestConfig.db
+
+        Phenoscoring(PartialTestConfig()).build()
+        Phenoscoring(PartialIMPCTestConfig()).update()
+        cls.partialfile = PartialTestConfig.db
+
+    @classmethod
+    def tearDownClass(cls):
+        remove_db(cls.dbfile)
+        remove_db(cls.partialfile)
+
+    def test_add_references(self):
+        """db with added references matches a complete build"""
+
+        config = PartialTestConfig()
+        config.action = "add_references"
+        config.reset = False
+        config.reference_phenotypes = "prep-phenotab-phenotypes-extra.tsv"
+        Phenoscoring(config).add_references()
+
+        tables = [(ReferencePriorsTable, ("id", "value")),
+                  (ReferenceNeighborsTable, ("id", "neighbor", "rank")),
+                  (ReferenceCompletePhenotypeTable,
+                   ("id", "phenotype", "value", "specific_value")),
+                  (ModelScoreTable,
+                   ("model", "reference", "general", "specific"))]
+        for table, fields in tables:
+            self.assertEqual(table_rows(table(self.dbfile), fields),
+                             table_rows(table(self.partialfile), fields))
+
+        # adding the same references again is not allowed
+        with self.assertRaises(Exception):
+            Phenoscoring(config).add_references()
@@ -3,9 +3,12 @@ Tests for creating database structure and populating data on references.
 """
 
 import unittest
+import numpy as np
 from os.path import abspath, join
 from db.generator import DBGenerator
 from phenoscoring.build import get_reference_neighbors
+from phenoscoring.build import prep_refset, prep_refmatrix
+from phenoscoring.build import expand_neighbor_references
 from phenoscoring.phenoscoring import Phenoscoring 
 from phenoscoring.dbhelpers import get_refsets
 from phenoscoring.dbhelpers import get_ref_priors, get_phenotype_priors
@@ -13,6 +16,8 @@ from phenoscoring.dbtables import ReferenceConcisePhenotypeTable
 from phenoscoring.dbtables import ReferenceCompletePhenotypeTable
 from phenoscoring.dbtables import ModelDescriptionTable
 from ..testhelpers import remove_db
+from obo.obo import MinimalObo
+from scoring.referencematrix import ReferenceMatrix
 from ..testhelpers import CompleteTestConfig
 
 
@@ -191,6 +196,93 @@ class BuildNeighborsTests(unittest.TestCase):
         self.assertEqual(neighbors["DISEASE:4"][0], "null")
 
 
+class BuildMatrixTests(unittest.TestCase):
+    """Test cases for preparing complete reference representations."""
+
+    @classmethod
+    def setUpClass(cls):
+        """For setup, build a db with references."""
+        cls.config = CompleteTestConfig()
+        cls.dbfile = cls.config.db
+        remove_db(cls.dbfile)
+        Phenoscoring(cls.config).build()
+
+    @classmethod
+    def tearDownClass(cls):
+        """At end, ensure test db is deleted."""
+        remove_db(cls.dbfile)
+
+    def test_refmatrix_same_as_refset(self):
+        """matrix prepared with arrays matches a converted refset"""
+
+        obo = MinimalObo(join("tests", "testdata", "Y.obo"), True)
+        ref_priors = get_ref_priors(self.dbfile)
+        factor = self.config.reference_missing_factor
+        refset = prep_refset(self.dbfile, obo, ref_priors, factor)
+        expected = ReferenceMatrix(refset, refset.row_names)
+        result = prep_refmatrix(self.dbfile, obo, ref_priors, factor)
+        self.assertEqual(result.row_names, expected.row_names)
+        self.assertEqual(result.column_names, expected.column_names)
+        self.assertEqual(result.data.tolist(), expected.data.tolist())
+
+
+class ExpandNeighborsTests(unittest.TestCase):
+    """Test cases for identifying references with changed neighbors."""
+
+    def setUp(self):
+        """a matrix with two groups of references"""
+
+        data = np.array([[1.0, 0.9, 0.8, 0.1, 0.2, 0.0, 0.5],
+                         [0.0, 0.1, 0.2, 0.9, 0.8, 1.0, 0.5],
+                         [0.5, 0.4, 0.5, 0.4, 0.5, 0.4, 0.5]])
+        names = ["A", "B", "C", "X", "Y", "Z", "null"]
+        self.refmatrix = ReferenceMatrix.from_array(data, ["p1", "p2", "p3"],
+                                                    names, [0.1]*7)
+        self.neighbors = self.refmatrix.all_nearest_neighbors(2)
+
+    def test_expand_far_reference(self):
+        """a changed reference far from others affects its own group"""
+
+        result = expand_neighbor_references(self.refmatrix, self.neighbors,
+                                            {"A"}, 2)
+        self.assertTrue("A" in result)
+        self.assertTrue("B" in result)
+        self.assertTrue("C" in result)
+        self.assertFalse("Z" in result)
+
+    def test_expand_includes_changed_neighbors(self):
+        """references with changed neighbors are always included"""
+
+        neighbors = dict(self.neighbors)
+        neighbors["Z"] = ["X", "A"]
+        result = expand_neighbor_references(self.refmatrix, neighbors,
+                                            {"A"}, 2)
+        self.assertTrue("Z" in result)
+
+    def test_expand_incomplete_records(self):
+        """references without complete records are included"""
+
+        neighbors = dict(self.neighbors)
+        neighbors["Z"] = ["X", ""]
+        result = expand_neighbor_references(self.refmatrix, neighbors,
+                                            {"A"}, 2)
+        self.assertTrue("Z" in result)
+
+    def test_expand_covers_all_changes(self):
+        """all references with changed neighbors are identified"""
+
+        before = ReferenceMatrix.from_array(self.refmatrix.data[:, 1:],
+                                            self.refmatrix.row_names,
+                                            self.refmatrix.column_names[1:],
+                                            [0.1]*6)
+        neighbors = before.all_nearest_neighbors(2)
+        result = expand_neighbor_references(self.refmatrix, neighbors,
+                                            {"A"}, 2)
+        for refname, ref_neighbors in self.neighbors.items():
+            if ref_neighbors != neighbors.get(refname):
+                self.assertTrue(refname in result or refname == "null")
+
+
 class AvoidBuildTests(unittest.TestCase):
     """Test cases for avoiding resetting phenoscoring db."""
     
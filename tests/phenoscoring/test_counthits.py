@@ -5,6 +5,7 @@ Tests for counting hits among model scores
 import unittest
 from phenoscoring.phenoscoring import Phenoscoring
 from phenopost.counthits import count_hits, get_highscore_pairs
+from phenopost.counthits import count_hits_tiers
 from tools.files import check_file
 from phenoscoring.dbtables import ModelScoreTable
 from ..testhelpers import remove_db
@@ -75,3 +76,20 @@ class CounthitsTests(unittest.TestCase):
         self.assertEqual(hits3["DISEASE:3"], (1,1))
         self.assertEqual(hits3["DISEASE:4"], (0,0))
 
+
+    def test_hits_many_thresholds(self):
+        """count hits at several thresholds at once."""
+
+        hits = count_hits_tiers(self.dbfile, [0.95, 0.9, 0.5, 0.1])
+        self.assertEqual(len(hits), 5, "4 diseases, 1 null")
+        self.assertEqual(hits["DISEASE:1"], (0, 2, 2, 3))
+        self.assertEqual(hits["DISEASE:2"], (0, 1, 2, 2))
+        self.assertEqual(hits["DISEASE:3"], (0, 1, 1, 1))
+        self.assertEqual(hits["DISEASE:4"], (0, 0, 0, 0))
+        self.assertEqual(hits["null"], (0, 0, 0, 0))
+
+    def test_hits_no_thresholds(self):
+        """counting without thresholds gives empty tuples."""
+
+        hits = count_hits_tiers(self.dbfile, [])
+        self.assertEqual(hits["DISEASE:1"], ())
@@ -357,6 +357,19 @@ class PhenoscoringEntityTrimmingTests(unittest.TestCase):
         result = set([_.phenotype for _ in m.data])
         self.assertEqual(result, set(["DOID:11044", "DOID:655", "DOID:0080015"]))
 
+    def test_trim_duplicates(self):
+        """trimming uses the highest value among repeated descendants."""
+
+        m = Entity("abc", "genes")
+        d1 = PhenotypeDatum("DOID:4", Experiment(1, 0.8, 0.05))
+        d2 = PhenotypeDatum("DOID:11044", Experiment(0.5, 0.8, 0.05))
+        d3 = PhenotypeDatum("DOID:11044", Experiment(1, 0.8, 0.05))
+        d4 = PhenotypeDatum("DOID:4", Experiment(0, 0.8, 0.05))
+        m.add(d1).add(d2).add(d3).add(d4)
+
+        m.trim_ancestors(self.obo)
+        self.assertEqual(m.data, [d2, d3, d4])
+
 
 class PhenoscoringEntityFilterTests(unittest.TestCase):
     """Test cases for filtering phenoscoring entity objects"""
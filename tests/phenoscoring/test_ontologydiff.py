@@ -0,0 +1,78 @@
+"""
+Tests for phenoscoring/phenoscoring.py
+
+Refreshing a db after an ontology upgrade
+"""
+
+import os.path
+import unittest
+from phenoscoring.phenoscoring import Phenoscoring
+from phenoscoring.dbtables import ModelScoreTable, ReferenceNeighborsTable
+from phenoscoring.dbtables import ReferenceCompletePhenotypeTable
+from ..testhelpers import remove_db, table_rows
+from ..testhelpers import CompleteTestConfig, IMPCTestConfig
+
+
+class PreviousTestConfig(CompleteTestConfig):
+    """A configuration for a build with a previous ontology"""
+
+    db = os.path.join("tests", "testdata", "phenoscoring-previous.sqlite")
+    obo = "Y.prev.obo"
+
+
+class PreviousIMPCTestConfig(PreviousTestConfig):
+    """A configuration for updating a db with IMPC models"""
+
+    model_descriptions = IMPCTestConfig.model_descriptions
+    model_phenotypes = IMPCTestConfig.model_phenotypes
+    partition_size = IMPCTestConfig.partition_size
+
+
+class OntologyDiffTests(unittest.TestCase):
+    """Test cases for refreshing a db after an ontology upgrade"""
+
+    @classmethod
+    def setUpClass(cls):
+        """build a db with the previous and current ontologies"""
+
+        Phenoscoring(CompleteTestConfig()).build()
+        Phenoscoring(IMPCTestConfig()).update()
+        cls.dbfile = CompleteTestConfig.db
+
+        Phenoscoring(PreviousTestConfig()).build()
+        Phenoscoring(PreviousIMPCTestConfig()).update()
+        cls.prevfile = PreviousTestConfig.db
+
+    @classmethod
+    def tearDownClass(cls):
+        remove_db(cls.dbfile)
+        remove_db(cls.prevfile)
+
+    def test_ontologydiff(self):
+        """refreshed db matches a db built with the current ontology"""
+
+        # before the refresh, the dbs are different
+        fields = ("id", "phenotype", "value", "specific_value")
+        current = table_rows(ReferenceCompletePhenotypeTable(self.dbfile),
+                             fields)
+        previous = table_rows(ReferenceCompletePhenotypeTable(self.prevfile),
+                              fields)
+        self.assertNotEqual(current, previous)
+
+        config = PreviousTestConfig()
+        config.action = "ontologydiff"
+        config.obo_previous = "Y.prev.obo"
+        config.obo = "Y.obo"
+        Phenoscoring(config).ontologydiff()
+
+        previous = table_rows(ReferenceCompletePhenotypeTable(self.prevfile),
+                              fields)
+        self.assertEqual(current, previous)
+        fields = ("id", "neighbor", "rank")
+        self.assertEqual(table_rows(ReferenceNeighborsTable(self.dbfile),
+                                    fields),
+                         table_rows(ReferenceNeighborsTable(self.prevfile),
+                                    fields))
+        fields = ("model", "reference", "general", "specific")
+        self.assertEqual(table_rows(ModelScoreTable(self.dbfile), fields),
+                         table_rows(ModelScoreTable(self.prevfile), fields))
@@ -0,0 +1,115 @@
+"""
+Tests for querying top-scoring models and references
+"""
+
+import unittest
+from io import StringIO
+from phenoscoring.phenoscoring import Phenoscoring
+from phenoscoring.query import top_models, top_references
+from phenoscoring.query import _top_scores_sql
+from db.db import get_conn
+from tools.files import check_file
+from phenoscoring.dbtables import ModelScoreTable
+from ..testhelpers import remove_db
+from ..testhelpers import MGITestConfig
+
+
+class QueryTests(unittest.TestCase):
+    """Test cases for querying scores in an existing db."""
+
+    @classmethod
+    def setUpClass(cls):
+        """For setup, build a db and add scores by hand."""
+
+        config = MGITestConfig()
+        cls.dbfile = config.db
+        config.obo = check_file(config.obo, config.db)
+        cls.pipeline = Phenoscoring(config)
+        cls.pipeline.build()
+
+        model = ModelScoreTable(config.db)
+        model.add("model:1", "DISEASE:1", "stamp", 0.95, 0.98)
+        model.add("model:2", "DISEASE:1", "stamp", 0.94, 0.99)
+        model.add("model:3", "DISEASE:1", "stamp", 0.24, 0.96)
+        model.add("model:1", "DISEASE:2", "stamp", 0.92, 0.15)
+        model.add("model:5", "DISEASE:2", "stamp", 0.86, 0.85)
+        model.save()
+
+    @classmethod
+    def tearDownClass(cls):
+        """At end, ensure test db is deleted."""
+        remove_db(cls.dbfile)
+
+    def test_top_models_general(self):
+        """rank models for a reference by general score"""
+
+        result = top_models(self.dbfile, "DISEASE:1", n=2)
+        self.assertEqual([_[0] for _ in result], ["model:1", "model:2"])
+        self.assertEqual(result[0], ("model:1", "DISEASE:1", 0.95, 0.98))
+
+    def test_top_models_specific(self):
+        """rank models for a reference by specific score"""
+
+        result = top_models(self.dbfile, "DISEASE:1", n=5, by="specific")
+        self.assertEqual([_[0] for _ in result],
+                         ["model:2", "model:1", "model:3"])
+
+    def test_top_models_thresholds(self):
+        """threshold filters remove low-scoring pairs"""
+
+        result = top_models(self.dbfile, "DISEASE:1", min_general=0.5)
+        self.assertEqual(len(result), 2)
+        result = top_models(self.dbfile, "DISEASE:1", min_general=0.5,
+                            min_specific=0.985)
+        self.assertEqual([_[0] for _ in result], ["model:2"])
+
+    def test_top_references(self):
+        """rank references for a model"""
+
+        result = top_references(self.dbfile, "model:1")
+        self.assertEqual([_[1] for _ in result], ["DISEASE:1", "DISEASE:2"])
+        result = top_references(self.dbfile, "model:1", by="specific",
+                                min_specific=0.5)
+        self.assertEqual([_[1] for _ in result], ["DISEASE:1"])
+
+    def test_top_query_uses_index(self):
+        """queries find rows through an index, without a table scan"""
+
+        ModelScoreTable(self.dbfile).create_indexes()
+        for key_field in ("model", "reference"):
+            for by in ("general", "specific"):
+                sql = "EXPLAIN QUERY PLAN " + _top_scores_sql(key_field, by)
+                with get_conn(self.dbfile) as conn:
+                    cur = conn.cursor()
+                    cur.row_factory = None
+                    cur.execute(sql, ("model:1", 0, 0, 10))
+                    plan = " ".join([str(_[-1]) for _ in cur.fetchall()])
+                self.assertTrue("USING INDEX model_score_" + key_field in plan)
+
+    def test_top_invalid_score(self):
+        """raise exception when ranking by an unknown score"""
+
+        with self.assertRaises(Exception):
+            top_models(self.dbfile, "DISEASE:1", by="other")
+
+    def test_query_output(self):
+        """query through pipeline writes a table"""
+
+        config = MGITestConfig()
+        config.reference = "DISEASE:1,DISEASE:2"
+        config.top = 1
+        out = StringIO()
+        Phenoscoring(config).query(out)
+        lines = out.getvalue().strip().split("\n")
+        self.assertEqual(lines[0], "model\treference\tgeneral\tspecific")
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[2].startswith("model:1\tDISEASE:2"))
+
+    def test_query_requires_one_key(self):
+        """query needs either a model or a reference"""
+
+        config = MGITestConfig()
+        config.model = "model:1"
+        config.reference = "DISEASE:1"
+        with self.assertRaises(Exception):
+            Phenoscoring(config).query(StringIO())
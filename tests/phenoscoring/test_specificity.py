@@ -0,0 +1,109 @@
+"""
+Tests for phenoscoring/specificity.py
+"""
+
+import numpy as np
+import unittest
+from phenoscoring.build import prep_refset, slim_refset
+from phenoscoring.dbhelpers import get_ref_priors
+from phenoscoring.dbtables import ReferenceNeighborsTable
+from phenoscoring.dbtables import ReferenceCompletePhenotypeTable
+from phenoscoring.phenoscoring import Phenoscoring
+from phenoscoring import specificity
+from phenoscoring.specificity import run_specificity
+from phenoscoring.specificity import round_values, specific_values
+from obo.obo import MinimalObo
+from scoring.referencematrix import ReferenceMatrix
+from ..testhelpers import remove_db, table_rows
+from ..testhelpers import CompleteTestConfig
+
+
+class SpecificValuesTests(unittest.TestCase):
+    """Test cases for array computations of specific values"""
+
+    def test_round_values(self):
+        """rounding matches built-in round on python floats"""
+
+        values = [0.1234567891, 1.00000005, 0.5, 0.1234567891, 2.675e-8]
+        result = round_values(np.array(values))
+        self.assertEqual(list(result), [round(_, 7) for _ in values])
+
+    def test_specific_values(self):
+        """specific values compared with priors and neighbors"""
+
+        self_val = np.array([0.9, 0.2, 0.05, 0.01])
+        nei_val = np.array([0.5, 0.2, 0.02, 0.01])
+        prior_val = np.array([0.1, 0.1, 0.1, 0.1])
+        null_val = np.array([0.05, 0.05, 0.05, 0.02])
+        result, keep = specific_values(self_val, nei_val, prior_val,
+                                       null_val)
+        # above prior, specific part is the excess over neighbors
+        self.assertAlmostEqual(result[0], 0.4)
+        # above prior, same as neighbors: specific value is the prior
+        self.assertEqual(result[1], 0.1)
+        # below prior, and above neighbors: specific value is the prior
+        self.assertEqual(result[2], 0.1)
+        self.assertEqual(list(keep), [True, True, False, True])
+
+
+class RunSpecificityTests(unittest.TestCase):
+    """Test cases for computing specific representations in workers"""
+
+    @classmethod
+    def setUpClass(cls):
+        """build a db with references."""
+
+        cls.config = CompleteTestConfig()
+        cls.dbfile = cls.config.db
+        Phenoscoring(cls.config).build()
+        obo = MinimalObo("tests/testdata/Y.obo", True)
+        refset = prep_refset(cls.dbfile, obo, get_ref_priors(cls.dbfile),
+                             cls.config.reference_missing_factor)
+        cls.refset = slim_refset(ReferenceMatrix(refset, refset.row_names))
+        cls.refnames = [_ for _ in cls.refset.column_names if _ != "null"]
+
+    @classmethod
+    def tearDownClass(cls):
+        remove_db(cls.dbfile)
+
+    def rows(self):
+        """get rows from the complete phenotype and neighbor tables"""
+
+        fields = ("id", "phenotype", "value", "specific_value")
+        complete = table_rows(ReferenceCompletePhenotypeTable(self.dbfile),
+                              fields)
+        fields = ("id", "neighbor", "rank")
+        neighbors = table_rows(ReferenceNeighborsTable(self.dbfile), fields)
+        return complete, neighbors
+
+    def test_workers(self):
+        """workers with a shared matrix give the same rows as a build"""
+
+        expected = self.rows()
+        ReferenceCompletePhenotypeTable(self.dbfile).delete("id",
+                                                            self.refnames)
+        ReferenceNeighborsTable(self.dbfile).delete("id", self.refnames)
+        self.assertNotEqual(self.rows(), expected)
+
+        run_specificity(self.dbfile, self.refset, self.config.
+                        reference_neighbors_k, self.refnames, cores=2,
+                        chunk_size=1)
+        self.assertEqual(self.rows(), expected)
+
+    def test_workers_without_shared_memory(self):
+        """workers with copies of a matrix give the same rows as a build"""
+
+        expected = self.rows()
+        ReferenceCompletePhenotypeTable(self.dbfile).delete("id",
+                                                            self.refnames)
+        ReferenceNeighborsTable(self.dbfile).delete("id", self.refnames)
+
+        shared_memory = specificity.SharedMemory
+        specificity.SharedMemory = None
+        try:
+            run_specificity(self.dbfile, self.refset, self.config.
+                            reference_neighbors_k, self.refnames, cores=2,
+                            chunk_size=1)
+        finally:
+            specificity.SharedMemory = shared_memory
+        self.assertEqual(self.rows(), expected)
@@ -6,6 +6,7 @@ Adding and updatnig models to an existing db
 
 
 import unittest
+from db.db import get_conn
 from db.generator import DBGenerator
 from phenoscoring.phenoscoring import Phenoscoring 
 from phenoscoring.dbtables import ModelDescriptionTable, ModelPhenotypeTable
@@ -49,6 +50,18 @@ class AddModelsTests(unittest.TestCase):
         modeltab = ModelPhenotypeTable(self.dbfile)        
         self.assertEqual(modeltab.count_rows(), 14)
         
+    def test_update_creates_indexes(self):
+        """computing scores also creates indexes for queries"""
+
+        Phenoscoring(MGITestConfig()).update()
+        with get_conn(self.dbfile) as conn:
+            cur = conn.cursor()
+            cur.row_factory = None
+            cur.execute("SELECT name FROM sqlite_master WHERE type='index'")
+            names = set([_[0] for _ in cur.fetchall()])
+        for index_name, _ in ModelScoreTable.indexes:
+            self.assertTrue(index_name in names)
+
     def test_build_mgi(self):
         """can build a phenoscoring database using only MGI data"""
 
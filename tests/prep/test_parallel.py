@@ -0,0 +1,48 @@
+'''
+Tests for contents of phenoprep/parallel.py
+'''
+
+import unittest
+from phenoprep.parallel import map_ordered, in_shard, merge_shards
+
+
+def square(x, offset):
+    """helper for testing maps with additional arguments"""
+    return x*x + offset
+
+
+class MapOrderedTests(unittest.TestCase):
+    """Test cases for applying functions in a pool"""
+
+    def test_serial(self):
+        """map with one core"""
+
+        result = map_ordered(square, range(5), (1,))
+        self.assertEqual(result, [1, 2, 5, 10, 17])
+
+    def test_pool(self):
+        """map with several processes keeps order of items"""
+
+        result = map_ordered(square, range(5), (1,), cores=2)
+        self.assertEqual(result, [1, 2, 5, 10, 17])
+
+
+class ShardTests(unittest.TestCase):
+    """Test cases for assigning keys to shards and merging shards"""
+
+    def test_in_shard(self):
+        """each key belongs to exactly one shard"""
+
+        for key in ["A", "B", "MGI:001", "MGI:002"]:
+            self.assertTrue(in_shard(key, None))
+            hits = [in_shard(key, (i, 3)) for i in range(3)]
+            self.assertEqual(sum(hits), 1)
+
+    def test_merge(self):
+        """merging follows the rows that first defined models"""
+
+        shard0 = (dict(a=1, c=3), dict(a=0, c=4))
+        shard1 = (dict(b=2, d=4, e=5), dict(b=2, d=4, e=4))
+        result = merge_shards([shard0, shard1])
+        self.assertEqual(list(result.keys()), ["a", "b", "c", "d", "e"])
+        self.assertEqual(list(result.values()), [1, 2, 3, 4, 5])
@@ -3,15 +3,22 @@ Tests for contents of phenoprep/prep_impc.py
 '''
 
 import unittest
+import numpy as np
 from os.path import join, exists
 from obo.obo import MinimalObo
 from phenoprep.prep_imputation import get_UA_models, make_scaled_cooc 
 from phenoprep.prep_imputation import get_models_by_phenotype, impute_IMPC
+from phenoprep.prep_imputation import scaled_coocs, models_jaccard_matrix, ji
+from phenoprep.prep_imputation import impute_one_model
 from phenoprep.prep_impc import prep_IMPC, sex_code, get_IMPC_hits_summary
+from phenoprep.prep_impc import prep_IMPC_all
 from phenoprep.write import write_models, write_phenotype_cooc
 from phenoprep.write import write_hits_summary
 from ..testhelpers import remove_if_exists
 from tools.files import open_file
+from phenoscoring.entity import Entity
+from phenoscoring.phenotypedatum import PhenotypeDatum
+from scoring.experiment import Experiment
 
 # input file paths
 testdir = join("tests", "testdata")
@@ -99,6 +106,35 @@ class PrepIMPCTests(unittest.TestCase):
         self.assertEqual(males, unspecified, "should be paired and equal")
         self.assertGreater(males, 0)        
     
+    def test_parsing_all(self):
+        """single pass provides same models and summary as separate parses"""
+
+        models = prep_IMPC(impc_file, (0.8, 0.05), 0.01)
+        fullmodels = prep_IMPC(impc_file, (0.8, 0.05), 0.01, simplify="none")
+        tested, hits = get_IMPC_hits_summary(impc_file, 0.01)
+        result = prep_IMPC_all(impc_file, (0.8, 0.05), 0.01)
+        self.assertEqual(sorted(result[0].keys()), sorted(models.keys()))
+        self.assertEqual(sorted(result[1].keys()), sorted(fullmodels.keys()))
+        for id, model in models.items():
+            self.assertTrue(result[0][id].equivalent(model))
+            self.assertTrue(result[1][id].equivalent(fullmodels[id]))
+        self.assertEqual(result[2], tested)
+        self.assertEqual(result[3], hits)
+
+    def test_parsing_shards(self):
+        """parsing in shards with several processes gives same models"""
+
+        serial = prep_IMPC_all(impc_file, (0.8, 0.05), 0.01)
+        sharded = prep_IMPC_all(impc_file, (0.8, 0.05), 0.01, cores=3)
+        for i in [0, 1]:
+            self.assertEqual(list(sharded[i].keys()), list(serial[i].keys()))
+            for id, model in serial[i].items():
+                self.assertTrue(sharded[i][id].equivalent(model))
+                self.assertEqual([_.phenotype for _ in sharded[i][id].data],
+                                 [_.phenotype for _ in model.data])
+        self.assertEqual(sharded[2], serial[2])
+        self.assertEqual(sharded[3], serial[3])
+
     def test_writing(self):
         """write the parsed MGI data onto files"""
         
@@ -165,6 +201,78 @@ class PrepIMPCTests(unittest.TestCase):
         # phenotype file should have a few lines
         self.assertGreater(len(pheno), 3)
             
+    def test_imputing_parallel(self):
+        """imputing with several processes gives the same models"""
+
+        obo = MinimalObo(obo_file)
+        models = prep_IMPC(impc_file, (0.8, 0.05), 0.01)
+        models_allele = get_UA_models(models, "allele")
+        serial = impute_IMPC(models_allele, obo, 0)
+        parallel = impute_IMPC(models_allele, obo, 0, cores=2, batch_size=1)
+        self.assertEqual(list(parallel.keys()), list(serial.keys()))
+        for id, model in serial.items():
+            self.assertTrue(parallel[id].equivalent(model))
+
+    def test_impute_one_model(self):
+        """imputation combines suggestions from several phenotypes"""
+
+        model = Entity("M", "allele")
+        model.add(PhenotypeDatum("Y:001", Experiment(1, 0.8, 0.05), "T1"))
+        model.add(PhenotypeDatum("Y:002", Experiment(1, 0.6, 0.05), "T2"))
+        model.add(PhenotypeDatum("Y:003", Experiment(0, 0.8, 0.05), "T3"))
+        phenindex = {"Y:001": 0, "Y:002": 1, "Y:003": 2, "Y:004": 3,
+                     "Y:005": 4}
+        measured = {"Y:001": set(["M"]), "Y:002": set(["M"]),
+                    "Y:003": set(["M"]), "Y:004": set(), "Y:005": set()}
+        cooc = np.zeros((5, 5))
+        cooc[0, 3], cooc[0, 4] = 0.5, 0.01
+        cooc[1, 3], cooc[1, 4] = 0.25, 0.5
+        cooc[0, 2] = 0.5
+        result = impute_one_model(model, measured, None, cooc, phenindex)
+        phenotypes = [_.phenotype for _ in result.data]
+        self.assertEqual(phenotypes, ["Y:001", "Y:002", "Y:003",
+                                      "Y:004", "Y:005"])
+        # Y:004 is suggested by two phenotypes, Y:005 by one
+        self.assertEqual(result.data[3].value, 0.5)
+        self.assertAlmostEqual(result.data[3].tpr, (0.4+0.15)/2)
+        self.assertEqual(result.data[3].timestamp, "T1")
+        self.assertAlmostEqual(result.data[4].tpr, 0.3)
+        self.assertEqual(result.data[4].timestamp, "T2")
+        # measured phenotype Y:003 is not imputed
+        self.assertEqual(result.data[2].value, 0)
+
+    def test_models_jaccard(self):
+        """jaccard indexes from incidence matrices match set operations"""
+
+        phen2ids = dict(A=set(["m1", "m2"]), B=set(["m2", "m3", "m4"]),
+                        C=set(), D=set(["m1"]))
+        phenotypes = ["A", "B", "C", "D"]
+        result = models_jaccard_matrix(phen2ids, phenotypes)
+        for i1, p1 in enumerate(phenotypes):
+            for i2, p2 in enumerate(phenotypes):
+                m1, m2 = phen2ids[p1], phen2ids[p2]
+                expected = ji(m1, m2) if len(m1) and len(m2) else 0
+                self.assertEqual(result[i1, i2], expected)
+
+    def test_scaled_coocs(self):
+        """several types of cooc matrices in one pass"""
+
+        obo = MinimalObo(obo_file)
+        models = prep_IMPC(impc_file, (0.8, 0.05), 0.01)
+        models_allele = get_UA_models(models, "allele")
+        observed = get_models_by_phenotype(models_allele, 1)
+        result = list(scaled_coocs(observed, obo, 0.2))
+        self.assertEqual([_[0] for _ in result], ["full", "freq", "simJ"])
+        full, phenindex = result[0][1], result[0][2]
+        for p1, i1 in phenindex.items():
+            for p2, i2 in phenindex.items():
+                m1, m2 = observed[p1], observed[p2]
+                expected = 0
+                if len(m1) > 0 and len(m2) > 0:
+                    a_ji = obo.sim_jaccard(p1, p2)
+                    expected = ji(m1, m2)*(1-a_ji)*0.8
+                self.assertAlmostEqual(full[i1, i2], expected)
+
     def test_scaled_cooc(self):
         """write out cooc matrices"""
         
@@ -5,7 +5,7 @@ Tests for contents of phenoprep/prep_mgi.py
 import unittest
 from os.path import join, exists
 from obo.obo import MinimalObo
-from phenoprep.prep_mgi import prep_MGI
+from phenoprep.prep_mgi import prep_MGI, prep_genotype_models
 from phenoprep.write import write_models
 from ..testhelpers import remove_if_exists
 from tools.files import open_file
@@ -51,6 +51,15 @@ class PrepMGITests(unittest.TestCase):
         self.assertEqual(len(alleles), 1)
         self.assertEqual(len(markers), 1)                
 
+    def test_parsing_shards(self):
+        """parsing in shards with several processes gives same models"""
+
+        serial = prep_genotype_models(mgi_file, (0.8, 0.05), obo)
+        sharded = prep_genotype_models(mgi_file, (0.8, 0.05), obo, cores=3)
+        self.assertEqual(list(sharded.keys()), list(serial.keys()))
+        for id, model in serial.items():
+            self.assertTrue(sharded[id].equivalent(model))
+
     def test_writing(self):
         """write the parsed MGI data onto files"""
         
@@ -0,0 +1,149 @@
+"""
+Tests for contents of scoring/imputation.py
+"""
+
+import os.path
+import unittest
+from obo.obo import MinimalObo
+from scoring.imputation import impute_representation
+from scoring.imputation import impute_matrix, impute_sums
+from scoring.representation import Representation
+
+
+class PlainObo:
+    """wrapper around an ontology that hides the integer index."""
+
+    def __init__(self, obo):
+        self.obo = obo
+
+    def ancestors(self, key):
+        return self.obo.ancestors(key)
+
+    def descendants(self, key):
+        return self.obo.descendants(key)
+
+
+class ImputationTests(unittest.TestCase):
+    """Test cases for array-based imputation."""
+
+    obofile = os.path.join("tests", "testdata", "small.obo")
+
+    @classmethod
+    def setUpClass(cls):
+        cls.obo = MinimalObo(cls.obofile)
+        cls.obodef = dict.fromkeys(cls.obo.ids(), 0.2)
+
+    def assertSameImputation(self, data, seeds=None, defaults=None):
+        """array-based and dict-based imputation give the same output"""
+
+        if defaults is None:
+            defaults = self.obodef
+        r1 = Representation(data)
+        r2 = Representation(data)
+        self.assertTrue(impute_representation(r1, self.obo, defaults, seeds))
+        r2.impute(PlainObo(self.obo), defaults, seeds)
+        self.assertEqual(list(r1.data.keys()), list(r2.data.keys()))
+        for k, v in r2.data.items():
+            self.assertEqual(r1.data[k], v)
+            self.assertEqual(type(r1.data[k]), type(v))
+
+    def test_up(self):
+        """positive evidence increases ancestors"""
+
+        self.assertSameImputation({"DOID:11044": 0.4, "DOID:3650": 0.3})
+
+    def test_down(self):
+        """negative evidence decreases descendants"""
+
+        self.assertSameImputation({"DOID:4": 0.1, "DOID:0014667": 0.05})
+
+    def test_mixed(self):
+        """positive and negative evidence together, with ordered seeds"""
+
+        data = {"DOID:0014667": 0.4, "DOID:4": 0.1, "unrelated": 0.8}
+        self.assertSameImputation(data)
+        self.assertSameImputation(data, seeds=["DOID:4", "DOID:0014667"])
+
+    def test_integer_defaults(self):
+        """untouched values keep their types"""
+
+        defaults = dict.fromkeys(self.obo.ids(), 0)
+        self.assertSameImputation({"DOID:3650": 0.6}, defaults=defaults)
+
+    def test_no_seeds(self):
+        """representation without informative values receives defaults"""
+
+        self.assertSameImputation({"DOID:4": 0.2})
+
+    def test_unsuitable_inputs(self):
+        """inputs that are not suitable leave representation unchanged"""
+
+        rep = Representation({"DOID:3650": 0.4})
+        defaults = dict(self.obodef)
+        defaults.pop("DOID:4")
+        self.assertFalse(impute_representation(rep, self.obo, defaults))
+        self.assertFalse(impute_representation(rep, PlainObo(self.obo),
+                                               self.obodef))
+        self.assertEqual(rep.data, {"DOID:3650": 0.4})
+
+
+class BatchImputationTests(unittest.TestCase):
+    """Test cases for imputation of many representations at once."""
+
+    obofile = os.path.join("tests", "testdata", "small.obo")
+
+    @classmethod
+    def setUpClass(cls):
+        cls.obo = MinimalObo(cls.obofile)
+        cls.obodef = dict.fromkeys(cls.obo.ids(), 0.2)
+        cls.reps = [Representation({"DOID:11044": 0.4, "DOID:3650": 0.3}),
+                    Representation({"DOID:4": 0.1, "DOID:0014667": 0.05}),
+                    Representation(),
+                    Representation({"DOID:0014667": 0.4, "DOID:4": 0.1,
+                                    "unrelated": 0.8})]
+
+    def expected(self, obo, columns):
+        """impute representations one at a time"""
+
+        result = []
+        for rep in self.reps:
+            rep = rep.copy()
+            rep.impute(obo, self.obodef)
+            result.append([rep.data[_] for _ in columns])
+        return result
+
+    def test_matrix(self):
+        """batch imputation matches individual imputation"""
+
+        columns = self.obo.ids()
+        result = impute_matrix(self.obo, self.obodef, self.reps, columns,
+                               chunk_size=3)
+        self.assertEqual(result.shape, (4, len(columns)))
+        self.assertEqual(result.tolist(), self.expected(self.obo, columns))
+
+    def test_matrix_inputs_unchanged(self):
+        """batch imputation does not modify concise representations"""
+
+        impute_matrix(self.obo, self.obodef, self.reps, self.obo.ids())
+        self.assertEqual(len(self.reps[0].data), 2)
+        self.assertEqual(len(self.reps[2].data), 0)
+
+    def test_matrix_fallback(self):
+        """batch imputation works with ontologies without an index"""
+
+        columns = self.obo.ids()[:3]
+        obo = PlainObo(self.obo)
+        result = impute_matrix(obo, self.obodef, self.reps, columns)
+        self.assertEqual(result.tolist(), self.expected(obo, columns))
+
+    def test_sums(self):
+        """sums of imputed values are accumulated in order"""
+
+        columns = self.obo.ids()
+        result = impute_sums(self.obo, self.obodef, self.reps, columns,
+                             initial=1, chunk_size=2)
+        expected = [1] * len(columns)
+        for row in self.expected(self.obo, columns):
+            for i, value in enumerate(row):
+                expected[i] += value
+        self.assertEqual(result.tolist(), expected)
@@ -0,0 +1,57 @@
+"""
+Tests for contents of scoring/lsh.py
+"""
+
+import numpy as np
+import unittest
+from scoring.lsh import ProjectionIndex, neighbor_recall
+
+
+class ProjectionIndexTests(unittest.TestCase):
+    """Test cases for random-projection hash tables"""
+
+    def setUp(self):
+        """prepare a matrix with some duplicated and scaled columns."""
+
+        rng = np.random.RandomState(1)
+        self.data = rng.uniform(0, 1, (40, 30))
+        self.data[:, 3] = self.data[:, 2]
+        self.data[:, 5] = 2*self.data[:, 4]
+        self.norms = np.sqrt((self.data*self.data).sum(axis=0))
+
+    def test_candidates_include_self(self):
+        """each column is a candidate neighbor of itself."""
+
+        index = ProjectionIndex(self.data, self.norms, n_tables=2, n_bits=4)
+        for i in range(self.data.shape[1]):
+            self.assertTrue(i in index.candidates(i))
+
+    def test_candidates_collinear(self):
+        """columns with the same direction always share buckets."""
+
+        index = ProjectionIndex(self.data, self.norms, n_tables=2, n_bits=8)
+        self.assertTrue(3 in index.candidates(2))
+        self.assertTrue(4 in index.candidates(5))
+
+    def test_deterministic(self):
+        """hash tables depend only on the seed."""
+
+        index1 = ProjectionIndex(self.data, self.norms, seed=2)
+        index2 = ProjectionIndex(self.data, self.norms, seed=2)
+        self.assertTrue(np.array_equal(index1.buckets, index2.buckets))
+
+
+class NeighborRecallTests(unittest.TestCase):
+    """Test cases for comparing neighbor lists"""
+
+    def test_recall(self):
+        """fraction of exact neighbors found by approximate lists."""
+
+        exact = dict(a=["b", "c"], b=["a", "c"])
+        approximate = dict(a=["c", "b"], b=["a", "d"])
+        self.assertEqual(neighbor_recall(exact, approximate), 0.75)
+
+    def test_recall_empty(self):
+        """empty neighbor lists are trivially recovered."""
+
+        self.assertEqual(neighbor_recall(dict(), dict()), 1.0)
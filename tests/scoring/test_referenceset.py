@@ -10,7 +10,7 @@ from collections import OrderedDict
 from os.path import join, exists
 from scoring.referenceset import ReferenceSet
 from scoring.referencematrix import ReferenceMatrix 
-from scoring.representation import Representation
+from scoring.representation import Representation, OverlayRepresentation
 from obo.obo import MinimalObo
 from tests.testhelpers import remove_if_exists
 
@@ -87,6 +87,20 @@ class ReferenceSetTests(unittest.TestCase):
         self.assertEqual(rs.get("DOID:4", "refB"), 0.6, 
                          "refset should contain imputed data")                         
 
+    def test_add_overlay(self):
+        """overlay representations fill data like plain representations."""
+
+        base = dict.fromkeys(obo.ids(), 0.2)
+        r1 = Representation(data=base, name="refA").set("DOID:4", 0.5)
+        r2 = OverlayRepresentation(base, name="refA").set("DOID:4", 0.5)
+        rs1 = ReferenceSet(dict(refA=0.5, refB=0.5), ids=obo.ids())
+        rs2 = ReferenceSet(dict(refA=0.5, refB=0.5), ids=obo.ids())
+        rs1.add(r1)
+        rs2.add(r2)
+        self.assertEqual(rs1.data, rs2.data)
+        self.assertEqual(rs2.get("DOID:4", "refA"), 0.5)
+        self.assertEqual(base["DOID:4"], 0.2, "base is not modified")
+
     def test_get_reference(self):
         """extract one reference from a representation set."""
         
@@ -327,6 +341,84 @@ class ReferenceMatrixTests(unittest.TestCase):
         expected = ["refB", "refA"]
         self.assertEqual(result, expected)
 
+    def test_all_neighbors(self):
+        """identify neighbors for many references at once."""
+
+        result = self.rm.all_nearest_neighbors(2, block_size=2)
+        self.assertEqual(set(result.keys()), set(self.rm.column_names))
+        for refname, neighbors in result.items():
+            self.assertEqual(neighbors,
+                             self.rm.nearest_neighbors(refname, 2))
+
+    def test_all_neighbors_subset(self):
+        """neighbors for a subset, including all other references."""
+
+        result = self.rm.all_nearest_neighbors(4, ["refC"])
+        self.assertEqual(list(result.keys()), ["refC"])
+        self.assertEqual(result["refC"],
+                         self.rm.nearest_neighbors("refC", 4))
+        self.assertFalse("refC" in result["refC"])
+
+    def test_row_order(self):
+        """rows follow the order of features in the source object."""
+
+        subset = ReferenceMatrix(self.rm, ["Y:004", "Y:001", "Y:003"])
+        expected = [_ for _ in self.rm.row_names
+                    if _ in ["Y:004", "Y:001", "Y:003"]]
+        self.assertEqual(list(subset.row_names), expected)
+        self.assertEqual(subset.n_features(), 3)
+        self.assertTrue(subset.data.flags["F_CONTIGUOUS"])
+        for refname in subset.column_names:
+            refdata = subset.get_data(refname)
+            for feature in expected:
+                self.assertEqual(refdata[feature],
+                                 self.rm.get_data(refname)[feature])
+
+    def test_from_array(self):
+        """create a matrix object directly from an array."""
+
+        result = ReferenceMatrix.from_array(self.rm.data, self.rm.row_names,
+                                            self.rm.column_names,
+                                            self.rm.column_priors)
+        self.assertEqual(result.columns, self.rm.columns)
+        self.assertEqual(result.rows, self.rm.rows)
+        self.assertEqual(list(result.data_norms), list(self.rm.data_norms))
+        self.assertEqual(result.nearest_neighbors("refC", 2),
+                         self.rm.nearest_neighbors("refC", 2))
+        with self.assertRaises(Exception):
+            ReferenceMatrix.from_array(self.rm.data, ["Y:001"],
+                                       self.rm.column_names,
+                                       self.rm.column_priors)
+
+    def test_approximate_neighbors_small(self):
+        """small sets fall back onto an exact search."""
+
+        result = self.rm.approximate_nearest_neighbors(2)
+        self.assertEqual(result, self.rm.all_nearest_neighbors(2))
+
+    def test_approximate_neighbors(self):
+        """approximate search yields neighbors other than self."""
+
+        result = self.rm.approximate_nearest_neighbors(2, min_references=0,
+                                                       n_tables=4, n_bits=2)
+        self.assertEqual(set(result.keys()), set(self.rm.column_names))
+        for refname, neighbors in result.items():
+            self.assertEqual(len(neighbors), 2)
+            self.assertFalse(refname in neighbors)
+
+    def test_approximate_neighbors_reuse_index(self):
+        """repeated approximate searches reuse hash tables."""
+
+        first = self.rm.projection_index(4, 2, 0)
+        self.assertTrue(self.rm.projection_index(4, 2, 0)[0] is first[0])
+        self.assertFalse(self.rm.projection_index(4, 3, 0)[0] is first[0])
+        result = self.rm.approximate_nearest_neighbors(2, ["refA"],
+                                                       min_references=0,
+                                                       n_tables=4, n_bits=2)
+        expected = self.rm.approximate_nearest_neighbors(2, min_references=0,
+                                                         n_tables=4, n_bits=2)
+        self.assertEqual(result["refA"], expected["refA"])
+
     def test_average(self):
         """compute an average of several representations."""
         
@@ -5,7 +5,7 @@ Tests for contents of scoring/representation.py
 
 import os.path
 import unittest
-from scoring.representation import Representation
+from scoring.representation import Representation, OverlayRepresentation
 from obo.obo import MinimalObo
 
 
@@ -305,3 +305,59 @@ class RepresentationTests(unittest.TestCase):
         self.assertEqual(r1.get("abc"), 0.5)
         self.assertEqual(result.get("abc"), 0.75)
 
+
+
+class OverlayRepresentationTests(unittest.TestCase):
+    """Test cases for class OverlayRepresentation."""
+
+    def setUp(self):
+        self.base = dict(abc=0.1, xyz=0.2)
+
+    def test_lookup(self):
+        """values fall back onto the base"""
+
+        rr = OverlayRepresentation(self.base, dict(abc=0.5), name="rr")
+        self.assertEqual(rr.get("abc"), 0.5)
+        self.assertEqual(rr.get("xyz"), 0.2)
+        self.assertEqual(sorted(rr.keys()), ["abc", "xyz"])
+        self.assertEqual(rr.overlay, dict(abc=0.5))
+
+    def test_set_does_not_modify_base(self):
+        """writes are recorded only in the overlay"""
+
+        rr = OverlayRepresentation(self.base)
+        rr.set("xyz", 0.9).set("new", 1)
+        self.assertEqual(rr.get("xyz"), 0.9)
+        self.assertEqual(rr.get("new"), 1.0)
+        self.assertEqual(self.base, dict(abc=0.1, xyz=0.2))
+
+    def test_copy(self):
+        """copies share a base but not an overlay"""
+
+        r1 = OverlayRepresentation(self.base, dict(abc=0.5), name="r1")
+        r2 = r1.copy(name="r2")
+        r2.set("abc", 0.7)
+        self.assertEqual(r1.get("abc"), 0.5)
+        self.assertEqual(r2.get("abc"), 0.7)
+        self.assertEqual(r2.name, "r2")
+        self.assertTrue(r2.base_maps[0] is self.base)
+
+    def test_equal(self):
+        """overlay and plain representations can be equal"""
+
+        r1 = OverlayRepresentation(self.base, dict(abc=0.5), name="rr")
+        r2 = Representation(dict(abc=0.5, xyz=0.2), name="rr")
+        self.assertTrue(r1.equal(r2))
+        self.assertTrue(r2.equal(r1))
+
+    def test_impute(self):
+        """imputation gives the same values as for plain representations"""
+
+        obo = MinimalObo(os.path.join("tests", "testdata", "small.obo"))
+        defaults = dict.fromkeys(obo.ids(), 0.2)
+        r1 = Representation(dict(abc=0.5)).set("DOID:0014667", 0.4)
+        r2 = OverlayRepresentation(dict(abc=0.5)).set("DOID:0014667", 0.4)
+        r1.impute(obo, defaults)
+        r2.impute(obo, defaults)
+        self.assertEqual(dict(r1.data), dict(r2.data))
+        self.assertEqual(defaults["DOID:4"], 0.2, "defaults not modified")
@@ -4,6 +4,7 @@
 '''
 
 import os.path
+from db.generator import DBGenerator
 from phenoscoring.phenoscoringconfig import PhenoscoringConfig
 
 
@@ -43,6 +44,20 @@ def remove_dbaux(dbpath):
     remove_if_exists(prefix+"-models-complete-sums.tsv.gz")    
     
 
+# ###########################################################################
+# Helper functions to compare db contents
+
+
+def table_rows(table, fieldnames):
+    """get sorted rows from a db table"""
+
+    generator = DBGenerator(table, fieldnames=fieldnames)
+    result = []
+    for rows in generator.batches():
+        result.extend(rows)
+    return sorted(result)
+
+
 # ###########################################################################
 # Configurations for various build types
 